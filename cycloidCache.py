@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content-addressed disk cache of generated part shapes.
+
+Each part is keyed by a hash of only the parameters it is built from
+(cycloidMath.PART_PARAMETERS), so variants that share a sub-part share
+its cache entry: the input shaft and eccentric key do not depend on
+tooth_count, and a catalog of 500 variants that only vary the tooth count
+builds each distinct shaft once.
+
+Entries are written to a temporary file and moved into place with
+os.replace, so readers never see a partial file and any number of worker
+processes can share one cache directory.  A lock file stops two workers
+building the same entry at once.  The cache is bounded in size; the
+least recently used entries are removed first.
+
+STL entries come from the numpy mesher in cycloidStl and need no FreeCAD;
+BREP entries need FreeCAD.
+
+Example:
+    import cycloidMath, cycloidCache
+    cache = cycloidCache.PartCache("~/.cache/cycloidgearbox", max_bytes=500e6)
+    variants = [dict(cycloidMath.generate_default_parameters(), driver_hole_diameter=d) for d in (8, 9, 10)]
+    cycloidCache.build_catalog(variants, "Catalog", cache, formats=(".stl",))
+
+License 	LGPL V2.1
+Homepage https://github.com/iplayfast/CycloidGearBox
+"""
+
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from cycloidMath import PART_NAMES, calculate_min_max_radii, part_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Bump when a generator changes the shape it makes, so old entries are not reused
+CACHE_VERSION = "2"
+DEFAULT_MAX_BYTES = 1 << 30
+# Seconds after which a build lock is taken to belong to a dead worker
+LOCK_TIMEOUT = 300.0
+LOCK_POLL = 0.05
+# Writes between full scans of the cache directory while under max_bytes, to
+# catch what other workers have added
+EVICT_EVERY = 64
+
+
+def _with_radii(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    if "min_rad" in parameters and "max_rad" in parameters:
+        return parameters
+    minr, maxr = calculate_min_max_radii(parameters)
+    return dict(parameters, min_rad=minr, max_rad=maxr)
+
+
+def _lock_token(lock: str) -> Optional[bytes]:
+    try:
+        with open(lock, "rb") as stream:
+            return stream.read()
+    except FileNotFoundError:
+        return None
+
+
+def _remove_lock(lock: str, token: bytes) -> None:
+    """Remove lock only while it still holds token, so a lock taken over by another worker survives."""
+    if _lock_token(lock) == token:
+        try:
+            os.remove(lock)
+        except FileNotFoundError:
+            pass
+
+
+class PartCache:
+    """Size-bounded directory of part files named by the hash of their inputs.
+
+    Args:
+        directory: Cache directory, created if missing
+        max_bytes: Total size the cache is trimmed back to once writes go over it
+    """
+
+    def __init__(self, directory: str, max_bytes: float = DEFAULT_MAX_BYTES):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        # running total of the entries, None until the directory is first scanned
+        self._estimate: Optional[int] = None
+        self._puts = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, name: str, parameters: Dict[str, Any], suffix: str) -> str:
+        """Hash of everything the cached file depends on."""
+        text = f"{CACHE_VERSION}:{name}:{suffix}:{part_fingerprint(name, _with_radii(parameters))}"
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    def _read(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as stream:
+                data = stream.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted by another worker since it was read
+            pass
+        return data
+
+    def get(self, name: str, parameters: Dict[str, Any], suffix: str) -> Optional[bytes]:
+        """The cached file contents, or None.  A hit marks the entry as recently used."""
+        data = self._read(self.path(self.key(name, parameters, suffix), suffix))
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    def put(self, name: str, parameters: Dict[str, Any], suffix: str, data: bytes) -> str:
+        """Store data atomically, then trim the cache if it has grown past max_bytes.
+
+        The size is kept as a running total, the directory is only scanned
+        when that total goes over max_bytes or every EVICT_EVERY writes.
+
+        Returns:
+            Path of the entry
+        """
+        path = self.path(self.key(name, parameters, suffix), suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as stream:
+                stream.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        self._puts += 1
+        if self._estimate is not None:
+            self._estimate += len(data)
+        if self._estimate is None or self._estimate > self.max_bytes or self._puts % EVICT_EVERY == 0:
+            self.evict(keep=path)
+        return path
+
+    def get_or_build(self, name: str, parameters: Dict[str, Any], suffix: str,
+                     build: Callable[[], bytes]) -> bytes:
+        """Return the cached entry, building and storing it on a miss.
+
+        While one worker builds an entry the others wait for it rather than
+        building it too.
+
+        Args:
+            name: Part name
+            parameters: Gearbox parameters
+            suffix: File type, e.g. ".stl"
+            build: Called without arguments to make the file contents
+
+        Returns:
+            File contents
+        """
+        data = self.get(name, parameters, suffix)
+        if data is not None:
+            return data
+        path = self.path(self.key(name, parameters, suffix), suffix)
+        lock = path + ".lock"
+        os.makedirs(os.path.dirname(lock), exist_ok=True)
+        token = f"{os.getpid()}:{uuid.uuid4().hex}".encode()
+        while True:
+            try:
+                handle = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                # read the holder first so a lock replaced since is not removed
+                holder = _lock_token(lock)
+                try:
+                    if time.time() - os.path.getmtime(lock) > LOCK_TIMEOUT:
+                        logger.warning(f"Removing stale cache lock {lock}")
+                        _remove_lock(lock, holder)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(LOCK_POLL)
+                data = self._read(path)
+                if data is not None:
+                    # another worker built it
+                    self.hits += 1
+                    return data
+            else:
+                with os.fdopen(handle, "wb") as stream:
+                    stream.write(token)
+                break
+        try:
+            data = self._read(path)
+            if data is None:
+                data = build()
+                self.builds += 1
+                self.put(name, parameters, suffix, data)
+            return data
+        finally:
+            # a waiter may have taken the lock over as stale while build ran
+            _remove_lock(lock, token)
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """(last use, size, path) of every entry."""
+        result = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith((".tmp", ".lock")):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                result.append((stat.st_mtime, stat.st_size, entry.path))
+        return result
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Remove least recently used entries until the cache fits max_bytes.
+
+        Args:
+            keep: Path that is never removed, the entry just written
+
+        Returns:
+            Number of entries removed
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._estimate = total
+        return removed
+
+    def clear(self) -> None:
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def part_stl(name: str, parameters: Dict[str, Any]) -> bytes:
+    """Binary STL of a placed part from the numpy mesher."""
+    import cycloidStl
+
+    stream = io.BytesIO()
+    cycloidStl.write_binary_stl(stream, cycloidStl.part_triangles(name, parameters), name)
+    return stream.getvalue()
+
+
+def part_brep(name: str, parameters: Dict[str, Any]) -> bytes:
+    """BREP of a placed part, built by cycloidFun in a scratch document.  Needs FreeCAD."""
+    import FreeCAD as App
+    import cycloidFun
+
+    doc = App.newDocument("CycloidCacheScratch", hidden=True)
+    try:
+        part = cycloidFun.ready_part(doc, name)
+        cycloidFun.PART_GENERATORS[name](part, dict(parameters))
+        doc.recompute()
+        return part.Shape.exportBrepToString().encode()
+    finally:
+        App.closeDocument(doc.Name)
+
+
+BUILDERS: Dict[str, Callable[[str, Dict[str, Any]], bytes]] = {".stl": part_stl, ".brep": part_brep}
+
+
+def build_catalog(variants: Iterable[Dict[str, Any]], directory: str, cache: PartCache,
+                  formats: Tuple[str, ...] = (".stl", ".brep"), prefix: str = "Variant",
+                  parts: Optional[List[str]] = None) -> List[str]:
+    """Write every part of every variant, building each distinct part once.
+
+    Args:
+        variants: Parameter dictionaries
+        directory: Output directory, created if missing
+        cache: Cache shared by all workers
+        formats: File types from BUILDERS
+        prefix: Files are named prefix_<index>-<part><suffix>
+        parts: Part names, all of PART_NAMES if None
+
+    Returns:
+        Paths of the files written
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index, parameters in enumerate(variants):
+        parameters = _with_radii(parameters)
+        for name in parts or PART_NAMES:
+            for suffix in formats:
+                data = cache.get_or_build(name, parameters, suffix,
+                                          lambda: BUILDERS[suffix](name, parameters))
+                path = os.path.join(directory, f"{prefix}_{index}-{name}{suffix}")
+                with open(path, "wb") as stream:
+                    stream.write(data)
+                paths.append(path)
+    logger.info(f"catalog: {cache.builds} parts built, {cache.hits} cache hits")
+    return paths
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory and document object leak tracking for repeated regenerations.
+
+Every regeneration empties the part bodies and fills them again.  If
+anything survives that, such as a sketch or feature left outside its
+body or memory held by a cache, it adds up over a long session.
+LeakTracker takes a snapshot before and after each generation: python
+heap (tracemalloc), process RSS, the document's object count and the
+PartDesign and Sketcher objects that are not inside any body.  stress
+runs a generation many times and raises LeakDetected when the growth
+between the first and the last run passes the given limits.
+
+generate_parts calls remove_orphans itself for the objects of the bodies
+it rebuilds, so features a regeneration leaves behind are removed as
+they appear.
+
+Example:
+    import FreeCAD, cycloidMath, cycloidDiagnostics
+    doc = FreeCAD.newDocument("leaks")
+    report = cycloidDiagnostics.stress(doc, cycloidMath.generate_default_parameters(), runs=50)
+    print(report.growth)
+
+License 	LGPL V2.1
+Homepage https://github.com/iplayfast/CycloidGearBox
+"""
+
+import logging
+import os
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Object types that belong inside a body
+FEATURE_PREFIXES = ("PartDesign::", "Sketcher::")
+DEFAULT_MAX_RSS_GROWTH = 64 << 20
+DEFAULT_MAX_TRACED_GROWTH = 16 << 20
+DEFAULT_MAX_OBJECT_GROWTH = 0
+
+
+class LeakDetected(AssertionError):
+    """Raised by stress when a resource grows past its limit."""
+
+
+class Snapshot(NamedTuple):
+    """Resource use at one moment."""
+    traced: int         # bytes allocated by python, 0 unless tracemalloc is tracing
+    rss: int            # resident set size of the process in bytes
+    objects: int        # objects in the document
+    orphans: Tuple[str, ...]  # names of features and sketches outside any body
+
+
+def process_rss() -> int:
+    """Resident set size of this process in bytes.
+
+    Uses /proc where there is one; elsewhere the peak RSS from
+    getrusage, which only ever grows.
+    """
+    try:
+        with open("/proc/self/statm") as stream:
+            return int(stream.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+
+def peak_rss() -> int:
+    """Highest resident set size this process has had so far, in bytes."""
+    import resource
+    import sys
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def body_members(doc: Any) -> Set[str]:
+    """Names of every object inside a PartDesign body of doc."""
+    members = set()
+    for obj in doc.Objects:
+        if obj.TypeId == "PartDesign::Body":
+            members.update(o.Name for o in obj.Group)
+    return members
+
+
+def orphaned_objects(doc: Any, candidates: Optional[Iterable[str]] = None) -> List[Any]:
+    """Features and sketches that are not inside any body.
+
+    Args:
+        doc: FreeCAD document
+        candidates: Only consider objects of these names, all if None
+
+    Returns:
+        The orphaned objects
+    """
+    members = body_members(doc)
+    objects = doc.Objects if candidates is None else [o for o in map(doc.getObject, candidates) if o is not None]
+    return [o for o in objects
+            if o.TypeId.startswith(FEATURE_PREFIXES) and o.TypeId != "PartDesign::Body" and o.Name not in members]
+
+
+def remove_orphans(doc: Any, candidates: Optional[Iterable[str]] = None) -> List[str]:
+    """Remove the objects orphaned_objects finds.
+
+    Pass candidates (the objects the generator made) so sketches the
+    user keeps outside a body on purpose are never touched.
+
+    Returns:
+        Names of the removed objects
+    """
+    removed = [o.Name for o in orphaned_objects(doc, candidates)]
+    for name in removed:
+        if doc.getObject(name) is not None:
+            doc.removeObject(name)
+    if removed:
+        logger.warning(f"Removed {len(removed)} orphaned objects: {', '.join(removed)}")
+    return removed
+
+
+def snapshot(doc: Any) -> Snapshot:
+    """Resource use of the process and doc now."""
+    traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+    orphans = tuple(o.Name for o in orphaned_objects(doc))
+    return Snapshot(traced, process_rss(), len(doc.Objects), orphans)
+
+
+def _growth(before: Snapshot, after: Snapshot) -> Dict[str, int]:
+    return {"traced": after.traced - before.traced, "rss": after.rss - before.rss,
+            "objects": after.objects - before.objects, "orphans": len(after.orphans) - len(before.orphans)}
+
+
+class LeakTracker:
+    """Snapshots around each generation of one document.
+
+    Used as a context manager it starts tracemalloc, unless it is already
+    tracing, and stops it again on exit.
+
+    Args:
+        doc: FreeCAD document
+        generate: Called as generate(doc, parameters, **kwargs), cycloidFun.generate_parts by default
+    """
+
+    def __init__(self, doc: Any, generate: Optional[Callable[..., Any]] = None):
+        self.doc = doc
+        if generate is None:
+            import cycloidFun
+
+            generate = cycloidFun.generate_parts
+        self.generate = generate
+        self.records: List[Tuple[Snapshot, Snapshot]] = []
+        self._started_tracing = False
+
+    def __enter__(self) -> "LeakTracker":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def run(self, parameters: Any, **kwargs: Any) -> Any:
+        """Generate with a snapshot before and after.
+
+        Returns:
+            What generate returned
+        """
+        before = snapshot(self.doc)
+        result = self.generate(self.doc, parameters, **kwargs)
+        after = snapshot(self.doc)
+        self.records.append((before, after))
+        growth = _growth(before, after)
+        logger.info(f"generation {len(self.records)}: " + ", ".join(f"{k} {v:+d}" for k, v in growth.items()))
+        return result
+
+    def growth(self, first: int = 0) -> Dict[str, int]:
+        """Change from after run first to after the last run.
+
+        Args:
+            first: Run to measure from; the default 0 leaves out the
+                one-off allocations (caches, imports) of the first run
+        """
+        return _growth(self.records[first][1], self.records[-1][1])
+
+
+class StressReport(NamedTuple):
+    """Outcome of stress."""
+    runs: int
+    growth: Dict[str, int]
+    snapshots: List[Snapshot]   # after each run
+
+
+def stress(doc: Any, parameters: Any, runs: int = 20, generate: Optional[Callable[..., Any]] = None,
+           max_rss_growth: int = DEFAULT_MAX_RSS_GROWTH, max_traced_growth: int = DEFAULT_MAX_TRACED_GROWTH,
+           max_object_growth: int = DEFAULT_MAX_OBJECT_GROWTH, **kwargs: Any) -> StressReport:
+    """Regenerate doc runs times and check nothing keeps growing.
+
+    Every run rebuilds all parts (no fingerprints are passed).  Growth is
+    measured from after the first run to after the last, so one-off
+    allocations of the first run do not count.
+
+    Args:
+        doc: FreeCAD document
+        parameters: Gearbox parameters
+        runs: Number of generations, at least 2
+        generate: As for LeakTracker
+        max_rss_growth: Most bytes RSS may grow
+        max_traced_growth: Most bytes the python heap may grow
+        max_object_growth: Most objects the document may gain
+        **kwargs: Passed on to generate
+
+    Returns:
+        StressReport
+
+    Raises:
+        LeakDetected: If a growth limit is passed or orphans are left
+        ValueError: If runs is less than 2
+    """
+    if runs < 2:
+        raise ValueError("stress needs at least 2 runs to measure growth")
+    with LeakTracker(doc, generate) as tracker:
+        for _ in range(runs):
+            tracker.run(parameters, **kwargs)
+        growth = tracker.growth()
+        snapshots = [after for _, after in tracker.records]
+    problems = []
+    for name, limit in (("rss", max_rss_growth), ("traced", max_traced_growth), ("objects", max_object_growth)):
+        if growth[name] > limit:
+            problems.append(f"{name} grew by {growth[name]} over {runs - 1} runs, limit {limit}")
+    if snapshots[-1].orphans:
+        problems.append(f"orphaned objects left: {', '.join(snapshots[-1].orphans)}")
+    if problems:
+        raise LeakDetected("; ".join(problems))
+    return StressReport(runs, growth, snapshots)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shaking forces, shaking moments and bearing loads of the moving parts.
+
+The input shaft and eccentric key turn together at the input speed.  The
+centre of each cycloidal disk's profile orbits the axis with the input at
+the eccentricity, while the disk itself turns backwards at 1/tooth_count
+of the input speed, with the driver disk and output shaft.  The phases
+and axial positions come from the placements generate_parts uses, which
+set the two disks almost, but not exactly, half a turn apart and one disk
+height apart.  The masses, centres of mass and inertia tensors come from
+cycloidMass.
+
+At constant speed the frame has to supply the sum of m * a of every
+moving part and the matching moment; the shaking force and moment are
+the reactions the frame feels, the negatives of those.  They are
+reported at the origin, on the axis at the bottom of the pin disk.  The
+loads are inertial only: the pin and driver pin forces that carry the
+output torque are not included.
+
+Everything is vectorised over input speed and input angle; a full cycle
+is tooth_count input turns, one turn of the output.
+
+Units: rpm, N and N mm.
+
+Example:
+    import numpy, cycloidMath, cycloidDynamics
+    params = cycloidMath.generate_default_parameters()
+    report = cycloidDynamics.analyse(params, rpm=numpy.linspace(1000, 10000, 10))
+    print(report.peak_force, report.peak_moment)
+    print(cycloidDynamics.balance(params))
+
+License 	LGPL V2.1
+Homepage https://github.com/iplayfast/CycloidGearBox
+"""
+
+import math
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from cycloidMass import DEFAULT_DENSITY, MassProperties, mass_properties
+from cycloidStl import part_placement
+
+# g mm / s^2 -> N, and g mm^2 / s^2 -> N mm
+_NEWTON = 1e-6
+DEFAULT_STEPS = 720
+
+INPUT_PARTS = ("inputShaft", "eccentricKey")
+OUTPUT_PARTS = ("driverDisk", "outputShaft")
+DISK_PARTS = ("cycloidalDisk1", "cycloidalDisk2")
+
+
+class Balance(NamedTuple):
+    """Imbalance of everything that goes round once per input turn."""
+    static: np.ndarray      # (2,) sum of mass times offset from the axis, g mm
+    couple: np.ndarray      # (2,) sum of mass times offset times height above z = 0, g mm^2
+    disk_phase: float       # angle between the two disk centres, degrees
+
+
+class DynamicsReport(NamedTuple):
+    """Inertial loads over input speed (first axis) and input angle (second axis)."""
+    rpm: np.ndarray             # (S,) input speeds
+    angle: np.ndarray           # (K,) input angles, radians
+    shaking_force: np.ndarray   # (S, K, 2) force on the frame, N
+    shaking_moment: np.ndarray  # (S, K, 3) moment on the frame about the origin, N mm
+    eccentric_loads: np.ndarray  # (S, K, 2) radial load on the bearing of each disk, N
+    support_loads: np.ndarray   # (S, K, 2) radial load at each support station, N
+    supports: Tuple[float, float]  # heights of the support stations, mm
+    peak_force: np.ndarray      # (S,) largest shaking force over the cycle, N
+    peak_moment: np.ndarray     # (S,) largest tilting (x, y) shaking moment over the cycle, N mm
+
+
+def _rotate(angle: np.ndarray, xy: np.ndarray) -> np.ndarray:
+    """Rotate a 2D vector by every angle, giving (K, 2)."""
+    c, s = np.cos(angle), np.sin(angle)
+    return np.stack((c * xy[0] - s * xy[1], s * xy[0] + c * xy[1]), axis=-1)
+
+
+def disk_centers(parameters: Dict[str, Any]) -> np.ndarray:
+    """Profile centres of the two disks at input angle 0, shaped (2, 2).
+
+    The profile is drawn about (-eccentricity, 0) in the disk sketch, so
+    this is where each disk's body placement puts that point.
+    """
+    e = parameters["eccentricity"]
+    angles = np.radians([part_placement(name, parameters)[0] for name in DISK_PARTS])
+    return -e * np.stack((np.cos(angles), np.sin(angles)), axis=-1)
+
+
+def _products(properties: MassProperties) -> np.ndarray:
+    """The (xz, yz) products of inertia about the centre of mass, g mm^2."""
+    return properties.inertia[[0, 1], 2]
+
+
+def balance(parameters: Dict[str, Any], density: float = DEFAULT_DENSITY) -> Balance:
+    """Residual imbalance of the input shaft, key and disk orbits.
+
+    A balanced design has static near zero: the two disk orbits cancel
+    the key and each other.  The couple is left by the disks running one
+    disk height apart and is what the shaking moment grows from.
+
+    Args:
+        parameters: Gearbox parameters
+        density: Material density in g/cm^3
+
+    Returns:
+        Balance
+    """
+    rotor = mass_properties(INPUT_PARTS, parameters, density)
+    centers = disk_centers(parameters)
+    static = rotor.mass * rotor.center[:2]
+    # the products of inertia about the centre are -integral of x z dm
+    couple = rotor.mass * rotor.center[2] * rotor.center[:2] - _products(rotor)
+    for name, center in zip(DISK_PARTS, centers):
+        disk = mass_properties(name, parameters, density)
+        static = static + disk.mass * center
+        couple = couple + disk.mass * disk.center[2] * center
+    (x0, y0), (x1, y1) = centers
+    phase = math.degrees(math.atan2(x0 * y1 - y0 * x1, x0 * x1 + y0 * y1))
+    return Balance(static, couple, abs(phase))
+
+
+def _body(position: np.ndarray, accel: np.ndarray, height: float, mass: float, spin: float,
+          products: np.ndarray, turn: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """m a and the moment about the origin needed to move one body, per unit input speed squared.
+
+    Args:
+        position, accel: (K, 2) centre of mass and its acceleration
+        height: z of the centre of mass
+        spin: Angular speed of the body over the input speed
+        products: (xz, yz) products of inertia at angle 0
+        turn: (K,) angle the body has turned through
+
+    Returns:
+        (K, 2) force and (K, 3) moment
+    """
+    force = mass * accel
+    # r x (m a) with a in the xy plane, plus d/dt of the spin angular momentum
+    ixz, iyz = _rotate(turn, products).T
+    moment = np.stack((-height * force[:, 1] - spin ** 2 * iyz,
+                       height * force[:, 0] + spin ** 2 * ixz,
+                       position[:, 0] * force[:, 1] - position[:, 1] * force[:, 0]), axis=-1)
+    return force, moment
+
+
+def analyse(parameters: Dict[str, Any], rpm: Union[float, Sequence[float], np.ndarray],
+            steps: int = DEFAULT_STEPS, revolutions: Optional[float] = None,
+            supports: Optional[Tuple[float, float]] = None, density: float = DEFAULT_DENSITY) -> DynamicsReport:
+    """Shaking force, shaking moment and bearing loads over speed and one cycle.
+
+    Args:
+        parameters: Gearbox parameters including min_rad/max_rad
+        rpm: Input speed or speeds
+        steps: Input angles sampled over the cycle
+        revolutions: Input turns the angles span, tooth_count (one output
+            turn, after which every part is back where it started) if None
+        supports: Heights of the two stations the frame carries the moving
+            parts at; the bottom of the pin disk and the top of the output
+            shaft's base if None
+        density: Material density in g/cm^3
+
+    Returns:
+        DynamicsReport
+
+    Raises:
+        ValueError: If steps is less than 1 or the supports are at the same height
+    """
+    if steps < 1:
+        raise ValueError("steps must be at least 1")
+    tooth_count = parameters["tooth_count"]
+    if revolutions is None:
+        revolutions = tooth_count
+    if supports is None:
+        supports = (0.0, parameters["base_height"] + 3 * parameters["disk_height"])
+    low, high = supports
+    if low == high:
+        raise ValueError("the two supports must be at different heights")
+
+    theta = np.arange(steps) * (2 * math.pi * revolutions / steps)
+    # the disks and the output turn backwards, one turn per tooth_count input turns
+    ratio = -1.0 / tooth_count
+    psi = theta * ratio
+
+    rotor = mass_properties(INPUT_PARTS, parameters, density)
+    output = mass_properties(OUTPUT_PARTS, parameters, density)
+    forces, moments, eccentric = [], [], []
+    for props, spin, turn in ((rotor, 1.0, theta), (output, ratio, psi)):
+        position = _rotate(turn, props.center[:2])
+        force, moment = _body(position, -spin ** 2 * position, props.center[2], props.mass, spin,
+                              _products(props), turn)
+        forces.append(force)
+        moments.append(moment)
+    for name, center in zip(DISK_PARTS, disk_centers(parameters)):
+        disk = mass_properties(name, parameters, density)
+        orbit = _rotate(theta, center)
+        offset = _rotate(psi, disk.center[:2] - center)
+        force, moment = _body(orbit + offset, -orbit - ratio ** 2 * offset, disk.center[2], disk.mass, ratio,
+                              _products(disk), psi)
+        forces.append(force)
+        moments.append(moment)
+        eccentric.append(np.hypot(force[:, 0], force[:, 1]))
+
+    rpm = np.atleast_1d(np.asarray(rpm, dtype=float))
+    omega2 = (rpm * (2 * math.pi / 60)) ** 2
+    scale = omega2[:, None, None] * _NEWTON
+    needed = sum(forces)[None] * scale
+    needed_moment = sum(moments)[None] * scale
+    # two radial reactions at heights low and high balance the force and the tilting moment
+    lever = np.stack((needed_moment[..., 1], -needed_moment[..., 0]), axis=-1)
+    at_high = (lever - low * needed) / (high - low)
+    at_low = needed - at_high
+    support_loads = np.stack((np.hypot(*np.moveaxis(at_low, -1, 0)), np.hypot(*np.moveaxis(at_high, -1, 0))),
+                             axis=-1)
+    shaking_force = -needed
+    shaking_moment = -needed_moment
+    return DynamicsReport(
+        rpm=rpm,
+        angle=theta,
+        shaking_force=shaking_force,
+        shaking_moment=shaking_moment,
+        eccentric_loads=np.stack(eccentric, axis=-1)[None] * scale,
+        support_loads=support_loads,
+        supports=(low, high),
+        peak_force=np.hypot(shaking_force[..., 0], shaking_force[..., 1]).max(axis=1),
+        peak_moment=np.hypot(shaking_moment[..., 0], shaking_moment[..., 1]).max(axis=1),
+    )
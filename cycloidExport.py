@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming DXF and SVG export of the 2D cut profiles.
+
+The plate parts of the gearbox (the cycloidal disk, the pin disk and the
+output shaft disc) are often laser or waterjet cut, which only needs their
+outlines.  This module writes those outlines straight from the parameter
+dictionary, without FreeCAD, sketches or TechDraw.  Circles are written as
+true circles and the disk profile as a closed cubic spline through the
+computed profile points (or as a polyline).
+
+Variants are streamed: each parameter dictionary is turned into entities and
+written before the next one is computed, either into one file per variant or
+packed in rows onto one sheet.
+
+Example:
+    import cycloidMath, cycloidExport
+    params = cycloidMath.generate_default_parameters()
+    cycloidExport.write_profiles(params, "Profiles")            # one DXF per part
+    cycloidExport.write_sheet("sheet.svg", variants, sheet_width=600)
+
+License 	LGPL V2.1
+Homepage https://github.com/iplayfast/CycloidGearBox
+"""
+
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional, TextIO, Tuple, Union
+
+import numpy as np
+
+from cycloidMath import calculate_min_max_radii, cycloidal_disk_outline
+
+# 2D parts that can be cut from plate
+PROFILE_NAMES = ("cycloidalDisk", "pinDisk", "outputShaft")
+FORMATS = ("dxf", "svg")
+# Gap left between parts packed onto a sheet, in mm
+SHEET_GAP = 5.0
+
+# An entity is ("circle", (cx, cy, r)), ("polyline", points) or ("spline", points)
+# where points is an (n, 2) array of a closed curve without the first point repeated.
+Entity = Tuple[str, Any]
+
+
+def _with_radii(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    if "min_rad" in parameters and "max_rad" in parameters:
+        return parameters
+    minr, maxr = calculate_min_max_radii(parameters)
+    return dict(parameters, min_rad=minr, max_rad=maxr)
+
+
+def _circle_pattern(radius: float, count: int, circle_radius: float, x: float = 0.0) -> List[Entity]:
+    angles = 2 * math.pi / count * np.arange(count)
+    return [("circle", (x + radius * math.cos(a), radius * math.sin(a), circle_radius)) for a in angles]
+
+
+def profile_entities(name: str, parameters: Dict[str, Any], splines: bool = True) -> List[Entity]:
+    """The cut outlines of one plate part, in sketch coordinates.
+
+    Args:
+        name: One of PROFILE_NAMES
+        parameters: Gearbox parameters
+        splines: Write the disk profile as a spline rather than a polyline
+
+    Returns:
+        List of entities, the outer boundary first
+
+    Raises:
+        KeyError: If name is not a plate part
+    """
+    parameters = _with_radii(parameters)
+    eccentricity = parameters["eccentricity"]
+    clearance = parameters["clearance"]
+    shaft_diameter = parameters["shaft_diameter"]
+    driver_circle_radius = parameters["driver_circle_diameter"] / 2
+    driver_hole_diameter = parameters["driver_hole_diameter"]
+    hole_count = parameters["driver_disk_hole_count"]
+
+    if name == "cycloidalDisk":
+        # as generate_cycloidal_disk_part: the holes are centred on (eccentricity, 0)
+        entities = [("spline" if splines else "polyline", cycloidal_disk_outline(parameters)),
+                    ("circle", (eccentricity, 0.0, (shaft_diameter + clearance) / 2))]
+        return entities + _circle_pattern(driver_circle_radius, hole_count,
+                                          (driver_hole_diameter + eccentricity * 2) / 2, eccentricity)
+    if name == "pinDisk":
+        roller_ring_radius = parameters["roller_circle_diameter"] / 2 + clearance
+        entities = [("circle", (0.0, 0.0, parameters["Diameter"] / 2)),
+                    ("circle", (0.0, 0.0, (shaft_diameter + clearance) / 2))]
+        return entities + _circle_pattern(roller_ring_radius, parameters["tooth_count"] + 1,
+                                          (parameters["roller_diameter"] / 4.0 + clearance) / 2)
+    if name == "outputShaft":
+        entities = [("circle", (0.0, 0.0, parameters["min_rad"]))]
+        return entities + _circle_pattern(driver_circle_radius, hole_count, (driver_hole_diameter + clearance) / 2)
+    raise KeyError(f"Unknown profile {name}")
+
+
+def periodic_spline_poles(points: np.ndarray) -> np.ndarray:
+    """Control points of the uniform closed cubic B-spline through points.
+
+    Interpolation requires (P[i-1] + 4 P[i] + P[i+1]) / 6 == points[i]; the
+    system is circulant, so it is solved with one FFT instead of a matrix.
+
+    Args:
+        points: (n, 2) closed curve without the first point repeated
+
+    Returns:
+        (n, 2) control points, the spline passes through points[i] at knot i
+    """
+    count = len(points)
+    kernel = np.zeros(count)
+    kernel[0], kernel[1], kernel[-1] = 4 / 6, 1 / 6, 1 / 6
+    return np.real(np.fft.ifft(np.fft.fft(points, axis=0) / np.fft.fft(kernel)[:, None], axis=0))
+
+
+def spline_beziers(points: np.ndarray) -> np.ndarray:
+    """The closed spline through points as cubic Bezier segments.
+
+    Returns:
+        (n, 4, 2) array, segment i runs from points[i] to points[i + 1]
+    """
+    poles = periodic_spline_poles(points)
+    p1, p2 = poles, np.roll(poles, -1, axis=0)
+    return np.stack((points, (2 * p1 + p2) / 3, (p1 + 2 * p2) / 3, np.roll(points, -1, axis=0)), axis=1)
+
+
+def entity_bounds(entities: List[Entity]) -> Tuple[float, float, float, float]:
+    """Bounding box (xmin, ymin, xmax, ymax) of entities."""
+    low, high = np.full(2, np.inf), np.full(2, -np.inf)
+    for kind, data in entities:
+        if kind == "circle":
+            cx, cy, r = data
+            low = np.minimum(low, (cx - r, cy - r))
+            high = np.maximum(high, (cx + r, cy + r))
+        else:
+            low = np.minimum(low, data.min(axis=0))
+            high = np.maximum(high, data.max(axis=0))
+    return float(low[0]), float(low[1]), float(high[0]), float(high[1])
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.6f}".rstrip("0").rstrip(".")
+
+
+class DxfWriter:
+    """Writes entities to an ASCII DXF as they are added.
+
+    Only an ENTITIES section is written, which CAM and CAD programs read
+    without the table sections.  Circles become CIRCLE, polylines a closed
+    LWPOLYLINE and splines a closed periodic cubic SPLINE with the control
+    points from periodic_spline_poles.
+    """
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self.entity_count = 0
+        stream.write("0\nSECTION\n2\nHEADER\n9\n$ACADVER\n1\nAC1015\n9\n$INSUNITS\n70\n4\n0\nENDSEC\n")
+        stream.write("0\nSECTION\n2\nENTITIES\n")
+
+    def add(self, entities: List[Entity], offset: Tuple[float, float] = (0.0, 0.0), layer: str = "0") -> None:
+        """Write entities, moved by offset."""
+        dx, dy = offset
+        lines = []
+        for kind, data in entities:
+            if kind == "circle":
+                cx, cy, r = data
+                lines += ["0", "CIRCLE", "8", layer, "10", _fmt(cx + dx), "20", _fmt(cy + dy), "30", "0",
+                          "40", _fmt(r)]
+            elif kind == "polyline":
+                lines += ["0", "LWPOLYLINE", "8", layer, "90", str(len(data)), "70", "1"]
+                for x, y in data:
+                    lines += ["10", _fmt(x + dx), "20", _fmt(y + dy)]
+            elif kind == "spline":
+                poles = periodic_spline_poles(data)
+                # written unclamped, with the poles wrapped so all n segments are complete
+                poles = np.concatenate((poles[-1:], poles, poles[:2]))
+                knots = np.arange(len(poles) + 4, dtype=float)
+                lines += ["0", "SPLINE", "8", layer, "210", "0", "220", "0", "230", "1",
+                          "70", "11", "71", "3", "72", str(len(knots)), "73", str(len(poles)), "74", "0"]
+                for k in knots:
+                    lines += ["40", _fmt(k)]
+                for x, y in poles:
+                    lines += ["10", _fmt(x + dx), "20", _fmt(y + dy), "30", "0"]
+            else:
+                raise ValueError(f"Unknown entity {kind}")
+            self.entity_count += 1
+        self.stream.write("\n".join(lines) + "\n")
+
+    def close(self) -> None:
+        self.stream.write("0\nENDSEC\n0\nEOF\n")
+
+
+class SvgWriter:
+    """Writes entities to an SVG as they are added, in millimetres.
+
+    The y axis is flipped so the drawing matches the FreeCAD sketch.  The
+    view box is only known at the end; on seekable streams it is patched into
+    the header, otherwise the width given to the constructor is used with a
+    square height.
+    """
+
+    _PLACEHOLDER = 200
+
+    def __init__(self, stream: TextIO, width: float = 200.0):
+        self.stream = stream
+        self.entity_count = 0
+        self.bounds = [math.inf, math.inf, -math.inf, -math.inf]
+        stream.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self._view_at = stream.tell() if stream.seekable() else None
+        stream.write(self._view(0.0, 0.0, width, width).ljust(self._PLACEHOLDER) + "\n")
+        stream.write('<g transform="scale(1,-1)" fill="none" stroke="black" stroke-width="0.1">\n')
+
+    @staticmethod
+    def _view(xmin: float, ymin: float, xmax: float, ymax: float) -> str:
+        width, height = xmax - xmin, ymax - ymin
+        # the group flips y, so the view box covers -ymax..-ymin
+        return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{_fmt(width)}mm" height="{_fmt(height)}mm" '
+                f'viewBox="{_fmt(xmin)} {_fmt(-ymax)} {_fmt(width)} {_fmt(height)}">')
+
+    def add(self, entities: List[Entity], offset: Tuple[float, float] = (0.0, 0.0), layer: str = "0") -> None:
+        """Write entities, moved by offset, as one group named layer."""
+        dx, dy = offset
+        xmin, ymin, xmax, ymax = entity_bounds(entities)
+        bounds = self.bounds
+        self.bounds = [min(bounds[0], xmin + dx), min(bounds[1], ymin + dy),
+                       max(bounds[2], xmax + dx), max(bounds[3], ymax + dy)]
+        parts = [f'<g id="{layer}">']
+        for kind, data in entities:
+            if kind == "circle":
+                cx, cy, r = data
+                parts.append(f'<circle cx="{_fmt(cx + dx)}" cy="{_fmt(cy + dy)}" r="{_fmt(r)}"/>')
+            elif kind == "polyline":
+                coordinates = " ".join(f"{_fmt(x + dx)},{_fmt(y + dy)}" for x, y in data)
+                parts.append(f'<polygon points="{coordinates}"/>')
+            elif kind == "spline":
+                beziers = spline_beziers(data) + (dx, dy)
+                path = [f"M{_fmt(beziers[0, 0, 0])},{_fmt(beziers[0, 0, 1])}"]
+                path += [f"C{_fmt(a[0])},{_fmt(a[1])} {_fmt(b[0])},{_fmt(b[1])} {_fmt(c[0])},{_fmt(c[1])}"
+                         for a, b, c in beziers[:, 1:]]
+                parts.append(f'<path d="{" ".join(path)}Z"/>')
+            else:
+                raise ValueError(f"Unknown entity {kind}")
+            self.entity_count += 1
+        parts.append("</g>")
+        self.stream.write("\n".join(parts) + "\n")
+
+    def close(self) -> None:
+        self.stream.write("</g>\n</svg>\n")
+        if self._view_at is not None and self.entity_count:
+            end = self.stream.tell()
+            self.stream.seek(self._view_at)
+            self.stream.write(self._view(*self.bounds).ljust(self._PLACEHOLDER))
+            self.stream.seek(end)
+
+
+_WRITERS = {"dxf": DxfWriter, "svg": SvgWriter}
+
+
+def _format_of(path: str, fmt: Optional[str]) -> str:
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt}, expected one of {FORMATS}")
+    return fmt
+
+
+def write_profiles(parameters: Dict[str, Any], directory: str, prefix: str = "CycloidalDrive",
+                   parts: Optional[List[str]] = None, fmt: str = "dxf", splines: bool = True) -> List[str]:
+    """Write one file per plate part.
+
+    Args:
+        parameters: Gearbox parameters
+        directory: Output directory, created if missing
+        prefix: File name prefix
+        parts: Names from PROFILE_NAMES, all of them if None
+        fmt: "dxf" or "svg"
+        splines: Write the disk profile as a spline rather than a polyline
+
+    Returns:
+        Paths of the files written
+    """
+    fmt = _format_of("", fmt)
+    parameters = _with_radii(parameters)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name in parts or PROFILE_NAMES:
+        path = os.path.join(directory, f"{prefix}-{name}.{fmt}")
+        with open(path, "w") as stream:
+            writer = _WRITERS[fmt](stream)
+            writer.add(profile_entities(name, parameters, splines), layer=name)
+            writer.close()
+        paths.append(path)
+    return paths
+
+
+def write_variants(variants: Iterable[Dict[str, Any]], directory: str, prefix: str = "Variant",
+                   name: str = "cycloidalDisk", fmt: str = "dxf", splines: bool = True) -> List[str]:
+    """Stream a batch of designs into one file per variant.
+
+    Args:
+        variants: Parameter dictionaries, consumed one at a time
+        directory: Output directory, created if missing
+        prefix: File names are prefix_<index>-<name>.<fmt>
+        name: Which plate part to write
+        fmt: "dxf" or "svg"
+        splines: Write the disk profile as a spline rather than a polyline
+
+    Returns:
+        Paths of the files written
+    """
+    paths = []
+    for index, parameters in enumerate(variants):
+        paths += write_profiles(parameters, directory, f"{prefix}_{index}", [name], fmt, splines)
+    return paths
+
+
+def write_sheet(target: Union[str, TextIO], variants: Iterable[Dict[str, Any]], sheet_width: float,
+                parts: Optional[List[str]] = None, fmt: Optional[str] = None, splines: bool = True,
+                gap: float = SHEET_GAP) -> List[Tuple[int, str, float, float]]:
+    """Stream a batch of designs onto one sheet, packed in rows.
+
+    Parts are placed left to right by bounding box and a new row is started
+    when the next part would run past sheet_width (next-fit shelf packing),
+    so nothing has to be held back while the batch streams in.
+
+    Args:
+        target: Path or text file object
+        variants: Parameter dictionaries, consumed one at a time
+        sheet_width: Usable width of the sheet
+        parts: Plate parts to cut per variant, all of PROFILE_NAMES if None
+        fmt: "dxf" or "svg", taken from the file name if None
+        splines: Write the disk profile as a spline rather than a polyline
+        gap: Space left between parts
+
+    Returns:
+        (variant index, part name, x, y) of the lower left corner of every
+        part placed
+
+    Raises:
+        ValueError: If a part is wider than the sheet or the format is unknown
+    """
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, "w") as stream:
+            return write_sheet(stream, variants, sheet_width, parts, _format_of(str(target), fmt), splines, gap)
+    fmt = _format_of("", fmt)
+    writer = SvgWriter(target, sheet_width) if fmt == "svg" else DxfWriter(target)
+    layout = []
+    x = y = row_height = 0.0
+    for index, parameters in enumerate(variants):
+        parameters = _with_radii(parameters)
+        for name in parts or PROFILE_NAMES:
+            entities = profile_entities(name, parameters, splines)
+            xmin, ymin, xmax, ymax = entity_bounds(entities)
+            width, height = xmax - xmin, ymax - ymin
+            if width > sheet_width:
+                raise ValueError(f"{name} of variant {index} is {width:.1f} wide, sheet is {sheet_width}")
+            if x > 0 and x + width > sheet_width:
+                x, y, row_height = 0.0, y + row_height + gap, 0.0
+            writer.add(entities, (x - xmin, y - ymin), f"{name}_{index}")
+            layout.append((index, name, x, y))
+            x += width + gap
+            row_height = max(row_height, height)
+    writer.close()
+    return layout
@@ -22,10 +22,12 @@ while True:
         foo = reload(foo)
 """
 
+import json
 import math
 import logging
 import threading
-from typing import Tuple, List, Dict, Any, Optional
+import time
+from typing import List, Optional
 import FreeCAD
 from FreeCAD import Base
 try:
@@ -45,25 +47,38 @@ from Part import BSplineCurve, Shape, Wire, Face, makePolygon, \
 
 from inspect import currentframe    #for debugging
 
+from cycloidDiagnostics import remove_orphans
+
+# The FreeCAD-free math lives in cycloidMath, re-exported here for existing callers
+from cycloidMath import (MIN_TOOTH_COUNT, MAX_TOOTH_COUNT, DEG_TO_RAD, RAD_TO_DEG,
+                         MIN_ECCENTRICITY, MIN_ROLLER_DIAMETER, MIN_SHAFT_DIAMETER,
+                         MIN_PRESSURE_ANGLE_LIMIT, MAX_PRESSURE_ANGLE_LIMIT,
+                         ParameterValidationError, validate_parameters, validate_profile, check_feasibility,
+                         to_polar, to_rect, calcyp, calc_x, calc_y,
+                         calc_pressure_limit, check_limit, calculate_radii, calculate,
+                         clean1, driver_shaft_hole, calculate_pressure_angle,
+                         calculate_pressure_limit, calculate_min_max_radii,
+                         calc_DriveHoleRRadius, generate_slot_size,
+                         generate_default_parameters, ProfilePipeline,
+                         PART_NAMES, part_fingerprint, parameter_fingerprint,
+                         pack_geometry_state, unpack_geometry_state, GearBoxParameters,
+                         GenerationCancelled, CancellationToken)
+
 # Setup logging - only show warnings and errors by default
 logger = logging.getLogger(__name__)
 # Only configure if not already configured
 if not logging.getLogger().handlers:
     logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
 
-# Thread-safe lock for generate_parts
+# Thread-safe lock for generate_parts, guards the per-document locks
 _generate_parts_lock = threading.Lock()
+_document_locks = {}
+# documents each thread is generating, so a recompute calling back in is skipped
+_generating = threading.local()
+
+# Cached profile stages, so regenerating after a limit circle change skips the sampling
+_profile_pipeline = ProfilePipeline()
 
-# Module-level constants
-MIN_TOOTH_COUNT = 3
-MAX_TOOTH_COUNT = 50
-DEG_TO_RAD = math.pi / 180.0
-RAD_TO_DEG = 180.0 / math.pi
-MIN_ECCENTRICITY = 0.1
-MIN_ROLLER_DIAMETER = 0.1
-MIN_SHAFT_DIAMETER = 0.1
-MIN_PRESSURE_ANGLE_LIMIT = 10.0
-MAX_PRESSURE_ANGLE_LIMIT = 85.0
 
 """ style guide
 def functions_are_lowercase(variables_as_well):
@@ -74,10 +89,6 @@ SomeClass.some_variable
 """
 
 
-class ParameterValidationError(ValueError):
-    """Raised when gearbox parameters are invalid."""
-    pass
-
 def get_linenumber() -> int:
     """Get the current line number for debugging."""
     cf = currentframe()
@@ -88,177 +99,6 @@ def QT_TRANSLATE_NOOP(scope: str, text: str) -> str:
     return text
 
 
-def validate_parameters(parameters: Dict[str, Any]) -> None:
-    """Validate gearbox parameters for physical and mathematical constraints.
-
-    Args:
-        parameters: Dictionary containing gearbox parameters
-
-    Raises:
-        ParameterValidationError: If any parameter is invalid
-
-    Returns:
-        None
-    """
-    # Tooth count validation
-    tooth_count = parameters.get("tooth_count", 0)
-    if not isinstance(tooth_count, int) or tooth_count < MIN_TOOTH_COUNT:
-        raise ParameterValidationError(
-            f"tooth_count must be an integer >= {MIN_TOOTH_COUNT}, got {tooth_count}")
-    if tooth_count > MAX_TOOTH_COUNT:
-        raise ParameterValidationError(
-            f"tooth_count must be <= {MAX_TOOTH_COUNT}, got {tooth_count}")
-
-    # Eccentricity validation
-    eccentricity = parameters.get("eccentricity", 0)
-    if eccentricity < MIN_ECCENTRICITY:
-        raise ParameterValidationError(
-            f"eccentricity must be >= {MIN_ECCENTRICITY}, got {eccentricity}")
-
-    # Roller diameter validation
-    roller_diameter = parameters.get("roller_diameter", 0)
-    if roller_diameter < MIN_ROLLER_DIAMETER:
-        raise ParameterValidationError(
-            f"roller_diameter must be >= {MIN_ROLLER_DIAMETER}, got {roller_diameter}")
-
-    # Eccentricity should not be more than roller radius
-    roller_radius = roller_diameter / 2.0
-    if eccentricity > roller_radius:
-        logger.warning(
-            f"eccentricity ({eccentricity}) > roller_radius ({roller_radius}). "
-            f"This may cause manufacturing issues.")
-
-    # Roller circle diameter validation
-    roller_circle_diameter = parameters.get("roller_circle_diameter", 0)
-    if roller_circle_diameter <= roller_diameter:
-        raise ParameterValidationError(
-            f"roller_circle_diameter ({roller_circle_diameter}) must be > "
-            f"roller_diameter ({roller_diameter})")
-
-    # Shaft diameter validation
-    shaft_diameter = parameters.get("shaft_diameter", 0)
-    if shaft_diameter < MIN_SHAFT_DIAMETER:
-        raise ParameterValidationError(
-            f"shaft_diameter must be >= {MIN_SHAFT_DIAMETER}, got {shaft_diameter}")
-
-    # Pressure angle limit validation
-    pressure_angle_limit = parameters.get("pressure_angle_limit", 0)
-    if pressure_angle_limit < MIN_PRESSURE_ANGLE_LIMIT:
-        raise ParameterValidationError(
-            f"pressure_angle_limit must be >= {MIN_PRESSURE_ANGLE_LIMIT}, got {pressure_angle_limit}")
-    if pressure_angle_limit > MAX_PRESSURE_ANGLE_LIMIT:
-        raise ParameterValidationError(
-            f"pressure_angle_limit must be <= {MAX_PRESSURE_ANGLE_LIMIT}, got {pressure_angle_limit}")
-
-    # Diameter validation
-    diameter = parameters.get("Diameter", 0)
-    if diameter <= roller_circle_diameter:
-        raise ParameterValidationError(
-            f"Diameter ({diameter}) must be > roller_circle_diameter ({roller_circle_diameter})")
-
-    # Driver circle diameter validation
-    driver_circle_diameter = parameters.get("driver_circle_diameter", 0)
-    if driver_circle_diameter <= shaft_diameter:
-        raise ParameterValidationError(
-            f"driver_circle_diameter ({driver_circle_diameter}) must be > "
-            f"shaft_diameter ({shaft_diameter})")
-
-    # Height validations
-    base_height = parameters.get("base_height", 0)
-    disk_height = parameters.get("disk_height", 0)
-    if base_height <= 0 or disk_height <= 0:
-        raise ParameterValidationError(
-            f"Heights must be positive: base_height={base_height}, disk_height={disk_height}")
-
-    # Driver disk hole count
-    driver_disk_hole_count = parameters.get("driver_disk_hole_count", 0)
-    if driver_disk_hole_count < 3:
-        raise ParameterValidationError(
-            f"driver_disk_hole_count must be >= 3, got {driver_disk_hole_count}")
-
-    logger.info("Parameter validation passed")
-
-
-def to_polar(x: float, y: float) -> Tuple[float, float]:
-    """Convert Cartesian to polar coordinates.
-
-    Args:
-        x: X coordinate
-        y: Y coordinate
-
-    Returns:
-        Tuple of (radius, angle_in_radians)
-    """
-    return (x ** 2.0 + y ** 2.0) ** 0.5, math.atan2(y, x)
-
-
-def to_rect(r: float, a: float) -> Tuple[float, float]:
-    """Convert polar to Cartesian coordinates.
-
-    Args:
-        r: Radius
-        a: Angle in radians
-
-    Returns:
-        Tuple of (x, y) coordinates
-    """
-    return r * math.cos(a), r * math.sin(a)
-
-                                                                              
-def calcyp(p: float, a: float, e: float, n: int) -> float:
-    """Calculate pressure angle offset parameter.
-
-    Args:
-        p: Pitch parameter
-        a: Angle
-        e: Eccentricity
-        n: Tooth count
-
-    Returns:
-        Pressure angle offset in radians
-
-    Raises:
-        ValueError: If denominator is too close to zero
-    """
-    denominator = math.cos(n*a) + (n*p)/(e*(n+1))
-    if abs(denominator) < 1e-10:
-        raise ValueError(f"Division by zero in calcyp at angle {a}")
-    return math.atan(math.sin(n*a) / denominator)
-
-def calc_x(p: float, roller_diameter: float, eccentricity: float,
-           tooth_count: int, angle: float) -> float:
-    """Calculate X coordinate of cycloidal disk point.
-
-    Args:
-        p: Pitch parameter
-        roller_diameter: Diameter of roller pins
-        eccentricity: Eccentricity of disk
-        tooth_count: Number of teeth
-        angle: Angle in radians
-
-    Returns:
-        X coordinate
-    """
-    return (tooth_count*p)*math.cos(angle)+eccentricity*math.cos((tooth_count+1)*angle)-roller_diameter/2*math.cos(calcyp(p,angle,eccentricity,tooth_count)+angle)
-
-def calc_y(p: float, roller_diameter: float, eccentricity: float,
-           tooth_count: int, angle: float) -> float:
-    """Calculate Y coordinate of cycloidal disk point.
-
-    Args:
-        p: Pitch parameter
-        roller_diameter: Diameter of roller pins
-        eccentricity: Eccentricity of disk
-        tooth_count: Number of teeth
-        angle: Angle in radians
-
-    Returns:
-        Y coordinate
-    """                                                     
-    return (tooth_count*p)*math.sin(angle)+eccentricity*math.sin((tooth_count+1)*angle)-roller_diameter/2*math.sin(calcyp(p,angle,eccentricity,tooth_count)+angle)
-         
-
-
 def buildCurve(self, obj):
         pts = self.Points[obj.FirstIndex:obj.LastIndex+1]
         bs = Part.BSplineCurve()
@@ -284,81 +124,7 @@ def buildCurve(self, obj):
             bs.setPole(int(bs.NbPoles),self.Points[-1])
         self.curve = bs 
 
-# calc_pressure_angle removed - duplicate of calculate_pressure_angle below
-
-def calc_pressure_limit(pin_circle_radius,roller_diameter,eccentricity,angle):
-    ex = 2**0.5        
-    rg = pin_circle_radius/ex
-    q = (pin_circle_radius**2 + rg**2 - 2*pin_circle_radius*rg*math.cos(angle))**0.5
-    x = rg - eccentricity + (q-roller_diameter/2)*(pin_circle_radius*math.cos(angle)-rg)/q
-    y = (q-roller_diameter/2)*pin_circle_radius*math.sin(angle)/q
-    return (x**2 + y**2)**0.5
-
-def check_limit(x,y,maxrad,minrad,offset):
-    r, a = to_polar(x, y)
-    if (r > maxrad) or (r < minrad):
-            r = r - offset
-            x, y = to_rect(r, a)
-    return x, y
-
-
-def calculate_radii(pin_count: int, eccentricity, outer_diameter, pin_diameter:float):
-    """Calculate radii for epitrochoid generation.
-
-    :param pin_count: Number of teeth of cycloidal gear
-    :param eccentricity: offset of cycloidal gear
-    :param outer_diameter: diameter of gear
-    :param pin_diameter: diameter of pins
-    :return: r1,r2 (formulas used for calculating points along the array)
-    """
-    outer_radius = outer_diameter / 2.0
-    pin_radius = pin_diameter / 2.0
-
-    # Clamp pin count to valid range
-    if pin_count < MIN_TOOTH_COUNT:
-        logger.warning(f"pin_count {pin_count} < {MIN_TOOTH_COUNT}, clamping to minimum")
-        pin_count = MIN_TOOTH_COUNT
-    if pin_count > MAX_TOOTH_COUNT:
-        logger.warning(f"pin_count {pin_count} > {MAX_TOOTH_COUNT}, clamping to maximum")
-        pin_count = MAX_TOOTH_COUNT
-
-    # e cannot be larger than r (d/2)
-    if eccentricity > pin_radius:
-        logger.warning(f"eccentricity {eccentricity} > pin_radius {pin_radius}, clamping")
-        eccentricity = pin_radius
-
-    # Validate r based on R and N: cannot be larger than R * sin(pi/N) or the circles won't fit
-    max_pin_radius = outer_radius * math.sin(math.pi) / pin_count
-    if pin_radius > max_pin_radius:
-        logger.warning(f"pin_radius {pin_radius} > max {max_pin_radius}, clamping")
-        pin_radius = max_pin_radius
-
-    inset = pin_radius
-    angle = 360 / pin_count
-
-    # To draw an epitrochoid, we need r1 (big circle), r2 (small rolling circle) and d (displacement of point)
-    # r1 + r2 = R = D/2
-    # r1/r2 = (N-1)
-    # From the above equations: r1 = (N - 1) * R/N, r2 = R/N
-    r1 = (pin_count - 1)* outer_radius / pin_count
-    r2 = outer_radius / pin_count
-    return r1,r2
-
-def calculate(step : int, eccentricity, r1, r2: float):
-    X = (r1 + r2) * math.cos(2 * math.pi * step) + eccentricity * math.cos((r1 + r2) * 2 * math.pi * step / r2)
-    Y = (r1 + r2) * math.sin(2 * math.pi * step) + eccentricity * math.sin((r1 + r2) * 2 * math.pi * step / r2)
-    return X,Y,0.0
-
-def clean1(a: float) -> float:
-    """Clamp value to range [-1, 1].
-
-    Args:
-        a: Value to clamp
-
-    Returns:
-        Clamped value between -1 and 1
-    """
-    return min(1, max(a, -1))
+# calc_pressure_angle removed - duplicate of calculate_pressure_angle in cycloidMath
 
 def fcvec(x: List[float]) -> App.Vector:
     """Convert list to FreeCAD Vector.
@@ -390,11 +156,6 @@ def make_bspline_wire(pts):
         wi.append(out.toShape())
     return Wire(wi)
 
-def driver_shaft_hole(radius,hole_count,hole_number):        
-    x = radius * math.cos((2.0 * math.pi / hole_count) * hole_number)
-    y = radius * math.sin((2.0 * math.pi / hole_count) * hole_number)
-    return x,y
-
 def newSketch(body,name=''):
     """ all sketches are centered around xyplane"""
     name = name + 'Sketch'
@@ -474,97 +235,11 @@ def SketchCircle(sketch,x,y,diameter,last,Name="",ref=False):
 def SketchCircleOfHoles(sketch,circle_radius,hole_radius,hole_count,orgx,orgy,name):
     last = -1
     for i in range(hole_count):
+        check_cancelled()
         x = orgx + circle_radius * math.cos((2.0 * math.pi / hole_count) * i)
         y = orgy + circle_radius * math.sin((2.0 * math.pi / hole_count) * i)        
         last = SketchCircle(sketch,x,y,hole_radius,last,"")#name + i)
 
-def calculate_pressure_angle(p,roller_diameter,tooth_count,angle):
-    """Calculate pressure angle at given angle.
-
-    Args:
-        p: Pitch parameter
-        roller_diameter: Diameter of roller
-        tooth_count: Number of teeth
-        angle: Angle in radians
-
-    Returns:
-        Pressure angle in degrees
-
-    Raises:
-        ValueError: If calculation results in invalid domain for asin
-    """
-    ex = 2**0.5
-    r3 = p * tooth_count
-    rg = r3/ex
-    pp = rg * (ex**2 + 1 - 2*ex*math.cos(angle))**0.5 - roller_diameter/2
-
-    # Protect against math domain errors in asin
-    denominator = pp + roller_diameter/2
-    if abs(denominator) < 1e-10:
-        raise ValueError(f"Division by zero in pressure angle calculation at angle {angle}")
-
-    asin_arg = (r3*math.cos(angle)-rg) / denominator
-
-    # Clamp to valid asin domain [-1, 1]
-    if asin_arg < -1.0 or asin_arg > 1.0:
-        logger.warning(f"asin argument {asin_arg} out of range [-1,1], clamping")
-        asin_arg = max(-1.0, min(1.0, asin_arg))
-
-    return math.asin(asin_arg) * RAD_TO_DEG
-
-    
-
-def calculate_pressure_limit(p,roller_diameter,eccentricity,tooth_count,a):                                    
-    #print("calc_pressure_limit",p,roller_diameter,eccentricity,tooth_count,a)
-    ex = 2**0.5
-    r3 = p*tooth_count
-    rg = r3/ex
-    q = (r3**2 + rg**2 - 2*r3*rg*math.cos(a))**0.5
-    x = rg - eccentricity + (q-roller_diameter/2)*(r3*math.cos(a)-rg)/q
-    y = (q-roller_diameter/2)*r3*math.sin(a)/q
-    return (x**2 + y**2)**0.5
-
-
-def calculate_min_max_radii(parameters):    
-    """ Find the pressure angle limit circles """
-    pin_circle_radius = parameters["roller_circle_diameter"] / 2.0
-    tooth_count = parameters["tooth_count"]
-    roller_diameter = parameters["roller_diameter"]
-    pressure_angle_limit = parameters["pressure_angle_limit"]
-    eccentricity = parameters["eccentricity"]
-    p = pin_circle_radius / tooth_count
-    
-    minAngle = -1.0
-    maxAngle = -1.0
-    for i in range(0, 180):
-        x = calculate_pressure_angle(p,roller_diameter,tooth_count, i * math.pi / 180.)
-        if ( x < pressure_angle_limit) and (minAngle < 0):
-            minAngle = float(i)
-        if (x < -pressure_angle_limit) and (maxAngle < 0):
-            maxAngle = float(i-1)
-    #print("min/max angle",minAngle,maxAngle)
-    min_radius = calculate_pressure_limit(p,roller_diameter,eccentricity,tooth_count, minAngle * math.pi / 180.)
-    max_radius = calculate_pressure_limit(p,roller_diameter,eccentricity,tooth_count, maxAngle * math.pi / 180.)
-    #print("min/max Radius",min_radius,max_radius)
-
-    return min_radius, max_radius
-
-                
-
-def calc_DriveHoleRRadius(driver_circle_diameter,shaft_diameter):
-    """ Calculates the radius that the drive holes are in
-    about 1/2 way between rollers and central shaft."""  
-    #not using parameters as these values might be resized from requested  
-    cent = (driver_circle_diameter/2+shaft_diameter)/2
-    return cent    
-
-def generate_slot_size(parameters,add_clearence):        
-    key_radius = parameters["key_diameter"]/2
-    key_flat = parameters["key_flat_diameter"] -key_radius    
-    key_radius += add_clearence /2
-    key_flat += add_clearence /2
-    return key_radius,key_flat
-
 
 def generate_key_sketch(parameters,add_clearence,sketch,Offset=0):    
     key_radius,key_flat = generate_slot_size(parameters,add_clearence)
@@ -581,8 +256,9 @@ def generate_key_sketch(parameters,add_clearence,sketch,Offset=0):
    
     
 
-def generate_pin_disk_part(part,parameters):
-    """ create the base that the fixed_ring_pins will be attached to """
+def generate_pin_disk_part(part,parameters,linked=False):
+    """ create the base that the fixed_ring_pins will be attached to
+    with linked the rollers are left out, generate_parts links them in """
     sketch = newSketch(part,'DriverDiskBase')
     
     tooth_count = parameters["tooth_count"]
@@ -611,16 +287,41 @@ def generate_pin_disk_part(part,parameters):
     newPad(part,sketch1,base_height,'outside')
     #base is done, now for the rollers
     
+    if linked:
+        # the rollers are a separate body placed by links, see generate_pin_roller_part;
+        # only the joiner holes the pattern used to cut into the base are made here
+        pinsketch2 = newSketch(part,'pinSketchFemale')
+        SketchCircleOfHoles(pinsketch2,roller_circle_diameter /2 + clearance,roller_diameter/4.0+clearance,
+                            tooth_count+1,0,0,"roller_circle_diameter_female")
+        join = newPocket(part,pinsketch2,pin_height,'pinJoiner')
+        part.Tip = join
+        return
+    pad, rol, join, pinsketch = generate_pin_roller_features(part,parameters)
+    pol = newPolar(part,pad,pinsketch,tooth_count+1,'pin')
+    pol.Originals = [pad,rol,join]
+    pad.Visibility = False
+    rol.Visibility = False
+    join.Visibility = False    
+    pol.Visibility = True
+    part.Tip = pol
+
+def generate_pin_roller_features(part,parameters):
+    """ the pin, roller and joiner of the first roller, at angle 0
+    returns (pin pad, roller pad, joiner pocket, pin sketch) """
+    tooth_count = parameters["tooth_count"]
+    roller_diameter = parameters["roller_diameter"]
+    base_height = parameters["base_height"]
+    clearance = parameters["clearance"]
+    roller_circle_diameter = parameters["roller_circle_diameter"]
+    driver_disk_height = parameters["disk_height"]
+    pin_height = driver_disk_height*3
+
     roller_ring_radius = roller_circle_diameter /2 + clearance
     pinsketch = newSketch(part,'pinMale')    
     SketchCircle(pinsketch,roller_ring_radius,0,roller_diameter/4.0,-1,"roller_circle_diameter_male")
     pad = newPad(part,pinsketch,base_height+pin_height+driver_disk_height,'pinMale')    
     
     pinsketch1 = newSketch(part,'roller')
-    p = roller_ring_radius / tooth_count
-    i = 0
-    x = p * tooth_count * math.cos(2 * math.pi / (tooth_count + 1) * i)
-    y = p * tooth_count * math.sin(2 * math.pi / (tooth_count + 1) * i)
     SketchCircle(pinsketch1,roller_ring_radius,0,roller_diameter,-1,"roller_circle_diameter_roller")
     rol = newPad(part,pinsketch1,base_height+pin_height,"Roller")
     
@@ -628,13 +329,14 @@ def generate_pin_disk_part(part,parameters):
     SketchCircle(pinsketch2,roller_ring_radius,0,roller_diameter/4.0+clearance,-1,"roller_circle_diameter_female")
     
     join = newPocket(part,pinsketch2,pin_height,'pinJoiner')    
-    pol = newPolar(part,pad,pinsketch,tooth_count+1,'pin')
-    pol.Originals = [pad,rol,join]
+    return pad, rol, join, pinsketch
+
+def generate_pin_roller_part(part,parameters):
+    """ one roller with its pin as a body of its own, for instancing by a link array """
+    pad, rol, join, pinsketch = generate_pin_roller_features(part,parameters)
     pad.Visibility = False
     rol.Visibility = False
-    join.Visibility = False    
-    pol.Visibility = True
-    part.Tip = pol
+    part.Tip = join
 
 def generate_driver_disk_part(part,parameters):
     sketch = newSketch(part,'DriverDiskBase')            
@@ -713,41 +415,55 @@ def generate_input_shaft_part(body,parameters):
     body.Tip = inputkey_pocket
 
 def generate_cycloidal_disk_array(parameters):
-    tooth_count = parameters["tooth_count"]
-    tooth_pitch = parameters["tooth_pitch"]
-    pin_circle_radius = parameters["roller_circle_diameter"] / 2.0
-    roller_diameter = parameters["roller_diameter"]
-    eccentricity = parameters["eccentricity"]
-    line_segment_count = parameters["line_segment_count"]
-    pressure_angle_offset = parameters["pressure_angle_offset"]
-    pressure_angle_limit = parameters["pressure_angle_limit"]
-    min_radius = parameters["min_rad"]
-    max_radius = parameters["max_rad"]
-    p = pin_circle_radius / tooth_count
     """ make the array to be used in the bspline
         that is the cycloidalDisk
     """
-    q = 2 * math.pi / float(line_segment_count)
-    # Find the pressure angle limit circles
-
-    i=0
-    x = calc_x(p,  roller_diameter, eccentricity, tooth_count, q*i / float(tooth_count))
-    y = calc_y(p,  roller_diameter, eccentricity, tooth_count, q*i / tooth_count)
-    x, y = check_limit(x,y,max_radius,min_radius,pressure_angle_offset)
-    
-    cycloidal_disk_array = [Base.Vector(x-eccentricity, y, 0)]
-    for i in range(0,line_segment_count):
-        x = calc_x(p,  roller_diameter, eccentricity, tooth_count, q*(i+1) / tooth_count)
-        y = calc_y(p,  roller_diameter, eccentricity, tooth_count, q*(i+1)/ tooth_count)
-        x, y = check_limit(x,y,max_radius,min_radius,pressure_angle_offset)        
-        cycloidal_disk_array.append([x-eccentricity, y, 0])
-    
-    #cycloidal_disk_array.append(cycloidal_disk_array[0])
-    #print("diskarray")
-    #print(cycloidal_disk_array)
+    # the calc_x/calc_y sampling and check_limit truncation are cached stages
+    profile = _profile_pipeline.profile(parameters)
+    cycloidal_disk_array = [Base.Vector(profile[0, 0], profile[0, 1], 0)]
+    cycloidal_disk_array += [[x, y, 0] for x, y in profile[1:].tolist()]
     return cycloidal_disk_array
 
 
+def generate_cycloidal_disk_curves(parameters):
+    """ the tooth_count bsplines of the disk outline, ready for the sketch.
+    The spline fit and the rotated copies are cached on the profile key """
+    tooth_count = parameters["tooth_count"]
+    eccentricity = parameters["eccentricity"]
+    profile_key = _profile_pipeline.profile_key(parameters)
+
+    def fit():
+        check_cancelled()
+        return make_bspline([generate_cycloidal_disk_array(parameters)])[0]
+
+    def rotate():
+        mat = App.Matrix()
+        mat.move(App.Vector(eccentricity, 0., 0.))
+        mat.rotateZ(2 * np.pi / tooth_count)
+        mat.move(App.Vector(-eccentricity, 0., 0.))
+        # transform works in place, so rotate a copy and never the cached fit
+        w0 = _profile_pipeline.stage("spline", profile_key, fit).copy()
+        curves = []
+        for _ in range(tooth_count):
+            check_cancelled()
+            w0.transform(mat)
+            curves.append(w0.copy())
+        return curves
+
+    return _profile_pipeline.stage("sketch", profile_key, rotate)
+
+
+def cycloidal_disk_placement(parameters,DiskOne):
+    """ the second disk sits one disk_height higher and is turned against the first """
+    tooth_count = parameters["tooth_count"]
+    if DiskOne:
+        offset = 0.0
+        rot = 180 - (tooth_count+1)/tooth_count
+    else:
+        offset = parameters["disk_height"]
+        rot = 0
+    return Base.Placement(Base.Vector(0,0,parameters["base_height"]+offset),Base.Rotation(Base.Vector(0,0,1),rot))
+
 def generate_cycloidal_disk_part(part,parameters,DiskOne):    
     eccentricity = parameters["eccentricity"]
     base_height = parameters["base_height"]
@@ -757,34 +473,17 @@ def generate_cycloidal_disk_part(part,parameters,DiskOne):
     tooth_count = parameters["tooth_count"]
     disk_height = parameters["disk_height"]
     driver_circle_radius = parameters["driver_circle_diameter"]/2
-    offset = 0.0
-    rot = 180 - (tooth_count+1)/tooth_count
-    name = "cycloid001"
-    
-    mat= App.Matrix()
-    mat.move(App.Vector(eccentricity, 0., 0.))
-    mat.rotateZ(2 * np.pi / tooth_count)
-    mat.move(App.Vector(-eccentricity, 0., 0.))    
-    
-    #get shape of cycloidal disk
-    if not DiskOne: #second disk
-        offset = disk_height
-        rot = 0
-        name = "cycloid002"
+    name = "cycloid001" if DiskOne else "cycloid002"
 
     
-    array = generate_cycloidal_disk_array(parameters)    
     sketch = newSketch(part,name)    
-    wi = make_bspline([array])        
-    wires = []
-    
-    for _ in range(tooth_count):
-        w0 = wi[0]
-        w0.transform(mat)                
+    # addGeometry stores a copy, so the cached curves can be added to both disks
+    for w0 in generate_cycloidal_disk_curves(parameters):
+        check_cancelled()
         g = sketch.addGeometry(w0)
         sketch.addConstraint(Sketcher.Constraint('Block',g))                   
     
-    part.Placement = Base.Placement(Base.Vector(0*eccentricity,0,base_height+offset),Base.Rotation(Base.Vector(0,0,1),rot))    
+    part.Placement = cycloidal_disk_placement(parameters,DiskOne)
     SketchCircle(sketch,eccentricity,0,shaft_diameter +clearance,-1,"centerHole")        
     driver_hold_diameter = (parameters["driver_hole_diameter"]+eccentricity*2) 
     last = -1
@@ -869,22 +568,45 @@ def generate_output_shaft_part(part,parameters):
     
     keysketch = newSketch(part,'InputKey')
     generate_key_sketch(parameters,0,keysketch)
-    pad = newPad(part,keysketch,20)
+    keypad = newPad(part,keysketch,20,'OutputKey')
     part.Placement = Base.Placement(Base.Vector(0,0,base_height+disk_height*2),Base.Rotation(Base.Vector(0,0,1),0))
-    pol.Visibility = False
-    part.Tip = pol
-    pol.Visibility = True
+    # the key comes after the pattern, a Tip on the pattern would leave it out of the shape
+    part.Tip = keypad
+
+def remove_object(doc,name):
+    """ remove the object "name" and anything in it, if present """
+    obj = doc.getObject(name)
+    if obj is None:
+        return
+    if hasattr(obj,"removeObjectsFromDocument"):
+        obj.removeObjectsFromDocument()
+    doc.removeObject(name)
 
 def ready_part(doc,name):
     """ will create a body of "name" if not already present.
     if Is present, will delete anything in it """
     part = doc.getObject(name)
+    if part and part.TypeId != 'PartDesign::Body':
+        # a link left by an instanced build
+        remove_object(doc,name)
+        part = None
     if part:        
         part.removeObjectsFromDocument()
     else:
         part = doc.addObject('PartDesign::Body', name)        
     return part
 
+def ready_link(doc,name,source):
+    """ will create an App::Link of "name" to source, replacing a body of that name """
+    link = doc.getObject(name)
+    if link and link.TypeId != 'App::Link':
+        remove_object(doc,name)
+        link = None
+    if link is None:
+        link = doc.addObject('App::Link', name)
+    link.LinkedObject = source
+    return link
+
 def testcycloidal():
     if not App.ActiveDocument:
         App.newDocument()
@@ -893,74 +615,231 @@ def testcycloidal():
     part = ready_part(doc,'cycloidalDisk1')        
     return generate_cycloidal_disk_part(part,p,True)        
 
-def generate_parts(doc,parameters):
+# generate_part functions by body name, in the order generate_parts builds them
+PART_GENERATORS = {
+    "pinDisk": generate_pin_disk_part,
+    "driverDisk": generate_driver_disk_part,
+    "inputShaft": generate_input_shaft_part,
+    "cycloidalDisk1": lambda part, parameters: generate_cycloidal_disk_part(part, parameters, True),
+    "cycloidalDisk2": lambda part, parameters: generate_cycloidal_disk_part(part, parameters, False),
+    "eccentricKey": generate_eccentric_key_part,
+    "outputShaft": generate_output_shaft_part,
+}
+
+# With instancing, solids that repeat are built once and placed by App::Link:
+# the pinDisk rollers are one body shown by a link array, and cycloidalDisk2
+# is a link to cycloidalDisk1.  Extra objects each instanced part owns:
+PIN_ROLLER = "pinRoller"
+PIN_ROLLER_LINKS = "pinRollers"
+LINKED_PARTS = {
+    "pinDisk": (PIN_ROLLER, PIN_ROLLER_LINKS),
+    "cycloidalDisk2": (),
+}
+
+def generate_pin_roller_links(doc,parameters):
+    """ build the roller body once and a link array of tooth_count+1 copies of it
+    returns the roller body """
+    roller = ready_part(doc,PIN_ROLLER)
+    generate_pin_roller_part(roller,parameters)
+    count = parameters["tooth_count"]+1
+    links = ready_link(doc,PIN_ROLLER_LINKS,roller)
+    # without ShowElement the copies are not separate document objects
+    links.ShowElement = False
+    links.ElementCount = count
+    links.PlacementList = [Base.Placement(Base.Vector(0,0,0),Base.Rotation(Base.Vector(0,0,1),360.0*i/count))
+                           for i in range(count)]
+    roller.Visibility = False
+    return roller
+
+def generate_linked_part(doc,name,parameters):
+    """ build an instanced part, see LINKED_PARTS
+    returns the bodies to colour, a bare link shows the colour of what it links """
+    if name == "pinDisk":
+        part = ready_part(doc,name)
+        generate_pin_disk_part(part,parameters,linked=True)
+        return [part, generate_pin_roller_links(doc,parameters)]
+    # cycloidalDisk2 has the same sketch as cycloidalDisk1, only its placement differs
+    link = ready_link(doc,name,doc.getObject("cycloidalDisk1"))
+    link.Placement = cycloidal_disk_placement(parameters,False)
+    return []
+
+def recompute_scope(doc,objects):
+    """ recompute only objects, what they contain and what depends on them,
+    rather than the whole document.
+    returns (seconds taken, number of objects in the scope) """
+    scope = {}
+    for obj in objects:
+        for o in [obj] + list(getattr(obj,"Group",[])):
+            scope[o.Name] = o
+            for dependent in o.InListRecursive:
+                scope[dependent.Name] = dependent
+    start = time.perf_counter()
+    doc.recompute(list(scope.values()))
+    return time.perf_counter() - start, len(scope)
+
+def document_lock(doc):
+    """ the lock generate_parts holds while it works on doc """
+    with _generate_parts_lock:
+        return _document_locks.setdefault(doc.Name, threading.Lock())
+
+def check_cancelled():
+    """ raise GenerationCancelled if the running generate_parts was cancelled,
+    called between parts and inside the longer loops """
+    token = getattr(_generating, "token", None)
+    if token is not None:
+        token.check()
+
+def generate_parts(doc,parameters,built=None,instancing=False,timings=None,progress=None,cancel=None):
     """Generate all parts needed for the cycloidal gearbox.
 
-    Uses a thread-safe lock to prevent concurrent execution.
+    Calls for the same document are serialized: a call from another
+    thread waits for the running one to finish.  A call made from inside
+    a generation of the same document (a recompute calling back in) is
+    skipped.  Use cycloidService.GenerationService to queue and coalesce
+    requests from many threads.
 
     Args:
         doc: FreeCAD document object
-        parameters: Dictionary containing gearbox parameters
+        parameters: GearBoxParameters, or a dictionary of gearbox parameters
+            which gets min_rad and max_rad added
+        built: Part fingerprints returned by the previous call for this
+            document.  Parts whose fingerprint is unchanged and whose body
+            is still in the document are left alone.
+        instancing: Build repeated solids once and place copies with
+            App::Link (see LINKED_PARTS), so memory, file size and
+            recompute time grow with the distinct shapes rather than the
+            tooth count
+        timings: Optional dictionary that gets the seconds each generated
+            part took, "recompute" for the recompute of the generated
+            objects and "recompute_objects" for how many were recomputed
+        progress: Optional progress(fraction, message) called as each part
+            starts, before the recompute and at the end with 1.0
+        cancel: Optional CancellationToken, checked between parts and in
+            the profile, tooth and hole loops.  When cancelled, or when a
+            part fails, the document is rolled back to the bodies it had
+            before the call.  Undo is turned on for the call if the
+            document has it off.  Inside a transaction the caller opened,
+            rolling back is left to the caller.
 
     Returns:
-        None
+        Dictionary of part name to fingerprint of what is now in the
+        document, or None if this thread is already generating doc
 
     Raises:
         ParameterValidationError: If parameters are invalid
+        GenerationCancelled: If cancel was cancelled
     """
-    # Try to acquire lock, return immediately if already locked (prevents recursive calls)
-    if not _generate_parts_lock.acquire(blocking=False):
-        logger.info("generate_parts already running, skipping duplicate call")
-        return
-
+    active = _generating.__dict__.setdefault("documents", set())
+    if doc.Name in active:
+        logger.info("generate_parts already running for this document, skipping recursive call")
+        return None
+
+    lock = document_lock(doc)
+    lock.acquire()
+    active.add(doc.Name)
+    outer_token = getattr(_generating, "token", None)
+    _generating.token = cancel
     try:
         # Validate parameters before generating parts
         validate_parameters(parameters)
 
         """ will (re)create all bodys of all parts needed """
-        minr,maxr = calculate_min_max_radii(parameters)
-        parameters["min_rad"] = minr
-        parameters["max_rad"] = maxr
+        if not isinstance(parameters, GearBoxParameters):
+            # a plain dict gets the limit circles added, GearBoxParameters derives them itself
+            minr,maxr = _profile_pipeline.limit_radii(parameters)
+            parameters["min_rad"] = minr
+            parameters["max_rad"] = maxr
+        # a self-crossing outline makes the pad fail slowly, reject it before any body is touched
+        validate_profile(parameters)
+        # parts that overlap still build, so thin walls are reported rather than rejected
+        for violation in check_feasibility(parameters):
+            logger.warning(f"Feasibility: {violation.message}")
 
         logger.info("Creating cycloidal gearbox parts")
         random.seed(555)
-
-        part = ready_part(doc,'pinDisk')
-        generate_pin_disk_part(part,parameters)
-        logger.info("Generated pin disk")
-        part.ViewObject.ShapeColor = (random.random(),random.random(),random.random(),0.0)
-
-        part = ready_part(doc,'driverDisk')
-        generate_driver_disk_part(part,parameters)
-        logger.info("Generated driver disk")
-        part.ViewObject.ShapeColor = (random.random(),random.random(),random.random(),0.0)
-
-        part = ready_part(doc,'inputShaft')
-        generate_input_shaft_part(part,parameters)
-        logger.info("Generated input shaft")
-        part.ViewObject.ShapeColor = (random.random(),random.random(),random.random(),0.0)
-
-        part = ready_part(doc,'cycloidalDisk1')
-        generate_cycloidal_disk_part(part,parameters,True)
-        logger.info("Generated cycloidal disk 1")
-        part.ViewObject.ShapeColor = (random.random(),random.random(),random.random(),0.0)
-
-        part = ready_part(doc,'cycloidalDisk2')
-        generate_cycloidal_disk_part(part,parameters,False)
-        logger.info("Generated cycloidal disk 2")
-        part.ViewObject.ShapeColor = (random.random(),random.random(),random.random(),0.0)
-
-        part = ready_part(doc,'eccentricKey')
-        generate_eccentric_key_part(part,parameters)
-        logger.info("Generated eccentric key")
-        part.ViewObject.ShapeColor = (random.random(),random.random(),random.random(),0.0)
-
-        part = ready_part(doc,'outputShaft')
-        generate_output_shaft_part(part,parameters)
-        logger.info("Generated output shaft")
-        part.ViewObject.ShapeColor = (random.random(),random.random(),random.random(),0.0)
-
-        doc.recompute()
+        built = built or {}
+        fingerprints = {}
+        timings = {} if timings is None else timings
+        # bodies and links made or rebuilt, the only objects the recompute needs
+        generated = []
+        # what the rebuilt bodies held before, none of it should be left outside a body
+        replaced = set()
+
+        todo = []
+        for name in PART_NAMES:
+            # draw the colour even for skipped parts so every part keeps its colour
+            color = (random.random(),random.random(),random.random(),0.0)
+            linked = instancing and name in LINKED_PARTS
+            fingerprint = part_fingerprint(name, parameters)
+            if linked:
+                # a linked build is a different set of objects, never reuse one for the other
+                fingerprint += ":linked"
+            fingerprints[name] = fingerprint
+            objects = (name,) + (LINKED_PARTS[name] if linked else ())
+            if built.get(name) == fingerprint and all(doc.getObject(o) for o in objects):
+                logger.info(f"{name} unchanged, not regenerated")
+                continue
+            todo.append((name, color, linked, objects))
+
+        # one step per part and one for the recompute
+        steps = len(todo) + 1
+        report = progress or (lambda fraction, message: None)
+        # a caller's open transaction already covers this call, and rolls it back itself
+        transaction = bool(todo) and not getattr(doc, "HasPendingTransaction", False)
+        undo_mode = getattr(doc, "UndoMode", 1)
+        # names of the bodies and links touched, what an abort has to recompute
+        started = []
+        if transaction:
+            if not undo_mode:
+                # without undo a cancelled generation would leave half rebuilt bodies
+                doc.UndoMode = 1
+            doc.openTransaction("Generate gearbox")
+        try:
+            for step, (name, color, linked, objects) in enumerate(todo):
+                check_cancelled()
+                report(step / steps, f"Generating {name}")
+                start = time.perf_counter()
+                started += objects + LINKED_PARTS.get(name, ())
+                for o in objects + LINKED_PARTS.get(name, ()):
+                    replaced.update(child.Name for child in getattr(doc.getObject(o),"Group",[]))
+                if linked:
+                    bodies = generate_linked_part(doc,name,parameters)
+                else:
+                    # drop the objects an earlier instanced build left
+                    for extra in LINKED_PARTS.get(name, ()):
+                        remove_object(doc,extra)
+                    bodies = [ready_part(doc,name)]
+                    PART_GENERATORS[name](bodies[0],parameters)
+                for part in bodies:
+                    # headless (FreeCADCmd) bodies have no view object
+                    if part.ViewObject is not None:
+                        part.ViewObject.ShapeColor = color
+                generated += [doc.getObject(o) for o in objects]
+                timings[name] = time.perf_counter() - start
+                logger.info(f"Generated {name} in {timings[name]:.3f}s")
+
+            # anything of the old bodies that survived their rebuild would pile up over a session
+            remove_orphans(doc,replaced)
+            check_cancelled()
+            if generated:
+                report(len(todo) / steps, "Recomputing")
+                timings["recompute"], timings["recompute_objects"] = recompute_scope(doc,generated)
+                logger.info(f"Recomputed {timings['recompute_objects']} objects in {timings['recompute']:.3f}s")
+        except BaseException:
+            if transaction:
+                # put back the bodies as they were before this call, only they need a recompute
+                doc.abortTransaction()
+                restored = [o for o in (doc.getObject(n) for n in started) if o is not None]
+                if restored:
+                    recompute_scope(doc,restored)
+            raise
+        else:
+            if transaction:
+                doc.commitTransaction()
+        finally:
+            if transaction and not undo_mode:
+                doc.UndoMode = undo_mode
+        report(1.0, "Done")
 
         # Fit all parts in view so the model is visible
         if GUI_AVAILABLE:
@@ -968,37 +847,75 @@ def generate_parts(doc,parameters):
                 Gui.SendMsgToActiveView("ViewFit")
             except Exception as e:
                 logger.debug(f"Could not fit view: {e}")
+        return fingerprints
     finally:
         # Always release lock, even if exception occurs
-        _generate_parts_lock.release()
-    
-    
-def generate_default_parameters():
-    parameters = {
-        "eccentricity": 2.0,#4.7 / 2,
-        "tooth_count": 11,#12,
-        "driver_disk_hole_count": 6,
-        "driver_hole_diameter": 10,
-        "driver_circle_diameter": 50.0,
-        "line_segment_count": 42, #tooth_count squared
-        "tooth_pitch": 4,
-        "Diameter" : 95,#110,
-        "roller_diameter": 9.4,
-        "roller_circle_diameter" : 80,
-        "pressure_angle_limit": 50.0,
-        "pressure_angle_offset": 0.1,
-        "base_height":10.0,
-        "disk_height":5.0,
-        "shaft_diameter":13.0,
-        "key_diameter":5,
-        "key_flat_diameter": 4.8,
-        "Height" : 20.0,
-        "clearance" : 0.5        
-        }
-    minr,maxr = calculate_min_max_radii(parameters)            
-    parameters["min_rad"] = minr
-    parameters["max_rad"] = maxr
-    return parameters
+        _generating.token = outer_token
+        active.discard(doc.Name)
+        lock.release()
+
+
+def export_geometry_state(parameters, fingerprints):
+    """Pack what was built for parameters into a blob for the document.
+
+    Holds the parameter hash, the part fingerprints and, when the profile
+    stages still hold this gearbox's disk, the profile points and the
+    fitted spline so they need not be recomputed after reopening.
+
+    Args:
+        parameters: Parameters of the last build
+        fingerprints: Part fingerprints returned by generate_parts
+
+    Returns:
+        ASCII blob, see cycloidMath.pack_geometry_state
+    """
+    names = sorted(fingerprints)
+    arrays = {"parameter_hash": np.array(parameter_fingerprint(parameters)),
+              "part_names": np.array(names),
+              "part_fingerprints": np.array([fingerprints[n] for n in names])}
+    key = _profile_pipeline.profile_key(parameters)
+    profile = _profile_pipeline.cached("profile")
+    spline = _profile_pipeline.cached("spline")
+    if profile and profile[0] == key:
+        arrays["profile_key"] = np.array(json.dumps(list(key)))
+        arrays["profile"] = profile[1]
+    if spline and spline[0] == key:
+        curve = spline[1]
+        arrays["spline_poles"] = np.array([tuple(v) for v in curve.getPoles()])
+        arrays["spline_knots"] = np.array(curve.getKnots())
+        arrays["spline_mults"] = np.array(curve.getMultiplicities())
+        arrays["spline_degree"] = np.array(curve.Degree)
+    return pack_geometry_state(arrays)
+
+
+def import_geometry_state(blob):
+    """Restore a blob written by export_geometry_state.
+
+    The profile and spline go back into the profile stages, so the first
+    rebuild after opening a document does not sample or fit them again.
+
+    Args:
+        blob: ASCII blob from export_geometry_state
+
+    Returns:
+        (parameter hash, part fingerprints)
+
+    Raises:
+        ValueError: If blob is not a geometry state
+    """
+    arrays = unpack_geometry_state(blob)
+    fingerprints = dict(zip(arrays["part_names"].tolist(), arrays["part_fingerprints"].tolist()))
+    if "profile_key" in arrays:
+        key = tuple(json.loads(str(arrays["profile_key"])))
+        _profile_pipeline.seed("profile", key, arrays["profile"])
+        if "spline_poles" in arrays:
+            curve = BSplineCurve()
+            curve.buildFromPolesMultsKnots([fcvec(p) for p in arrays["spline_poles"].tolist()],
+                                           arrays["spline_mults"].tolist(), arrays["spline_knots"].tolist(),
+                                           False, int(arrays["spline_degree"]))
+            _profile_pipeline.seed("spline", key, curve)
+    return str(arrays["parameter_hash"]), fingerprints
+
 
 def test_parts():
     if not App.ActiveDocument:
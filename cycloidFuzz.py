@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Randomised stress runs of the generator pipeline with time and memory budgets.
+
+fuzz draws random parameter sets that pass validate_parameter_table
+over a range of gearbox diameters. Each set goes through the stages of
+PIPELINE (validation, limit circles, profile check, feasibility, contact
+geometry and the cycloidStl meshes of every part) and, with
+generate=True, a headless generate_parts when FreeCAD can be imported.
+Every case runs in a child process of its own:
+
+    slow      the stages took longer than time_budget seconds
+    timeout   still running after HARD_LIMIT_FACTOR * time_budget, killed
+    memory    MemoryError, or the peak RSS grew by more than memory_budget
+    flood     more than max_log_records warnings were logged
+    error     any other exception
+
+A ParameterValidationError is an "invalid" case, the generator refusing
+the parameters as it should, and not a failure.
+
+Each failure is minimized: one parameter at a time is put back to its
+default, or bisected towards it, as long as the same failure remains.
+The result is written as a JSON file that load_case reads back:
+
+    cycloidFuzz.run_case(cycloidFuzz.load_case("fuzz/fuzz-0-3-slow.json"))
+
+Example:
+    import cycloidFuzz
+    report = cycloidFuzz.fuzz(count=200, seed=1, time_budget=5.0, output_dir="fuzz")
+    for result in report.failures:
+        print(result.outcome, result.stage, result.detail)
+
+License 	LGPL V2.1
+Homepage https://github.com/iplayfast/CycloidGearBox
+"""
+
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing.connection import wait
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cycloidDiagnostics import peak_rss
+from cycloidMath import (PART_NAMES, ParameterValidationError, calculate_min_max_radii, check_feasibility,
+                         estimate_torque_capacity, generate_default_parameters, pin_contact_geometry,
+                         validate_parameter_table, validate_parameters, validate_profile)
+from cycloidOptimize import default_search_space, sample_candidates
+from cycloidStl import part_triangles
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIME_BUDGET = 10.0
+# A case is killed after this many time budgets
+HARD_LIMIT_FACTOR = 4.0
+DEFAULT_MEMORY_BUDGET = 512 << 20
+DEFAULT_MAX_LOG_RECORDS = 100
+# Outer diameters the random sets are drawn around
+DIAMETERS = (60.0, 95.0, 150.0)
+# Bisection steps per parameter when minimizing
+MINIMIZE_STEPS = 6
+MAX_MINIMIZE_RUNS = 64
+
+FAILURES = ("error", "timeout", "memory", "flood", "slow")
+
+
+class CaseResult(NamedTuple):
+    """What happened to one parameter set."""
+    parameters: Dict[str, Any]
+    outcome: str                # "ok", "invalid" or one of FAILURES
+    stage: str                  # stage running when it failed, "" if it finished
+    detail: str
+    seconds: Dict[str, float]   # per finished stage
+    memory: int                 # peak RSS growth in bytes, 0 if not measured
+    log_records: int            # warnings and errors logged
+
+
+class FuzzReport(NamedTuple):
+    """Outcome of fuzz."""
+    results: List[CaseResult]
+    failures: List[CaseResult]  # minimized when fuzz was asked to
+    files: List[str]            # case files written
+
+
+class LogFlood(Exception):
+    """Raised inside a case when it logs more than its limit."""
+
+
+class _CountingHandler(logging.Handler):
+    """Counts warnings and stops the case at the limit, so a flood costs no more time."""
+
+    def __init__(self, limit: int):
+        super().__init__(logging.WARNING)
+        self.limit = limit
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.count += 1
+        if self.count > self.limit:
+            raise LogFlood(f"more than {self.limit} warnings, last: {record.getMessage()}")
+
+
+def _stage_radii(parameters: Dict[str, Any]) -> None:
+    parameters["min_rad"], parameters["max_rad"] = calculate_min_max_radii(parameters)
+
+
+def _stage_contact(parameters: Dict[str, Any]) -> None:
+    pin_contact_geometry(parameters)
+    estimate_torque_capacity(parameters)
+
+
+def _stage_mesh(parameters: Dict[str, Any]) -> None:
+    for name in PART_NAMES:
+        part_triangles(name, parameters)
+
+
+def _stage_generate(parameters: Dict[str, Any]) -> None:
+    import FreeCAD
+    import cycloidFun
+
+    doc = FreeCAD.newDocument("cycloidFuzz")
+    try:
+        cycloidFun.generate_parts(doc, parameters)
+    finally:
+        FreeCAD.closeDocument(doc.Name)
+
+
+# (name, function) run in order on the parameters; functions may add to them
+PIPELINE: Tuple[Tuple[str, Callable[[Dict[str, Any]], Any]], ...] = (
+    ("validate", validate_parameters),
+    ("radii", _stage_radii),
+    ("profile", validate_profile),
+    ("feasibility", check_feasibility),
+    ("contact", _stage_contact),
+    ("mesh", _stage_mesh),
+)
+GENERATE_STAGE = ("generate", _stage_generate)
+
+
+def fuzz_space(diameter: float) -> Dict[str, Any]:
+    """cycloidOptimize's search space plus the sizes it keeps fixed."""
+    space = default_search_space(diameter)
+    space.update({
+        "Diameter": [diameter],
+        "shaft_diameter": (0.08 * diameter, 0.2 * diameter),
+        "clearance": (0.1, 1.0),
+        "disk_height": (2.0, 10.0),
+        "line_segment_count": (12, 200),
+    })
+    return space
+
+
+def sample_parameters(count: int, rng: np.random.Generator, diameters: Sequence[float] = DIAMETERS,
+                      base: Optional[Dict[str, Any]] = None, max_draws: int = 100) -> List[Dict[str, Any]]:
+    """Draw count random parameter sets that pass validate_parameter_table.
+
+    Args:
+        count: Number of sets
+        rng: numpy random generator
+        diameters: Outer diameters, an equal share of the sets each
+        base: Parameters that are not drawn, the defaults if None
+        max_draws: Give up after this many batches of draws
+
+    Returns:
+        List of parameter dictionaries without min_rad/max_rad, possibly
+        shorter than count if too few draws were valid
+    """
+    base = dict(base if base is not None else generate_default_parameters())
+    found: List[Dict[str, Any]] = []
+    for draw in range(max_draws):
+        if len(found) >= count:
+            break
+        diameter = diameters[draw % len(diameters)]
+        candidates = sample_candidates(fuzz_space(diameter), max(count, 16), base, rng)
+        table = {name: np.array([c[name] for c in candidates]) for name in candidates[0]}
+        mask, _ = validate_parameter_table(table)
+        found += [c for c, bad in zip(candidates, mask) if not bad]
+    return found[:count]
+
+
+def run_pipeline(parameters: Dict[str, Any], generate: bool = False,
+                 max_log_records: int = DEFAULT_MAX_LOG_RECORDS, memory_budget: Optional[int] = None,
+                 stages: Optional[Sequence[Tuple[str, Callable[[Dict[str, Any]], Any]]]] = None,
+                 report: Optional[Callable[[str], None]] = None) -> CaseResult:
+    """Run the stages on one parameter set in this process.
+
+    Args:
+        parameters: Parameter set, not changed
+        generate: Add the headless generate_parts stage; it is skipped
+            when FreeCAD cannot be imported
+        max_log_records: Warnings allowed before the case is a flood
+        memory_budget: Bytes the peak RSS may rise above its value when the
+            call started, unchecked if None.  Memory freed before the call
+            does not count, but neither does growth that stays below that
+            earlier peak
+        stages: (name, function) pairs, PIPELINE if None
+        report: Called with each stage name as it starts
+
+    Returns:
+        CaseResult with outcome "ok", "invalid", "error", "memory" or "flood"
+    """
+    stages = list(PIPELINE if stages is None else stages)
+    if generate:
+        stages.append(GENERATE_STAGE)
+    working = dict(parameters)
+    seconds: Dict[str, float] = {}
+    handler = _CountingHandler(max_log_records)
+    root = logging.getLogger()
+    root.addHandler(handler)
+    # against the peak, not the current RSS, so an earlier spike in this process is not charged to the case
+    start_peak = peak_rss()
+    outcome, stage, detail = "ok", "", ""
+    try:
+        for name, function in stages:
+            stage = name
+            if report:
+                report(name)
+            if name == GENERATE_STAGE[0]:
+                try:
+                    import FreeCAD  # noqa: F401
+                except ImportError:
+                    detail = "generate skipped, FreeCAD is not available"
+                    continue
+            start = time.perf_counter()
+            function(working)
+            seconds[name] = time.perf_counter() - start
+        stage = ""
+    except ParameterValidationError as e:
+        outcome, detail = "invalid", str(e)
+    except LogFlood as e:
+        outcome, detail = "flood", str(e)
+    except MemoryError:
+        outcome, detail = "memory", "MemoryError"
+    except Exception as e:
+        outcome, detail = "error", f"{type(e).__name__}: {e}"
+    finally:
+        root.removeHandler(handler)
+    memory = max(0, peak_rss() - start_peak)
+    if outcome == "ok" and memory_budget is not None and memory > memory_budget:
+        outcome, detail = "memory", f"peak RSS grew by {memory >> 20} MiB"
+    return CaseResult(dict(parameters), outcome, stage, detail, seconds, memory, handler.count)
+
+
+def _limit_memory(budget: int) -> None:
+    """Let the address space grow by at most budget, where the platform allows it."""
+    try:
+        import resource
+
+        with open("/proc/self/statm") as stream:
+            size = int(stream.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+        resource.setrlimit(resource.RLIMIT_AS, (size + budget, resource.RLIM_INFINITY))
+    except (ImportError, OSError, ValueError):
+        pass
+
+
+def _child(connection: Any, parameters: Dict[str, Any], generate: bool, max_log_records: int,
+           memory_budget: int, stages: Optional[Sequence[Tuple[str, Callable]]]) -> None:
+    _limit_memory(memory_budget)
+    logging.getLogger().handlers = []
+    try:
+        result = run_pipeline(parameters, generate, max_log_records, memory_budget, stages,
+                              report=lambda name: connection.send(("stage", name)))
+        connection.send(("result", result))
+    except MemoryError:
+        connection.send(("result", CaseResult(parameters, "memory", "", "MemoryError", {}, 0, 0)))
+    finally:
+        connection.close()
+
+
+def _context() -> Any:
+    # fork starts a case in milliseconds; elsewhere the stages have to be picklable
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+
+
+def run_cases(cases: Sequence[Dict[str, Any]], time_budget: float = DEFAULT_TIME_BUDGET,
+              memory_budget: int = DEFAULT_MEMORY_BUDGET, max_log_records: int = DEFAULT_MAX_LOG_RECORDS,
+              generate: bool = False, workers: Optional[int] = None,
+              stages: Optional[Sequence[Tuple[str, Callable]]] = None) -> List[CaseResult]:
+    """Run each case in a child process of its own, workers at a time.
+
+    Args:
+        cases: Parameter sets
+        time_budget: Seconds a case may take before it is "slow"; it is
+            killed as a "timeout" after HARD_LIMIT_FACTOR times this
+        memory_budget: Bytes the peak RSS may grow by
+        max_log_records: Warnings allowed per case
+        generate: Add the headless generate_parts stage
+        workers: Cases at once, os.cpu_count() if None
+        stages: As for run_pipeline
+
+    Returns:
+        One CaseResult per case, in order
+    """
+    workers = workers or os.cpu_count() or 1
+    context = _context()
+    results: List[Optional[CaseResult]] = [None] * len(cases)
+    pending = list(enumerate(cases))[::-1]
+    running: Dict[Any, Tuple[int, Any, float, List[str]]] = {}
+    hard_limit = time_budget * HARD_LIMIT_FACTOR
+    while pending or running:
+        while pending and len(running) < workers:
+            index, parameters = pending.pop()
+            receive, send = context.Pipe(duplex=False)
+            process = context.Process(target=_child, daemon=True,
+                                      args=(send, parameters, generate, max_log_records, memory_budget, stages))
+            process.start()
+            send.close()
+            running[receive] = (index, process, time.monotonic(), [""])
+        now = time.monotonic()
+        deadline = min(start + hard_limit for _, _, start, _ in running.values())
+        for connection in wait(list(running), timeout=max(0.0, deadline - now)):
+            index, process, start, stage = running[connection]
+            try:
+                kind, value = connection.recv()
+            except EOFError:
+                # the child died without a result: killed by the OS, usually for memory
+                del running[connection]
+                process.join()
+                results[index] = CaseResult(dict(cases[index]), "memory", stage[0],
+                                            f"worker exited with code {process.exitcode}", {}, 0, 0)
+                continue
+            if kind == "stage":
+                stage[0] = value
+                continue
+            del running[connection]
+            process.join()
+            elapsed = time.monotonic() - start
+            if value.outcome == "ok" and elapsed > time_budget:
+                value = value._replace(outcome="slow", detail=f"took {elapsed:.2f}s, budget {time_budget:g}s")
+            results[index] = value
+        now = time.monotonic()
+        for connection, (index, process, start, stage) in list(running.items()):
+            if now - start > hard_limit:
+                process.kill()
+                process.join()
+                del running[connection]
+                results[index] = CaseResult(dict(cases[index]), "timeout", stage[0],
+                                            f"killed after {hard_limit:g}s", {}, 0, 0)
+    return results  # type: ignore[return-value]
+
+
+def run_case(parameters: Dict[str, Any], **kwargs: Any) -> CaseResult:
+    """run_cases for one parameter set; takes the same keyword arguments."""
+    return run_cases([parameters], workers=1, **kwargs)[0]
+
+
+def _signature(result: CaseResult) -> Tuple[str, str, str]:
+    """What has to stay the same for a smaller case to count as the same failure."""
+    kind = result.detail.split(":")[0] if result.outcome == "error" else ""
+    return result.outcome, result.stage, kind
+
+
+def minimize(result: CaseResult, base: Optional[Dict[str, Any]] = None, steps: int = MINIMIZE_STEPS,
+             max_runs: int = MAX_MINIMIZE_RUNS, **kwargs: Any) -> CaseResult:
+    """Move a failing case as close to base as it can go and still fail the same way.
+
+    Each parameter that differs from base is first set to its base value;
+    if that loses the failure a number is bisected between the two for
+    steps steps, keeping the value nearest base that still fails.  Passes
+    over the parameters repeat while one of them moves.
+
+    Args:
+        result: A failed case
+        base: Parameters to move towards, the defaults if None
+        steps: Bisection steps per parameter
+        max_runs: Most cases run
+        **kwargs: Passed on to run_case (budgets, stages, generate)
+
+    Returns:
+        The smallest failing CaseResult found
+    """
+    base = base if base is not None else generate_default_parameters()
+    target = _signature(result)
+    best = result
+    runs = 0
+
+    def fails(parameters: Dict[str, Any]) -> Optional[CaseResult]:
+        nonlocal runs
+        runs += 1
+        trial = run_case(parameters, **kwargs)
+        return trial if _signature(trial) == target else None
+
+    changed = True
+    while changed and runs < max_runs:
+        # another pass, as moving one parameter can free another
+        changed = False
+        for name in sorted(result.parameters):
+            if name not in base or best.parameters[name] == base[name] or runs >= max_runs:
+                continue
+            trial = fails(dict(best.parameters, **{name: base[name]}))
+            if trial:
+                best, changed = trial, True
+                continue
+            low, high = base[name], best.parameters[name]
+            if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (low, high)):
+                continue
+            integer = isinstance(low, int) and isinstance(high, int)
+            for _ in range(steps):
+                if runs >= max_runs:
+                    break
+                middle = (low + high) / 2
+                if integer:
+                    middle = int(math.floor(middle) if high > low else math.ceil(middle))
+                    if middle in (low, high):
+                        break
+                trial = fails(dict(best.parameters, **{name: middle}))
+                if trial:
+                    best, high, changed = trial, middle, True
+                else:
+                    low = middle
+    logger.info(f"minimized {result.outcome} in {runs} runs")
+    return best
+
+
+def write_case(path: str, result: CaseResult, original: Optional[Dict[str, Any]] = None) -> str:
+    """Write a case as JSON that load_case reads back.
+
+    Args:
+        path: File to write
+        result: The case
+        original: Parameters the case was minimized from
+
+    Returns:
+        path
+    """
+    record = {"outcome": result.outcome, "stage": result.stage, "detail": result.detail,
+              "seconds": result.seconds, "memory": result.memory, "log_records": result.log_records,
+              "parameters": result.parameters}
+    if original is not None:
+        record["original"] = original
+    with open(path, "w") as stream:
+        json.dump(record, stream, indent=1, sort_keys=True)
+        stream.write("\n")
+    return path
+
+
+def load_case(path: str) -> Dict[str, Any]:
+    """The parameters of a case written by write_case."""
+    with open(path) as stream:
+        return json.load(stream)["parameters"]
+
+
+def fuzz(count: int = 100, seed: int = 0, time_budget: float = DEFAULT_TIME_BUDGET,
+         memory_budget: int = DEFAULT_MEMORY_BUDGET, max_log_records: int = DEFAULT_MAX_LOG_RECORDS,
+         generate: bool = False, workers: Optional[int] = None, output_dir: Optional[str] = None,
+         minimize_failures: bool = True, diameters: Sequence[float] = DIAMETERS,
+         stages: Optional[Sequence[Tuple[str, Callable]]] = None) -> FuzzReport:
+    """Run count random parameter sets and minimize the ones that fail.
+
+    Args:
+        count: Number of random sets
+        seed: Seed of the random generator, the same seed gives the same sets
+        time_budget: Seconds per case, see run_cases
+        memory_budget: Bytes the peak RSS of a case may grow by
+        max_log_records: Warnings allowed per case
+        generate: Add the headless generate_parts stage
+        workers: Cases at once, os.cpu_count() if None
+        output_dir: Where fuzz-<seed>-<index>-<outcome>.json files of the
+            failures go, created if missing; nothing is written if None
+        minimize_failures: Minimize each failure before writing it
+        diameters: Outer diameters the sets are drawn around
+        stages: As for run_pipeline
+
+    Returns:
+        FuzzReport
+    """
+    options = dict(time_budget=time_budget, memory_budget=memory_budget, max_log_records=max_log_records,
+                   generate=generate, stages=stages)
+    cases = sample_parameters(count, np.random.default_rng(seed), diameters)
+    results = run_cases(cases, workers=workers, **options)
+    failures, files = [], []
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    for index, result in enumerate(results):
+        if result.outcome not in FAILURES:
+            continue
+        logger.warning(f"case {index}: {result.outcome} in {result.stage or 'pipeline'}: {result.detail}")
+        smallest = minimize(result, **options) if minimize_failures else result
+        failures.append(smallest)
+        if output_dir:
+            path = os.path.join(output_dir, f"fuzz-{seed}-{index}-{result.outcome}.json")
+            files.append(write_case(path, smallest, result.parameters))
+    outcomes = {name: sum(r.outcome == name for r in results) for name in ("ok", "invalid") + FAILURES}
+    logger.info(f"fuzzed {len(results)} cases: " + ", ".join(f"{k} {v}" for k, v in outcomes.items() if v))
+    return FuzzReport(results, failures, files)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fuzz the gearbox pipeline with random parameter sets")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-budget", type=float, default=DEFAULT_TIME_BUDGET)
+    parser.add_argument("--memory-budget", type=int, default=DEFAULT_MEMORY_BUDGET >> 20, help="MiB")
+    parser.add_argument("--max-log-records", type=int, default=DEFAULT_MAX_LOG_RECORDS)
+    parser.add_argument("--generate", action="store_true", help="also run generate_parts, needs FreeCAD")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output-dir", default="fuzz")
+    parser.add_argument("--no-minimize", action="store_true")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    report = fuzz(args.count, args.seed, args.time_budget, args.memory_budget << 20, args.max_log_records,
+                  args.generate, args.workers, args.output_dir, not args.no_minimize)
+    for path in report.files:
+        logger.info(f"wrote {path}")
+    return 1 if report.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
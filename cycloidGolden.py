@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Golden geometry fingerprints for regression checks of the part geometry.
+
+Each case of GOLDEN_CASES is a set of overrides of the default
+parameters.  For every part of a case the fingerprint holds
+
+    volume, area    of the part triangulated by cycloidStl, as placed in
+                    the assembly
+    bbox            (xmin, ymin, zmin, xmax, ymax, zmax) of that mesh
+    vertices, faces distinct mesh vertices and triangles
+    profile         sha256 of the part's sketch outlines and z ranges
+                    (cycloidStl.part_features) rounded to PROFILE_DECIMALS
+
+No FreeCAD is needed.  check_golden computes the cases in worker
+processes and compares them with the JSON files write_golden stored, so a
+change to the profile sampling or the feature sizes that alters any part
+shows up as a list of differences.  Run
+
+    python cycloidGolden.py tests/golden            # check
+    python cycloidGolden.py tests/golden --update   # accept the current geometry
+
+Example:
+    import cycloidGolden
+    problems = cycloidGolden.check_golden("tests/golden")
+    print({case: diffs for case, diffs in problems.items() if diffs})
+
+License 	LGPL V2.1
+Homepage https://github.com/iplayfast/CycloidGearBox
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from cycloidMath import PART_NAMES, calculate_min_max_radii, generate_default_parameters
+from cycloidStl import part_features, part_triangles
+
+logger = logging.getLogger(__name__)
+
+# Parameter overrides of each golden case, by case name
+GOLDEN_CASES = {
+    "default": {},
+    "fine": {"tooth_count": 19, "eccentricity": 1.2, "roller_diameter": 6.0},
+    "coarse": {"tooth_count": 7, "eccentricity": 2.5, "driver_disk_hole_count": 4, "driver_hole_diameter": 12.0},
+    "large": {"tooth_count": 15, "Diameter": 150.0, "roller_circle_diameter": 130.0, "roller_diameter": 12.0,
+              "driver_circle_diameter": 80.0, "shaft_diameter": 20.0, "eccentricity": 2.5},
+    "thin": {"disk_height": 3.0, "base_height": 8.0, "clearance": 0.3, "pressure_angle_limit": 40.0},
+}
+
+# Relative tolerance of volume and area, absolute tolerance of the bounding box in mm
+DEFAULT_TOLERANCES = {"volume": 1e-6, "area": 1e-6, "bbox": 1e-6}
+PROFILE_DECIMALS = 6
+# Vertices closer than this are the same vertex
+VERTEX_DECIMALS = 9
+
+
+def case_parameters(case: str) -> Dict[str, Any]:
+    """The full parameters of a golden case, with min_rad and max_rad."""
+    parameters = dict(generate_default_parameters(), **GOLDEN_CASES[case])
+    parameters["min_rad"], parameters["max_rad"] = calculate_min_max_radii(parameters)
+    return parameters
+
+
+def mesh_fingerprint(triangles: np.ndarray) -> Dict[str, Any]:
+    """Volume, area, bounding box and counts of a closed triangle mesh.
+
+    Args:
+        triangles: (m, 3, 3) counter-clockwise triangles
+
+    Returns:
+        Dictionary with volume, area, bbox, vertices and faces
+    """
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    cross = np.cross(b - a, c - a)
+    points = triangles.reshape(-1, 3)
+    return {
+        "volume": float(np.einsum("ij,ij->", a, np.cross(b, c)) / 6.0),
+        "area": float(np.linalg.norm(cross, axis=1).sum() / 2.0),
+        "bbox": points.min(axis=0).tolist() + points.max(axis=0).tolist(),
+        "vertices": int(len(np.unique(points.round(VERTEX_DECIMALS), axis=0))),
+        "faces": int(len(triangles)),
+    }
+
+
+def profile_hash(name: str, parameters: Dict[str, Any]) -> str:
+    """sha256 of a part's feature outlines and z ranges, rounded to PROFILE_DECIMALS."""
+    digest = hashlib.sha256()
+    for is_pad, loops, z0, z1 in part_features(name, parameters):
+        digest.update(np.array((is_pad, z0, z1), dtype=float).round(PROFILE_DECIMALS).tobytes())
+        for loop in loops:
+            # + 0.0 turns -0.0 into 0.0, which rounding near zero can give
+            digest.update((np.ascontiguousarray(loop, dtype=float).round(PROFILE_DECIMALS) + 0.0).tobytes())
+    return digest.hexdigest()
+
+
+def fingerprint_part(name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """The golden fingerprint of one part, see the module docstring."""
+    fingerprint = mesh_fingerprint(part_triangles(name, parameters))
+    fingerprint["profile"] = profile_hash(name, parameters)
+    return fingerprint
+
+
+def fingerprint_case(case: str) -> Dict[str, Any]:
+    """Fingerprints of every part of a golden case.
+
+    This is the unit of work sent to worker processes.
+
+    Returns:
+        {"parameters": overrides, "parts": {part name: fingerprint}}
+    """
+    parameters = case_parameters(case)
+    return {"parameters": GOLDEN_CASES[case],
+            "parts": {name: fingerprint_part(name, parameters) for name in PART_NAMES}}
+
+
+def compare(actual: Dict[str, Any], golden: Dict[str, Any],
+            tolerances: Optional[Dict[str, float]] = None) -> List[str]:
+    """Differences between two case fingerprints.
+
+    Args:
+        actual: From fingerprint_case
+        golden: As stored by write_golden
+        tolerances: Overrides of DEFAULT_TOLERANCES
+
+    Returns:
+        One line per difference, empty when they match
+    """
+    tolerances = dict(DEFAULT_TOLERANCES, **(tolerances or {}))
+    problems = []
+    if actual["parameters"] != golden["parameters"]:
+        problems.append(f"parameters {actual['parameters']} != golden {golden['parameters']}")
+    for name in sorted(set(actual["parts"]) | set(golden["parts"])):
+        if name not in golden["parts"] or name not in actual["parts"]:
+            problems.append(f"{name}: only in {'actual' if name not in golden['parts'] else 'golden'}")
+            continue
+        new, old = actual["parts"][name], golden["parts"][name]
+        for key in ("volume", "area"):
+            if not np.isclose(new[key], old[key], rtol=tolerances[key], atol=0.0):
+                problems.append(f"{name}: {key} {new[key]:.9g} != golden {old[key]:.9g}")
+        if not np.allclose(new["bbox"], old["bbox"], rtol=0.0, atol=tolerances["bbox"]):
+            problems.append(f"{name}: bbox {np.round(new['bbox'], 6).tolist()} != golden {old['bbox']}")
+        for key in ("vertices", "faces", "profile"):
+            if new[key] != old[key]:
+                problems.append(f"{name}: {key} {new[key]} != golden {old[key]}")
+    return problems
+
+
+def golden_path(directory: str, case: str) -> str:
+    return os.path.join(directory, f"{case}.json")
+
+
+def _fingerprint_cases(cases: Sequence[str], workers: Optional[int]) -> List[Dict[str, Any]]:
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(cases) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(cases))) as executor:
+            return list(executor.map(fingerprint_case, cases))
+    return [fingerprint_case(case) for case in cases]
+
+
+def write_golden(directory: str, cases: Optional[Sequence[str]] = None,
+                 workers: Optional[int] = None) -> List[str]:
+    """Store the current fingerprints as the golden values.
+
+    Args:
+        directory: Where the <case>.json files go, created if missing
+        cases: Names from GOLDEN_CASES, all if None
+        workers: Worker processes, os.cpu_count() if None, 1 runs in-process
+
+    Returns:
+        Paths of the files written
+    """
+    cases = list(cases or GOLDEN_CASES)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for case, fingerprint in zip(cases, _fingerprint_cases(cases, workers)):
+        path = golden_path(directory, case)
+        with open(path, "w") as stream:
+            json.dump(fingerprint, stream, indent=1, sort_keys=True)
+            stream.write("\n")
+        paths.append(path)
+    return paths
+
+
+def check_golden(directory: str, cases: Optional[Sequence[str]] = None, workers: Optional[int] = None,
+                 tolerances: Optional[Dict[str, float]] = None) -> Dict[str, List[str]]:
+    """Compare the current geometry with the stored golden values.
+
+    Args:
+        directory: Holding the <case>.json files
+        cases: Names from GOLDEN_CASES, all if None
+        workers: Worker processes, os.cpu_count() if None, 1 runs in-process
+        tolerances: Overrides of DEFAULT_TOLERANCES
+
+    Returns:
+        Differences per case, see compare; a case without a golden file
+        has one line saying so
+    """
+    cases = list(cases or GOLDEN_CASES)
+    problems = {}
+    for case, fingerprint in zip(cases, _fingerprint_cases(cases, workers)):
+        path = golden_path(directory, case)
+        if not os.path.exists(path):
+            problems[case] = [f"no golden file {path}"]
+            continue
+        with open(path) as stream:
+            problems[case] = compare(fingerprint, json.load(stream), tolerances)
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check or update the golden part fingerprints")
+    parser.add_argument("directory", nargs="?", default=os.path.join("tests", "golden"))
+    parser.add_argument("--update", action="store_true", help="store the current geometry as golden")
+    parser.add_argument("--case", action="append", choices=sorted(GOLDEN_CASES), help="only these cases")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    if args.update:
+        for path in write_golden(args.directory, args.case, args.workers):
+            logger.info(f"wrote {path}")
+        return 0
+    failed = 0
+    for case, problems in check_golden(args.directory, args.case, args.workers).items():
+        for line in problems:
+            logger.error(f"{case}: {line}")
+        failed += bool(problems)
+    logger.info(f"{failed} of {len(args.case or GOLDEN_CASES)} cases differ")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mass properties of the gearbox parts from the parameters, without OCC.
+
+Every part is a stack of pads and pockets (see cycloidStl.part_features),
+so its volume integrals are sums of prisms: a plane region times a z
+range.  The plane integrals (area, first and second moments) are closed
+forms for circles, circular segments and the lens where two circles
+overlap, and the shoelace-style sums over the polygon edges for the
+cycloidal disk outline.  Where the rollers, pins or holes of a ring
+overlap a neighbour or the base, the lens is taken off once; no three of
+them meet.  The circles of the input shaft and eccentric key all lie on
+the x axis, and their unions and intersections are summed exactly as
+vertical bands (axis_moments).  A driver hole cutting through the disk
+outline, which the feasibility check reports, is taken as lying inside it.
+The results agree with the cycloidStl meshes to within their polygon
+tolerance.
+
+All arithmetic is vectorised over a batch of parameter sets: pass a list
+of parameter dictionaries and every result has the batch as its first
+axis.  Ring features (rollers, driver pins and holes) are evaluated for
+the largest count in the batch and masked, so the batch may mix tooth
+and hole counts.
+
+Lengths are in mm, density in g/cm^3, mass in g and inertia in g mm^2.
+
+Example:
+    import cycloidMath, cycloidMass
+    params = cycloidMath.generate_default_parameters()
+    disk = cycloidMass.mass_properties("cycloidalDisk1", params)
+    print(disk.mass, disk.center, disk.inertia)
+    batch = cycloidMass.mass_properties("cycloidalDisk1", [dict(params, eccentricity=e) for e in (1.5, 2, 2.5)])
+
+License 	LGPL V2.1
+Homepage https://github.com/iplayfast/CycloidGearBox
+"""
+
+import math
+from collections.abc import Mapping
+from typing import Any, Dict, NamedTuple, Sequence, Tuple, Union
+
+import numpy as np
+
+from cycloidMath import PART_NAMES, calculate_min_max_radii, cycloidal_disk_outline, generate_slot_size
+from cycloidStl import part_placement
+
+# PLA, in g/cm^3
+DEFAULT_DENSITY = 1.24
+
+Parameters = Union[Mapping, Sequence[Mapping]]
+
+
+class MassProperties(NamedTuple):
+    """Mass properties of one part, or of a batch with the batch first."""
+    volume: np.ndarray      # mm^3
+    mass: np.ndarray        # g
+    center: np.ndarray      # (..., 3) centre of mass, mm
+    inertia: np.ndarray     # (..., 3, 3) inertia tensor about the centre of mass, g mm^2
+
+
+# Plane moments are stacked as (area, Sx, Sy, Sxx, Syy, Sxy) along axis 0,
+# where Sx = integral of x dA, Sxx = integral of x^2 dA and so on.
+
+def circle_moments(cx: Any, cy: Any, r: Any) -> np.ndarray:
+    """Plane moments of circles centred on (cx, cy)."""
+    cx, cy, r = np.broadcast_arrays(*map(np.asarray, (cx, cy, r)))
+    area = math.pi * r ** 2
+    own = area * r ** 2 / 4
+    return np.stack((area, area * cx, area * cy, area * cx ** 2 + own, area * cy ** 2 + own, area * cx * cy))
+
+
+def segment_moments(cx: Any, cy: Any, r: Any, angle: Any, d: Any) -> np.ndarray:
+    """Plane moments of the part of a circle beyond a chord.
+
+    Args:
+        cx, cy, r: Circle
+        angle: Direction from the centre the chord is normal to
+        d: Distance of the chord from the centre along that direction;
+            d <= -r is the whole circle and d >= r nothing
+    """
+    r = np.asarray(r, dtype=float)
+    theta = np.arccos(np.clip(np.asarray(d) / np.where(r > 0, r, 1.0), -1.0, 1.0))
+    s, c = np.sin(theta), np.cos(theta)
+    # in a frame with the chord normal along +u: area and moments of {|p| <= r, u >= d}
+    area = r ** 2 * (theta - s * c)
+    su = 2.0 / 3.0 * r ** 3 * s ** 3
+    suu = r ** 4 / 4 * (theta - s * c + 2 * s ** 3 * c)
+    svv = r ** 4 / 12 * (3 * theta - 3 * s * c - 2 * s ** 3 * c)
+    return _place_plane(np.stack((area, su, np.zeros_like(area), suu, svv, np.zeros_like(area))), cx, cy, angle)
+
+
+def lens_moments(x1: Any, y1: Any, r1: Any, x2: Any, y2: Any, r2: Any) -> np.ndarray:
+    """Plane moments of the overlap of two circles, zero where they are apart."""
+    dx, dy = np.asarray(x2) - x1, np.asarray(y2) - y1
+    distance = np.maximum(np.hypot(dx, dy), 1e-12)
+    angle = np.arctan2(dy, dx)
+    # the common chord, measured from the first centre towards the second
+    chord = (distance ** 2 + np.asarray(r1) ** 2 - np.asarray(r2) ** 2) / (2 * distance)
+    return segment_moments(x1, y1, r1, angle, chord) + segment_moments(x2, y2, r2, angle + math.pi, distance - chord)
+
+
+def polygon_moments(points: np.ndarray) -> np.ndarray:
+    """Plane moments of counter-clockwise polygons, points shaped (..., m, 2)."""
+    x0, y0 = points[..., 0], points[..., 1]
+    x1, y1 = np.roll(x0, -1, axis=-1), np.roll(y0, -1, axis=-1)
+    cross = x0 * y1 - x1 * y0
+    return np.stack((
+        cross.sum(-1) / 2,
+        ((x0 + x1) * cross).sum(-1) / 6,
+        ((y0 + y1) * cross).sum(-1) / 6,
+        ((x0 ** 2 + x0 * x1 + x1 ** 2) * cross).sum(-1) / 12,
+        ((y0 ** 2 + y0 * y1 + y1 ** 2) * cross).sum(-1) / 12,
+        ((x0 * y1 + 2 * x0 * y0 + 2 * x1 * y1 + x1 * y0) * cross).sum(-1) / 24,
+    ))
+
+
+def key_moments(radius: Any, flat: Any) -> np.ndarray:
+    """Plane moments of the D shaped key: a circle on the origin cut off above y = flat."""
+    return circle_moments(0.0, 0.0, radius) - segment_moments(0.0, 0.0, radius, math.pi / 2, flat)
+
+
+def _place_plane(moments: np.ndarray, cx: Any, cy: Any, angle: Any) -> np.ndarray:
+    """Rotate plane moments by angle about the origin, then move the origin to (cx, cy)."""
+    area, sx, sy, sxx, syy, sxy = moments
+    c, s = np.cos(angle), np.sin(angle)
+    rx, ry = c * sx - s * sy, s * sx + c * sy
+    rxx = c * c * sxx - 2 * c * s * sxy + s * s * syy
+    ryy = s * s * sxx + 2 * c * s * sxy + c * c * syy
+    rxy = c * s * (sxx - syy) + (c * c - s * s) * sxy
+    return np.stack((area, rx + cx * area, ry + cy * area,
+                     rxx + 2 * cx * rx + cx * cx * area,
+                     ryy + 2 * cy * ry + cy * cy * area,
+                     rxy + cx * ry + cy * rx + cx * cy * area))
+
+
+# Volume moments are stacked as (V, Mx, My, Mz, Sxx, Syy, Szz, Sxy, Sxz, Syz).
+
+def prism(plane: np.ndarray, z0: Any, z1: Any, mask: Any = None) -> np.ndarray:
+    """Volume moments of plane regions extruded from z0 to z1.
+
+    Regions along the last axis (a ring of features) are summed, only
+    where mask is True.
+    """
+    z0, z1 = np.asarray(z0, dtype=float), np.asarray(z1, dtype=float)
+    height = np.maximum(z1 - z0, 0.0)
+    z1 = z0 + height
+    first = (z1 ** 2 - z0 ** 2) / 2
+    second = (z1 ** 3 - z0 ** 3) / 3
+    area, sx, sy, sxx, syy, sxy = plane
+    volume = np.stack((area * height, sx * height, sy * height, area * first,
+                       sxx * height, syy * height, area * second, sxy * height, sx * first, sy * first))
+    if mask is not None:
+        volume = np.where(mask, volume, 0.0)
+    return volume.sum(-1)
+
+
+def _place_volume(moments: np.ndarray, angle: Any, offset: Sequence[Any]) -> np.ndarray:
+    """Rotate volume moments about z, then translate them."""
+    v, mx, my, mz, sxx, syy, szz, sxy, sxz, syz = moments
+    c, s = np.cos(angle), np.sin(angle)
+    rx, ry = c * mx - s * my, s * mx + c * my
+    rxx = c * c * sxx - 2 * c * s * sxy + s * s * syy
+    ryy = s * s * sxx + 2 * c * s * sxy + c * c * syy
+    rxy = c * s * (sxx - syy) + (c * c - s * s) * sxy
+    rxz, ryz = c * sxz - s * syz, s * sxz + c * syz
+    tx, ty, tz = offset
+    return np.stack((v, rx + tx * v, ry + ty * v, mz + tz * v,
+                     rxx + 2 * tx * rx + tx * tx * v,
+                     ryy + 2 * ty * ry + ty * ty * v,
+                     szz + 2 * tz * mz + tz * tz * v,
+                     rxy + tx * ry + ty * rx + tx * ty * v,
+                     rxz + tx * mz + tz * rx + tx * tz * v,
+                     ryz + ty * mz + tz * ry + ty * tz * v))
+
+
+def _columns(batch: Sequence[Mapping]) -> Dict[str, np.ndarray]:
+    """Parameters as (B, 1) arrays, with min_rad and max_rad filled in."""
+    rows = []
+    for parameters in batch:
+        if "min_rad" not in parameters or "max_rad" not in parameters:
+            minr, maxr = calculate_min_max_radii(parameters)
+            parameters = dict(parameters, min_rad=minr, max_rad=maxr)
+        rows.append(parameters)
+    keys = set(rows[0])
+    columns = {key: np.array([[float(p[key])] for p in rows]) for key in keys if not isinstance(rows[0][key], str)}
+    key_radius, key_flat = zip(*(generate_slot_size(p, 0) for p in rows))
+    columns["key_radius"] = np.array(key_radius)[:, None]
+    columns["key_flat"] = np.array(key_flat)[:, None]
+    return columns
+
+
+def _ring(count: np.ndarray, radius: np.ndarray, x0: Any = 0.0):
+    """Centres and mask of count features evenly spaced on a circle, as (B, k) arrays."""
+    count = count.astype(int)
+    index = np.arange(count.max())[None, :]
+    angle = 2 * math.pi * index / count
+    return x0 + radius * np.cos(angle), radius * np.sin(angle), angle, index < count
+
+
+def _ring_lens(cx: np.ndarray, cy: np.ndarray, r: Any, mask: np.ndarray,
+               count: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Overlap of each ring feature with the next, for removing it once."""
+    count = count.astype(int)
+    nxt = (np.arange(cx.shape[-1])[None, :] + 1) % count
+    nx, ny = np.take_along_axis(cx, nxt, -1), np.take_along_axis(cy, nxt, -1)
+    # two features are their own neighbours both ways round, count their overlap once
+    keep = mask & ((count > 2) | (np.arange(cx.shape[-1])[None, :] == 0)) & (count > 1)
+    return lens_moments(cx, cy, r, nx, ny, r), keep
+
+
+def _pin_disk(p: Dict[str, np.ndarray]) -> np.ndarray:
+    dh, bh, c = p["disk_height"], p["base_height"], p["clearance"]
+    outer = p["Diameter"] / 2
+    shaft = (p["shaft_diameter"] + c) / 2
+    inner = p["min_rad"] + c / 2
+    lower = np.minimum(shaft, inner)
+    pin_height = dh * 3
+    # base: the outside pad over the whole base, the centre pad below it
+    moments = (prism(circle_moments(0, 0, outer), 0, bh) - prism(circle_moments(0, 0, inner), bh - dh, bh)
+               - prism(circle_moments(0, 0, lower), 0, bh - dh))
+    count = p["tooth_count"] + 1
+    roller_r, male_r = p["roller_diameter"] / 2, p["roller_diameter"] / 8
+    female_r = (p["roller_diameter"] / 4 + c) / 2
+    cx, cy, _, mask = _ring(count, p["roller_circle_diameter"] / 2 + c)
+    top = bh + pin_height
+    moments = moments + prism(circle_moments(cx, cy, roller_r), 0, top, mask)
+    moments = moments + prism(circle_moments(cx, cy, male_r), top, top + dh, mask)
+    moments = moments - prism(circle_moments(cx, cy, female_r), 0, pin_height, mask)
+    # the part of each roller inside the base
+    in_outer = lens_moments(cx, cy, roller_r, 0, 0, outer)
+    moments = moments - prism(in_outer - lens_moments(cx, cy, roller_r, 0, 0, lower), 0, bh - dh, mask)
+    moments = moments - prism(in_outer - lens_moments(cx, cy, roller_r, 0, 0, inner), bh - dh, bh, mask)
+    lens, keep = _ring_lens(cx, cy, roller_r, mask, count)
+    return moments - prism(lens, 0, top, keep)
+
+
+def _driver_disk(p: Dict[str, np.ndarray]) -> np.ndarray:
+    dh, e, c = p["disk_height"], p["eccentricity"], p["clearance"]
+    outer, inner = p["min_rad"], (p["shaft_diameter"] + e + c / 2) / 2
+    moments = prism(circle_moments(0, 0, outer) - circle_moments(0, 0, inner), 0, dh)
+    count = p["driver_disk_hole_count"]
+    pin_r = p["driver_hole_diameter"] / 2
+    cx, cy, _, mask = _ring(count, p["driver_circle_diameter"] / 2)
+    moments = moments + prism(circle_moments(cx, cy, pin_r), 0, dh * 4, mask)
+    overlap = lens_moments(cx, cy, pin_r, 0, 0, outer) - lens_moments(cx, cy, pin_r, 0, 0, inner)
+    moments = moments - prism(overlap, 0, dh, mask)
+    lens, keep = _ring_lens(cx, cy, pin_r, mask, count)
+    return moments - prism(lens, 0, dh * 4, keep)
+
+
+def axis_moments(centers: np.ndarray, radii: np.ndarray, combine) -> np.ndarray:
+    """Plane moments of a region built from circles centred on the x axis.
+
+    Along any vertical line such a region is |y| <= H(x), with H made from
+    the circles' half heights h_i(x) by combine (max for a union, min for
+    an intersection, or a mix).  Between the points where circles start,
+    end or cross, one circle gives H, so the region is a sum of vertical
+    bands of single circles, each the difference of two segments.
+
+    Args:
+        centers: (..., n) x of the circle centres
+        radii: (..., n) circle radii
+        combine: Maps half heights (..., n) to H (...)
+    """
+    centers, radii = np.broadcast_arrays(np.asarray(centers, dtype=float), np.asarray(radii, dtype=float))
+    n = centers.shape[-1]
+    points = [centers - radii, centers + radii]
+    for i in range(n):
+        for j in range(i + 1, n):
+            d = centers[..., j] - centers[..., i]
+            safe = np.where(d == 0, 1.0, d)
+            chord = centers[..., i] + (d ** 2 + radii[..., i] ** 2 - radii[..., j] ** 2) / (2 * safe)
+            points.append(np.where(d == 0, centers[..., i], chord)[..., None])
+    points = np.sort(np.concatenate(points, axis=-1), axis=-1)
+    u0, u1 = points[..., :-1], points[..., 1:]
+    mid = (u0 + u1) / 2
+    heights = np.sqrt(np.maximum(radii[..., None, :] ** 2 - (mid[..., None] - centers[..., None, :]) ** 2, 0.0))
+    height = combine(heights)
+    which = np.argmin(np.abs(heights - height[..., None]) + np.where(heights > 0, 0.0, np.inf), axis=-1)
+    c = np.take_along_axis(centers, which, -1)
+    r = np.take_along_axis(radii, which, -1)
+    band = segment_moments(c, 0.0, r, 0.0, u0 - c) - segment_moments(c, 0.0, r, 0.0, u1 - c)
+    return np.where((height > 0) & (u1 > u0), band, 0.0).sum(-1)
+
+
+def _shaft_pins(p: Dict[str, np.ndarray]):
+    """The two drive pins of the input shaft and eccentric key: (x1, x2, radius)."""
+    e = p["eccentricity"]
+    pin_dia = e * 2
+    inner_shaft_radius = (p["shaft_diameter"] + e) / 2
+    return -(inner_shaft_radius - pin_dia) / 2, -(inner_shaft_radius - pin_dia * 1.25), pin_dia / 2
+
+
+def _input_shaft(p: Dict[str, np.ndarray]) -> np.ndarray:
+    dh, bh, e = p["disk_height"], p["base_height"], p["eccentricity"]
+    pin_base = bh - dh
+    x1, x2, pin_r = _shaft_pins(p)
+    # the pins reach no higher than the key flat, so where they meet the key it is its circle
+    circles = np.concatenate((x1, x2, np.zeros_like(x1)), axis=-1), np.concatenate((pin_r, pin_r, p["key_radius"]), axis=-1)
+    pins = axis_moments(*circles, lambda h: h[..., :2].max(-1))
+    cut = axis_moments(*circles, lambda h: np.minimum(h[..., :2].max(-1), h[..., 2]))
+    hub = circle_moments(0, 0, (p["shaft_diameter"] + e) / 2)
+    key = key_moments(p["key_radius"], p["key_flat"])
+    return (prism(circle_moments(0, 0, p["shaft_diameter"] / 2), -(bh - dh), 0)
+            + prism(hub - key, pin_base, pin_base + dh)
+            + prism(pins - cut, pin_base + dh, pin_base + 2 * dh))
+
+
+def _eccentric_key(p: Dict[str, np.ndarray]) -> np.ndarray:
+    dh, bh, e = p["disk_height"], p["base_height"], p["eccentricity"]
+    x1, x2, pin_r = _shaft_pins(p)
+    shaft_r = p["shaft_diameter"] / 2
+    circles = (np.concatenate((-e, e, x1, x2), axis=-1),
+               np.concatenate((shaft_r, shaft_r, pin_r, pin_r), axis=-1))
+    lobes = axis_moments(*circles, lambda h: h[..., :2].max(-1))
+    cut = axis_moments(*circles, lambda h: np.minimum(h[..., :2].max(-1), h[..., 2:].max(-1)))
+    pin_top = bh - dh
+    return prism(lobes, 0, dh) - prism(cut, np.maximum(pin_top - 2 * dh, 0), np.minimum(pin_top, dh))
+
+
+def _cycloidal_disk(p: Dict[str, np.ndarray], outlines: np.ndarray) -> np.ndarray:
+    dh, e, c = p["disk_height"], p["eccentricity"], p["clearance"]
+    center_r = (p["shaft_diameter"] + c) / 2
+    hole_r = (p["driver_hole_diameter"] + e * 2) / 2
+    count = p["driver_disk_hole_count"]
+    cx, cy, _, mask = _ring(count, p["driver_circle_diameter"] / 2, e)
+    moments = prism(polygon_moments(outlines)[..., None] - circle_moments(e, 0, center_r), 0, dh)
+    moments = moments - prism(circle_moments(cx, cy, hole_r) - lens_moments(cx, cy, hole_r, e, 0, center_r),
+                              0, dh, mask)
+    lens, keep = _ring_lens(cx, cy, hole_r, mask, count)
+    return moments + prism(lens, 0, dh, keep)
+
+
+def _output_shaft(p: Dict[str, np.ndarray]) -> np.ndarray:
+    dh = p["disk_height"]
+    base_r = p["min_rad"]
+    hole_r = (p["driver_hole_diameter"] + p["clearance"]) / 2
+    count = p["driver_disk_hole_count"]
+    cx, cy, _, mask = _ring(count, p["driver_circle_diameter"] / 2)
+    # the key pad starts inside the base, only the part above it adds
+    moments = prism(circle_moments(0, 0, base_r), 0, dh) + prism(key_moments(p["key_radius"], p["key_flat"]), dh, 20.0)
+    moments = moments - prism(lens_moments(cx, cy, hole_r, 0, 0, base_r), 0, dh, mask)
+    lens, keep = _ring_lens(cx, cy, hole_r, mask, count)
+    return moments + prism(lens, 0, dh, keep)
+
+
+def _outlines(batch: Sequence[Mapping]) -> np.ndarray:
+    """Disk outlines of a batch, padded to one length by repeating the last point."""
+    outlines = [cycloidal_disk_outline(parameters) for parameters in batch]
+    size = max(len(o) for o in outlines)
+    return np.stack([np.concatenate((o, np.repeat(o[-1:], size - len(o), axis=0))) for o in outlines])
+
+
+def part_moments(name: str, batch: Sequence[Mapping], placed: bool = True) -> np.ndarray:
+    """Volume moments (V, Mx, My, Mz, Sxx, Syy, Szz, Sxy, Sxz, Syz) of a part, shaped (10, B).
+
+    Args:
+        name: One of PART_NAMES
+        batch: Parameter sets
+        placed: In gearbox coordinates, else in body coordinates
+
+    Raises:
+        KeyError: If name is not a gearbox part
+    """
+    if name not in PART_NAMES:
+        raise KeyError(f"Unknown part {name}")
+    p = _columns(batch)
+    if name in ("cycloidalDisk1", "cycloidalDisk2"):
+        moments = _cycloidal_disk(p, _outlines(batch))
+    else:
+        moments = {"pinDisk": _pin_disk, "driverDisk": _driver_disk, "inputShaft": _input_shaft,
+                   "eccentricKey": _eccentric_key, "outputShaft": _output_shaft}[name](p)
+    moments = moments.reshape(10, len(batch))
+    if placed:
+        angles, offsets = zip(*(part_placement(name, parameters) for parameters in batch))
+        moments = _place_volume(moments, np.radians(angles), np.array(offsets).T)
+    return moments
+
+
+def _properties(moments: np.ndarray, density: float) -> MassProperties:
+    v, mx, my, mz, sxx, syy, szz, sxy, sxz, syz = moments
+    rho = density / 1000.0      # g/mm^3
+    center = np.stack((mx, my, mz), axis=-1) / v[:, None]
+    mass = v * rho
+    second = rho * np.array([[sxx, sxy, sxz], [sxy, syy, syz], [sxz, syz, szz]]).transpose(2, 0, 1)
+    # about the centre of mass: subtract m c c^T, then I = trace(S) 1 - S
+    second = second - mass[:, None, None] * center[:, :, None] * center[:, None, :]
+    inertia = np.trace(second, axis1=1, axis2=2)[:, None, None] * np.eye(3) - second
+    return MassProperties(v, mass, center, inertia)
+
+
+def mass_properties(name: Union[str, Sequence[str]], parameters: Parameters, density: float = DEFAULT_DENSITY,
+                    placed: bool = True) -> MassProperties:
+    """Volume, mass, centre of mass and inertia of a part or group of parts.
+
+    Args:
+        name: One of PART_NAMES, or several to treat as one rigid body
+        parameters: A parameter dictionary, or a sequence of them for a batch
+        density: Material density in g/cm^3
+        placed: Centre and inertia in gearbox coordinates, else in body
+            coordinates (only for a single part)
+
+    Returns:
+        MassProperties; for a batch every field has the batch as its first axis
+
+    Raises:
+        KeyError: If a name is not a gearbox part
+    """
+    single = isinstance(parameters, Mapping)
+    batch = [parameters] if single else list(parameters)
+    names = [name] if isinstance(name, str) else list(name)
+    moments = sum(part_moments(n, batch, placed) for n in names)
+    properties = _properties(moments, density)
+    if single:
+        return MassProperties(*(field[0] for field in properties))
+    return properties
+
+
+def gearbox_mass_properties(parameters: Parameters, density: float = DEFAULT_DENSITY) -> Dict[str, MassProperties]:
+    """mass_properties of every part, placed in the gearbox."""
+    return {name: mass_properties(name, parameters, density) for name in PART_NAMES}
@@ -0,0 +1,1413 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FreeCAD-free math for the hypocycloid gear box generator.
+
+Everything in here only needs the standard library and numpy so that it can
+be imported by tests, batch scripts and worker processes that do not have
+FreeCAD available.  cycloidFun re-exports these names, so existing code that
+does "cycloidFun.calculate_min_max_radii(...)" keeps working.
+
+Copyright 	2019, Chris Bruner
+Version 	v0.1
+License 	LGPL V2.1
+Homepage https://github.com/iplayfast/CycloidGearBox
+"""
+
+import base64
+import hashlib
+import io
+from collections.abc import Mapping
+import math
+import logging
+import operator
+import threading
+import time
+from typing import Tuple, List, Dict, Any, NamedTuple, Optional, Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Module-level constants
+MIN_TOOTH_COUNT = 3
+MAX_TOOTH_COUNT = 50
+DEG_TO_RAD = math.pi / 180.0
+RAD_TO_DEG = 180.0 / math.pi
+MIN_ECCENTRICITY = 0.1
+MIN_ROLLER_DIAMETER = 0.1
+MIN_SHAFT_DIAMETER = 0.1
+MIN_PRESSURE_ANGLE_LIMIT = 10.0
+MAX_PRESSURE_ANGLE_LIMIT = 85.0
+# Contact pressure used for torque estimates, N/mm^2 (roughly printed PLA)
+DEFAULT_ALLOWABLE_PRESSURE = 10.0
+
+
+class ParameterValidationError(ValueError):
+    """Raised when gearbox parameters are invalid."""
+    pass
+
+
+class GenerationCancelled(Exception):
+    """Raised when a generation is stopped through its CancellationToken."""
+    pass
+
+
+class CancellationToken:
+    """Flag a long running generation checks to stop early.
+
+    Args:
+        poll: Optional function returning True once the user asked to
+            stop, e.g. a progress dialog's wasCanceled.  It is called from
+            check at most every poll_interval seconds, so a GUI running the
+            generation in its own thread can still see the click.
+        poll_interval: Seconds between calls of poll
+    """
+
+    def __init__(self, poll: Optional[Callable[[], bool]] = None, poll_interval: float = 0.05):
+        self._event = threading.Event()
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self._polled = 0.0
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.poll is not None:
+            now = time.monotonic()
+            if now - self._polled >= self.poll_interval:
+                self._polled = now
+                if self.poll():
+                    self._event.set()
+        return self._event.is_set()
+
+    def check(self) -> None:
+        """Raise GenerationCancelled if cancelled.
+
+        Raises:
+            GenerationCancelled: If cancel was called or poll returned True
+        """
+        if self.cancelled:
+            raise GenerationCancelled("generation cancelled")
+
+
+def validate_parameters(parameters: Dict[str, Any]) -> None:
+    """Validate gearbox parameters for physical and mathematical constraints.
+
+    Args:
+        parameters: Dictionary containing gearbox parameters
+
+    Raises:
+        ParameterValidationError: If any parameter is invalid
+
+    Returns:
+        None
+    """
+    # Tooth count validation
+    tooth_count = parameters.get("tooth_count", 0)
+    if not isinstance(tooth_count, int) or tooth_count < MIN_TOOTH_COUNT:
+        raise ParameterValidationError(
+            f"tooth_count must be an integer >= {MIN_TOOTH_COUNT}, got {tooth_count}")
+    if tooth_count > MAX_TOOTH_COUNT:
+        raise ParameterValidationError(
+            f"tooth_count must be <= {MAX_TOOTH_COUNT}, got {tooth_count}")
+
+    # Eccentricity validation
+    eccentricity = parameters.get("eccentricity", 0)
+    if eccentricity < MIN_ECCENTRICITY:
+        raise ParameterValidationError(
+            f"eccentricity must be >= {MIN_ECCENTRICITY}, got {eccentricity}")
+
+    # Roller diameter validation
+    roller_diameter = parameters.get("roller_diameter", 0)
+    if roller_diameter < MIN_ROLLER_DIAMETER:
+        raise ParameterValidationError(
+            f"roller_diameter must be >= {MIN_ROLLER_DIAMETER}, got {roller_diameter}")
+
+    # Eccentricity should not be more than roller radius
+    roller_radius = roller_diameter / 2.0
+    if eccentricity > roller_radius:
+        logger.warning(
+            f"eccentricity ({eccentricity}) > roller_radius ({roller_radius}). "
+            f"This may cause manufacturing issues.")
+
+    # Roller circle diameter validation
+    roller_circle_diameter = parameters.get("roller_circle_diameter", 0)
+    if roller_circle_diameter <= roller_diameter:
+        raise ParameterValidationError(
+            f"roller_circle_diameter ({roller_circle_diameter}) must be > "
+            f"roller_diameter ({roller_diameter})")
+
+    # Shaft diameter validation
+    shaft_diameter = parameters.get("shaft_diameter", 0)
+    if shaft_diameter < MIN_SHAFT_DIAMETER:
+        raise ParameterValidationError(
+            f"shaft_diameter must be >= {MIN_SHAFT_DIAMETER}, got {shaft_diameter}")
+
+    # Pressure angle limit validation
+    pressure_angle_limit = parameters.get("pressure_angle_limit", 0)
+    if pressure_angle_limit < MIN_PRESSURE_ANGLE_LIMIT:
+        raise ParameterValidationError(
+            f"pressure_angle_limit must be >= {MIN_PRESSURE_ANGLE_LIMIT}, got {pressure_angle_limit}")
+    if pressure_angle_limit > MAX_PRESSURE_ANGLE_LIMIT:
+        raise ParameterValidationError(
+            f"pressure_angle_limit must be <= {MAX_PRESSURE_ANGLE_LIMIT}, got {pressure_angle_limit}")
+
+    # Diameter validation
+    diameter = parameters.get("Diameter", 0)
+    if diameter <= roller_circle_diameter:
+        raise ParameterValidationError(
+            f"Diameter ({diameter}) must be > roller_circle_diameter ({roller_circle_diameter})")
+
+    # Driver circle diameter validation
+    driver_circle_diameter = parameters.get("driver_circle_diameter", 0)
+    if driver_circle_diameter <= shaft_diameter:
+        raise ParameterValidationError(
+            f"driver_circle_diameter ({driver_circle_diameter}) must be > "
+            f"shaft_diameter ({shaft_diameter})")
+
+    # Height validations
+    base_height = parameters.get("base_height", 0)
+    disk_height = parameters.get("disk_height", 0)
+    if base_height <= 0 or disk_height <= 0:
+        raise ParameterValidationError(
+            f"Heights must be positive: base_height={base_height}, disk_height={disk_height}")
+
+    # Driver disk hole count
+    driver_disk_hole_count = parameters.get("driver_disk_hole_count", 0)
+    if driver_disk_hole_count < 3:
+        raise ParameterValidationError(
+            f"driver_disk_hole_count must be >= 3, got {driver_disk_hole_count}")
+
+    # Profile shape: the path of the roller centres must not loop, and the
+    # profile offset from it by the roller radius must not fold over
+    pin_circle_radius = roller_circle_diameter / 2.0
+    if not eccentricity * (tooth_count + 1) < pin_circle_radius:
+        raise ParameterValidationError(
+            f"eccentricity * (tooth_count + 1) ({eccentricity * (tooth_count + 1)}) must be < "
+            f"roller_circle_diameter / 2 ({pin_circle_radius}), or the profile loops")
+    curvature_radius = float(pin_path_curvature_radius(pin_circle_radius, eccentricity, tooth_count))
+    if not roller_radius < curvature_radius:
+        raise ParameterValidationError(
+            f"roller_diameter / 2 ({roller_radius}) must be < the smallest radius of curvature of the "
+            f"profile ({curvature_radius:.4g}), or the disk is undercut")
+
+    logger.info("Parameter validation passed")
+
+
+# Rules checked by validate_parameter_table, in bit order.  They mirror the
+# checks in validate_parameters; bit i of a row's mask is set when rule i fails.
+VALIDATION_RULES = (
+    ("tooth_count_min", f"tooth_count must be an integer >= {MIN_TOOTH_COUNT}"),
+    ("tooth_count_max", f"tooth_count must be <= {MAX_TOOTH_COUNT}"),
+    ("eccentricity_min", f"eccentricity must be >= {MIN_ECCENTRICITY}"),
+    ("roller_diameter_min", f"roller_diameter must be >= {MIN_ROLLER_DIAMETER}"),
+    ("roller_circle_diameter", "roller_circle_diameter must be > roller_diameter"),
+    ("shaft_diameter_min", f"shaft_diameter must be >= {MIN_SHAFT_DIAMETER}"),
+    ("pressure_angle_limit_min", f"pressure_angle_limit must be >= {MIN_PRESSURE_ANGLE_LIMIT}"),
+    ("pressure_angle_limit_max", f"pressure_angle_limit must be <= {MAX_PRESSURE_ANGLE_LIMIT}"),
+    ("Diameter", "Diameter must be > roller_circle_diameter"),
+    ("driver_circle_diameter", "driver_circle_diameter must be > shaft_diameter"),
+    ("heights", "Heights must be positive"),
+    ("driver_disk_hole_count", "driver_disk_hole_count must be >= 3"),
+    ("profile_loop", "eccentricity * (tooth_count + 1) must be < roller_circle_diameter / 2"),
+    ("profile_undercut", "roller_diameter / 2 must be < the smallest radius of curvature of the profile"),
+)
+
+
+def _table_column(table: Any, name: str, rows: int) -> np.ndarray:
+    """Fetch a column from a structured array or columnar dict, 0 when missing."""
+    names = table.dtype.names if isinstance(table, np.ndarray) else table.keys()
+    if name not in names:
+        return np.zeros(rows)
+    return np.asarray(table[name])
+
+
+def validate_parameter_table(table: Any) -> Tuple[np.ndarray, Dict[str, int]]:
+    """Validate many parameter sets at once.
+
+    Unlike validate_parameters this never raises: every row is checked
+    against every rule so design sweeps can prune infeasible regions before
+    any geometry is computed.  NaN values count as violations.
+
+    Args:
+        table: numpy structured array, or dict of equal length columns,
+            using the same names as the parameter dictionary
+
+    Returns:
+        Tuple of (mask, counts): mask is a uint32 array with bit i set where
+        VALIDATION_RULES[i] fails (0 means the row is valid), counts maps each
+        rule name to the number of rows violating it
+    """
+    if isinstance(table, np.ndarray):
+        rows = len(table)
+    else:
+        rows = len(next(iter(table.values()))) if table else 0
+
+    def column(name):
+        return _table_column(table, name, rows)
+
+    tooth_count = column("tooth_count")
+    roller_diameter = column("roller_diameter")
+    roller_circle_diameter = column("roller_circle_diameter")
+    shaft_diameter = column("shaft_diameter")
+    pressure_angle_limit = column("pressure_angle_limit")
+    if np.issubdtype(tooth_count.dtype, np.integer):
+        tooth_count_integer = np.ones(rows, dtype=bool)
+    else:
+        tooth_count_integer = tooth_count == np.floor(tooth_count)
+
+    failures = (
+        ~(tooth_count_integer & (tooth_count >= MIN_TOOTH_COUNT)),
+        ~(tooth_count <= MAX_TOOTH_COUNT),
+        ~(column("eccentricity") >= MIN_ECCENTRICITY),
+        ~(roller_diameter >= MIN_ROLLER_DIAMETER),
+        ~(roller_circle_diameter > roller_diameter),
+        ~(shaft_diameter >= MIN_SHAFT_DIAMETER),
+        ~(pressure_angle_limit >= MIN_PRESSURE_ANGLE_LIMIT),
+        ~(pressure_angle_limit <= MAX_PRESSURE_ANGLE_LIMIT),
+        ~(column("Diameter") > roller_circle_diameter),
+        ~(column("driver_circle_diameter") > shaft_diameter),
+        ~((column("base_height") > 0) & (column("disk_height") > 0)),
+        ~(column("driver_disk_hole_count") >= 3),
+        ~(column("eccentricity") * (tooth_count + 1) < roller_circle_diameter / 2.0),
+        ~(roller_diameter / 2.0 < pin_path_curvature_radius(roller_circle_diameter / 2.0, column("eccentricity"),
+                                                            tooth_count)),
+    )
+    mask = np.zeros(rows, dtype=np.uint32)
+    counts = {}
+    for bit, ((name, _), failed) in enumerate(zip(VALIDATION_RULES, failures)):
+        mask |= failed.astype(np.uint32) << np.uint32(bit)
+        counts[name] = int(np.count_nonzero(failed))
+    return mask, counts
+
+
+def describe_validation_mask(mask: int) -> List[str]:
+    """Return the messages of the rules set in one row's mask."""
+    return [message for bit, (_, message) in enumerate(VALIDATION_RULES) if int(mask) >> bit & 1]
+
+
+# Points over half a tooth of the roller centre path for the curvature check
+CURVATURE_SAMPLES = 256
+
+
+def pin_path_curvature_radius(pin_circle_radius: Any, eccentricity: Any, tooth_count: Any,
+                              samples: int = CURVATURE_SAMPLES) -> np.ndarray:
+    """Smallest radius of curvature of the convex parts of the roller centre path.
+
+    Relative to the disk the roller centres trace the epitrochoid
+    R u(t) + e u((tooth_count + 1) t) that calc_x/calc_y offset inward by
+    the roller radius.  Where the roller radius is larger than the path's
+    radius of curvature the offset folds over into a cusp and a loop: the
+    disk is undercut.  The path is symmetric about every lobe tip, so it
+    is sampled over half a tooth, from a tip (t = 0) to the next valley.
+
+    Arguments broadcast against each other, so a whole parameter table is
+    checked in one call.
+
+    Args:
+        pin_circle_radius: roller_circle_diameter / 2
+        eccentricity: Eccentricity
+        tooth_count: Number of teeth
+        samples: Points sampled over half a tooth
+
+    Returns:
+        Array of radii, NaN where the inputs make no curve
+    """
+    radius, e, n = (np.asarray(v, dtype=float)[..., None]
+                    for v in np.broadcast_arrays(pin_circle_radius, eccentricity, tooth_count))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.linspace(0.0, 1.0, samples) * (math.pi / n)
+        k = n + 1
+        dx = -radius * np.sin(t) - e * k * np.sin(k * t)
+        dy = radius * np.cos(t) + e * k * np.cos(k * t)
+        ddx = -radius * np.cos(t) - e * k * k * np.cos(k * t)
+        ddy = -radius * np.sin(t) - e * k * k * np.sin(k * t)
+        speed = np.hypot(dx, dy)
+        curvature = (dx * ddy - dy * ddx) / speed ** 3
+        result = np.where(curvature > 0, 1.0 / curvature, np.inf).min(axis=-1)
+        return np.where(np.isnan(curvature).any(axis=-1), np.nan, result)
+
+
+def polyline_self_intersections(points: np.ndarray, closed: bool = True) -> np.ndarray:
+    """Pairs of segments of a polyline that cross each other.
+
+    Segments are binned on a grid (a spatial hash) with cells as large as
+    the longest segment, so each one touches at most four cells and only
+    segments sharing a cell are tested.  Neighbouring segments meeting at
+    their common point do not count, nor do segments that only touch.
+
+    Args:
+        points: (N, 2) vertices
+        closed: The last point joins the first
+
+    Returns:
+        (K, 2) array of segment indices i < j, segment i running from
+        points[i] to points[i + 1]
+    """
+    points = np.asarray(points, dtype=float)
+    start = points if closed else points[:-1]
+    end = np.roll(points, -1, axis=0) if closed else points[1:]
+    count = len(start)
+    if count < 3:
+        return np.zeros((0, 2), dtype=np.int64)
+    cell = max(float(np.hypot(*(end - start).T).max()), 1e-12)
+    low = np.floor(np.minimum(start, end) / cell).astype(np.int64)
+    high = np.floor(np.maximum(start, end) / cell).astype(np.int64)
+    entries = []
+    for dx in (0, 1):
+        for dy in (0, 1):
+            keep = (low[:, 0] + dx <= high[:, 0]) & (low[:, 1] + dy <= high[:, 1])
+            index = np.nonzero(keep)[0]
+            entries.append(np.stack((low[index, 0] + dx, low[index, 1] + dy, index), axis=-1))
+    entries = np.concatenate(entries)
+    entries = entries[np.lexsort((entries[:, 2], entries[:, 1], entries[:, 0]))]
+    # every pair within a cell: compare each entry with the ones k places on
+    pairs = []
+    for k in range(1, len(entries)):
+        same = (entries[k:, :2] == entries[:-k, :2]).all(axis=1)
+        if not same.any():
+            break
+        pairs.append(np.stack((entries[:-k, 2][same], entries[k:, 2][same]), axis=-1))
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+    pairs = np.unique(np.sort(np.concatenate(pairs), axis=1), axis=0)
+    gap = pairs[:, 1] - pairs[:, 0]
+    adjacent = (gap <= 1) | (closed & (gap == count - 1))
+    pairs = pairs[~adjacent]
+
+    def side(a, b, p):
+        return (b[:, 0] - a[:, 0]) * (p[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (p[:, 0] - a[:, 0])
+
+    a1, b1, a2, b2 = start[pairs[:, 0]], end[pairs[:, 0]], start[pairs[:, 1]], end[pairs[:, 1]]
+    crossing = ((side(a1, b1, a2) * side(a1, b1, b2) < 0) & (side(a2, b2, a1) * side(a2, b2, b1) < 0))
+    return pairs[crossing]
+
+
+def validate_profile(parameters: Dict[str, Any]) -> None:
+    """Check the cycloidal disk outline does not cross itself.
+
+    validate_parameters already rejects profiles that loop or are
+    undercut; this checks the outline as generated, after the pressure
+    angle truncation, and takes a few milliseconds.
+
+    Args:
+        parameters: Gearbox parameters including min_rad/max_rad
+
+    Raises:
+        ParameterValidationError: If the outline crosses itself
+    """
+    outline = cycloidal_disk_outline(parameters)
+    crossings = polyline_self_intersections(outline)
+    if len(crossings):
+        x, y = outline[crossings[0, 0]]
+        raise ParameterValidationError(
+            f"the cycloidal disk outline crosses itself {len(crossings)} times, first near ({x:.3f}, {y:.3f})")
+
+
+# Wall thicknesses and overlaps between features of different parts, in the
+# order check_feasibility reports them.  A margin is the thinnest wall left
+# between the two features in mm, negative where they overlap.
+FEASIBILITY_CHECKS = (
+    ("disk_hole_edge", "driver holes to the edge of the cycloidal disk"),
+    ("disk_center_edge", "center hole to the edge of the cycloidal disk"),
+    ("disk_hole_center", "driver holes to the center hole of the cycloidal disk"),
+    ("disk_hole_spacing", "neighbouring driver holes in the cycloidal disk"),
+    ("input_pins_center", "input shaft pins to the cycloidal disk center hole"),
+    ("driver_pin_edge", "driver pins to the edge of the driver disk"),
+    ("driver_pin_shaft", "driver pins to the shaft hole of the driver disk"),
+    ("output_hole_edge", "driver pin holes to the edge of the output shaft"),
+    ("output_hole_spacing", "neighbouring driver pin holes in the output shaft"),
+    ("roller_spacing", "neighbouring rollers"),
+    ("roller_outer_wall", "rollers to the outside of the pin disk"),
+    ("roller_recess", "rollers to the driver disk recess in the pin disk"),
+)
+
+# Points around the roller centre path for the distance to the disk edge
+FEASIBILITY_SAMPLES = 2048
+_FEASIBILITY_CHUNK = 256
+
+
+class FeasibilityViolation(NamedTuple):
+    """One wall that is thinner than allowed."""
+    name: str           # FEASIBILITY_CHECKS name
+    margin: float       # thinnest wall in mm, negative for an overlap
+    message: str
+
+
+def _feasibility_column(table: Any, name: str) -> np.ndarray:
+    names = table.dtype.names if isinstance(table, np.ndarray) else table.keys()
+    if name not in names:
+        raise KeyError(f"feasibility needs the {name} parameter")
+    return np.asarray(table[name], dtype=float)
+
+
+def _distance_to_pin_path(points: np.ndarray, pin_circle_radius: np.ndarray, eccentricity: np.ndarray,
+                          tooth_count: np.ndarray, samples: int) -> np.ndarray:
+    """Distance from points (rows, k, 2) about the profile centre to the roller centre path."""
+    t = np.linspace(0.0, 2 * math.pi, samples, endpoint=False)
+    result = np.empty(points.shape[:2])
+    for start in range(0, len(points), _FEASIBILITY_CHUNK):
+        rows = slice(start, start + _FEASIBILITY_CHUNK)
+        radius, e, k = (v[rows, None] for v in (pin_circle_radius, eccentricity, tooth_count + 1))
+        x = radius * np.cos(t) + e * np.cos(k * t)
+        y = radius * np.sin(t) + e * np.sin(k * t)
+        dx = x[:, None, :] - points[rows, :, 0, None]
+        dy = y[:, None, :] - points[rows, :, 1, None]
+        result[rows] = np.hypot(dx, dy).min(axis=-1)
+    return result
+
+
+def feasibility_margins(table: Any, samples: int = FEASIBILITY_SAMPLES) -> Dict[str, np.ndarray]:
+    """Wall thickness between every pair of features of FEASIBILITY_CHECKS.
+
+    The parts are sized from separate formulas: the cycloidal disk's driver
+    holes are driver_hole_diameter + 2 * eccentricity wide on the driver
+    circle around (eccentricity, 0), while the profile is drawn around
+    (-eccentricity, 0); the driver disk and output shaft are min_rad in
+    radius; the input shaft pins sit inside the disk's center hole.
+    Nothing checks these against each other until the solids overlap, so
+    this works every wall out from the parameters alone, without FreeCAD.
+
+    The distance from a hole to the disk edge is its distance to the
+    roller centre path, less the roller radius and pressure_angle_offset,
+    which holds wherever the disk is not undercut (see validate_parameters).
+
+    Args:
+        table: Parameter dictionary, or numpy structured array or dict of
+            equal length columns, including min_rad
+        samples: Points around the roller centre path
+
+    Returns:
+        Dictionary of margin arrays in mm, one per FEASIBILITY_CHECKS name,
+        shaped like the columns (0-d for a parameter dictionary)
+
+    Raises:
+        KeyError: If a parameter is missing
+    """
+    def column(name):
+        return _feasibility_column(table, name)
+
+    e = column("eccentricity")
+    tooth_count = column("tooth_count")
+    shape = np.broadcast(e, tooth_count, column("min_rad")).shape
+    pin_circle_radius = column("roller_circle_diameter") / 2.0
+    roller_radius = column("roller_diameter") / 2.0
+    clearance = column("clearance")
+    shaft_diameter = column("shaft_diameter")
+    min_rad = column("min_rad")
+    driver_radius = column("driver_circle_diameter") / 2.0
+    driver_hole = column("driver_hole_diameter")
+    hole_count = column("driver_disk_hole_count")
+    spacing = 2.0 * np.sin(math.pi / hole_count)
+
+    # cycloidal disk, about the profile centre: the holes are 2e to the right of it
+    disk_hole_radius = driver_hole / 2.0 + e
+    center_hole_radius = (shaft_diameter + clearance) / 2.0
+    flat = [np.broadcast_to(v, shape).reshape(-1)
+            for v in (e, tooth_count, pin_circle_radius, driver_radius, hole_count)]
+    rows = len(flat[0])
+    most = int(flat[4].max()) if rows else 0
+    holes = np.arange(most + 1)
+    angle = 2 * math.pi * holes[None, :] / flat[4][:, None]
+    points = np.stack((2 * flat[0][:, None] + flat[3][:, None] * np.cos(angle),
+                       flat[3][:, None] * np.sin(angle)), axis=-1)
+    # the extra last point is the center hole; holes past a row's count repeat hole 0
+    points[:, -1] = np.stack((2 * flat[0], np.zeros(rows)), axis=-1)
+    points[:, :-1] = np.where((holes[None, :-1] < flat[4][:, None])[..., None], points[:, :-1], points[:, :1])
+    distance = _distance_to_pin_path(points, flat[2], flat[0], flat[1], samples)
+    to_edge = distance - np.broadcast_to(roller_radius + column("pressure_angle_offset"), shape).reshape(-1)[:, None]
+
+    # input shaft pins, as placed in generate_input_shaft_part against the hole at (e, 0)
+    inner_radius = (shaft_diameter + e) / 2.0
+    pins = (-(inner_radius - 2 * e) / 2.0, -(inner_radius - 2.5 * e))
+    pin_reach = np.maximum(*(np.abs(x - e) for x in pins)) + e
+
+    rollers = column("roller_circle_diameter") / 2.0 + clearance
+    margins = {
+        "disk_hole_edge": to_edge[:, :-1].min(axis=-1).reshape(shape) - disk_hole_radius,
+        "disk_center_edge": to_edge[:, -1].reshape(shape) - center_hole_radius,
+        "disk_hole_center": driver_radius - disk_hole_radius - center_hole_radius,
+        "disk_hole_spacing": driver_radius * spacing - 2 * disk_hole_radius,
+        "input_pins_center": center_hole_radius - pin_reach,
+        "driver_pin_edge": min_rad - driver_radius - driver_hole / 2.0,
+        "driver_pin_shaft": driver_radius - driver_hole / 2.0 - (shaft_diameter + e + clearance / 2.0) / 2.0,
+        "output_hole_edge": min_rad - driver_radius - (driver_hole + clearance) / 2.0,
+        "output_hole_spacing": driver_radius * spacing - (driver_hole + clearance),
+        "roller_spacing": rollers * 2.0 * np.sin(math.pi / (tooth_count + 1)) - 2 * roller_radius,
+        "roller_outer_wall": column("Diameter") / 2.0 - rollers - roller_radius,
+        "roller_recess": rollers - roller_radius - (min_rad + clearance / 2.0),
+    }
+    return {name: np.broadcast_to(margins[name], shape).copy() for name, _ in FEASIBILITY_CHECKS}
+
+
+def check_feasibility(parameters: Dict[str, Any], min_wall: float = 0.0,
+                      samples: int = FEASIBILITY_SAMPLES) -> List[FeasibilityViolation]:
+    """Every wall between features of different parts thinner than min_wall.
+
+    Args:
+        parameters: Gearbox parameters; min_rad is calculated when missing
+        min_wall: Thinnest wall allowed in mm, 0 to only report overlaps
+        samples: Points around the roller centre path
+
+    Returns:
+        The violations in FEASIBILITY_CHECKS order, empty when every wall
+        is at least min_wall thick
+    """
+    if "min_rad" not in parameters:
+        parameters = dict(parameters, min_rad=calculate_min_max_radii(parameters)[0])
+    margins = feasibility_margins(parameters, samples)
+    violations = []
+    for name, description in FEASIBILITY_CHECKS:
+        margin = float(margins[name])
+        if not margin >= min_wall:
+            state = "overlap" if margin < 0 else "leave"
+            violations.append(FeasibilityViolation(
+                name, margin, f"{description} {state} {abs(margin):.3f} mm, minimum wall is {min_wall:g} mm"))
+    return violations
+
+
+def feasibility_table(table: Any, min_wall: float = 0.0,
+                      samples: int = FEASIBILITY_SAMPLES) -> Tuple[np.ndarray, Dict[str, int]]:
+    """check_feasibility for many parameter sets at once.
+
+    The same layout as validate_parameter_table, so sweeps can prune with
+    both masks before any geometry is built.  NaN margins count as
+    violations.
+
+    Args:
+        table: numpy structured array, or dict of equal length columns,
+            including min_rad
+        min_wall: Thinnest wall allowed in mm
+        samples: Points around the roller centre path
+
+    Returns:
+        Tuple of (mask, counts): mask is a uint32 array with bit i set where
+        FEASIBILITY_CHECKS[i] fails, counts maps each check name to the
+        number of rows violating it
+    """
+    margins = feasibility_margins(table, samples)
+    rows = len(next(iter(margins.values())))
+    mask = np.zeros(rows, dtype=np.uint32)
+    counts = {}
+    for bit, (name, _) in enumerate(FEASIBILITY_CHECKS):
+        failed = ~(margins[name] >= min_wall)
+        mask |= failed.astype(np.uint32) << np.uint32(bit)
+        counts[name] = int(np.count_nonzero(failed))
+    return mask, counts
+
+
+def to_polar(x: float, y: float) -> Tuple[float, float]:
+    """Convert Cartesian to polar coordinates.
+
+    Args:
+        x: X coordinate
+        y: Y coordinate
+
+    Returns:
+        Tuple of (radius, angle_in_radians)
+    """
+    return (x ** 2.0 + y ** 2.0) ** 0.5, math.atan2(y, x)
+
+
+def to_rect(r: float, a: float) -> Tuple[float, float]:
+    """Convert polar to Cartesian coordinates.
+
+    Args:
+        r: Radius
+        a: Angle in radians
+
+    Returns:
+        Tuple of (x, y) coordinates
+    """
+    return r * math.cos(a), r * math.sin(a)
+
+                                                                              
+def calcyp(p: float, a: float, e: float, n: int) -> float:
+    """Calculate pressure angle offset parameter.
+
+    Args:
+        p: Pitch parameter
+        a: Angle
+        e: Eccentricity
+        n: Tooth count
+
+    Returns:
+        Pressure angle offset in radians
+
+    Raises:
+        ValueError: If denominator is too close to zero
+    """
+    denominator = math.cos(n*a) + (n*p)/(e*(n+1))
+    if abs(denominator) < 1e-10:
+        raise ValueError(f"Division by zero in calcyp at angle {a}")
+    return math.atan(math.sin(n*a) / denominator)
+
+def calc_x(p: float, roller_diameter: float, eccentricity: float,
+           tooth_count: int, angle: float) -> float:
+    """Calculate X coordinate of cycloidal disk point.
+
+    Args:
+        p: Pitch parameter
+        roller_diameter: Diameter of roller pins
+        eccentricity: Eccentricity of disk
+        tooth_count: Number of teeth
+        angle: Angle in radians
+
+    Returns:
+        X coordinate
+    """
+    return (tooth_count*p)*math.cos(angle)+eccentricity*math.cos((tooth_count+1)*angle)-roller_diameter/2*math.cos(calcyp(p,angle,eccentricity,tooth_count)+angle)
+
+def calc_y(p: float, roller_diameter: float, eccentricity: float,
+           tooth_count: int, angle: float) -> float:
+    """Calculate Y coordinate of cycloidal disk point.
+
+    Args:
+        p: Pitch parameter
+        roller_diameter: Diameter of roller pins
+        eccentricity: Eccentricity of disk
+        tooth_count: Number of teeth
+        angle: Angle in radians
+
+    Returns:
+        Y coordinate
+    """                                                     
+    return (tooth_count*p)*math.sin(angle)+eccentricity*math.sin((tooth_count+1)*angle)-roller_diameter/2*math.sin(calcyp(p,angle,eccentricity,tooth_count)+angle)
+
+
+def calc_pressure_limit(pin_circle_radius,roller_diameter,eccentricity,angle):
+    ex = 2**0.5        
+    rg = pin_circle_radius/ex
+    q = (pin_circle_radius**2 + rg**2 - 2*pin_circle_radius*rg*math.cos(angle))**0.5
+    x = rg - eccentricity + (q-roller_diameter/2)*(pin_circle_radius*math.cos(angle)-rg)/q
+    y = (q-roller_diameter/2)*pin_circle_radius*math.sin(angle)/q
+    return (x**2 + y**2)**0.5
+
+def check_limit(x,y,maxrad,minrad,offset):
+    r, a = to_polar(x, y)
+    if (r > maxrad) or (r < minrad):
+            r = r - offset
+            x, y = to_rect(r, a)
+    return x, y
+
+
+def calculate_radii(pin_count: int, eccentricity, outer_diameter, pin_diameter:float):
+    """Calculate radii for epitrochoid generation.
+
+    :param pin_count: Number of teeth of cycloidal gear
+    :param eccentricity: offset of cycloidal gear
+    :param outer_diameter: diameter of gear
+    :param pin_diameter: diameter of pins
+    :return: r1,r2 (formulas used for calculating points along the array)
+    """
+    outer_radius = outer_diameter / 2.0
+    pin_radius = pin_diameter / 2.0
+
+    # Clamp pin count to valid range
+    if pin_count < MIN_TOOTH_COUNT:
+        logger.warning(f"pin_count {pin_count} < {MIN_TOOTH_COUNT}, clamping to minimum")
+        pin_count = MIN_TOOTH_COUNT
+    if pin_count > MAX_TOOTH_COUNT:
+        logger.warning(f"pin_count {pin_count} > {MAX_TOOTH_COUNT}, clamping to maximum")
+        pin_count = MAX_TOOTH_COUNT
+
+    # e cannot be larger than r (d/2)
+    if eccentricity > pin_radius:
+        logger.warning(f"eccentricity {eccentricity} > pin_radius {pin_radius}, clamping")
+        eccentricity = pin_radius
+
+    # Validate r based on R and N: cannot be larger than R * sin(pi/N) or the circles won't fit
+    max_pin_radius = outer_radius * math.sin(math.pi) / pin_count
+    if pin_radius > max_pin_radius:
+        logger.warning(f"pin_radius {pin_radius} > max {max_pin_radius}, clamping")
+        pin_radius = max_pin_radius
+
+    inset = pin_radius
+    angle = 360 / pin_count
+
+    # To draw an epitrochoid, we need r1 (big circle), r2 (small rolling circle) and d (displacement of point)
+    # r1 + r2 = R = D/2
+    # r1/r2 = (N-1)
+    # From the above equations: r1 = (N - 1) * R/N, r2 = R/N
+    r1 = (pin_count - 1)* outer_radius / pin_count
+    r2 = outer_radius / pin_count
+    return r1,r2
+
+def calculate(step : int, eccentricity, r1, r2: float):
+    X = (r1 + r2) * math.cos(2 * math.pi * step) + eccentricity * math.cos((r1 + r2) * 2 * math.pi * step / r2)
+    Y = (r1 + r2) * math.sin(2 * math.pi * step) + eccentricity * math.sin((r1 + r2) * 2 * math.pi * step / r2)
+    return X,Y,0.0
+
+def clean1(a: float) -> float:
+    """Clamp value to range [-1, 1].
+
+    Args:
+        a: Value to clamp
+
+    Returns:
+        Clamped value between -1 and 1
+    """
+    return min(1, max(a, -1))
+
+
+def driver_shaft_hole(radius,hole_count,hole_number):        
+    x = radius * math.cos((2.0 * math.pi / hole_count) * hole_number)
+    y = radius * math.sin((2.0 * math.pi / hole_count) * hole_number)
+    return x,y
+
+
+def calculate_pressure_angle(p,roller_diameter,tooth_count,angle):
+    """Calculate pressure angle at given angle.
+
+    Args:
+        p: Pitch parameter
+        roller_diameter: Diameter of roller
+        tooth_count: Number of teeth
+        angle: Angle in radians
+
+    Returns:
+        Pressure angle in degrees
+
+    Raises:
+        ValueError: If calculation results in invalid domain for asin
+    """
+    ex = 2**0.5
+    r3 = p * tooth_count
+    rg = r3/ex
+    pp = rg * (ex**2 + 1 - 2*ex*math.cos(angle))**0.5 - roller_diameter/2
+
+    # Protect against math domain errors in asin
+    denominator = pp + roller_diameter/2
+    if abs(denominator) < 1e-10:
+        raise ValueError(f"Division by zero in pressure angle calculation at angle {angle}")
+
+    asin_arg = (r3*math.cos(angle)-rg) / denominator
+
+    # Clamp to valid asin domain [-1, 1]
+    if asin_arg < -1.0 or asin_arg > 1.0:
+        logger.warning(f"asin argument {asin_arg} out of range [-1,1], clamping")
+        asin_arg = max(-1.0, min(1.0, asin_arg))
+
+    return math.asin(asin_arg) * RAD_TO_DEG
+
+
+
+def calculate_pressure_limit(p,roller_diameter,eccentricity,tooth_count,a):
+    ex = 2**0.5
+    r3 = p*tooth_count
+    rg = r3/ex
+    q = (r3**2 + rg**2 - 2*r3*rg*math.cos(a))**0.5
+    x = rg - eccentricity + (q-roller_diameter/2)*(r3*math.cos(a)-rg)/q
+    y = (q-roller_diameter/2)*r3*math.sin(a)/q
+    return (x**2 + y**2)**0.5
+
+
+def calculate_min_max_radii(parameters):
+    """ Find the pressure angle limit circles """
+    pin_circle_radius = parameters["roller_circle_diameter"] / 2.0
+    tooth_count = parameters["tooth_count"]
+    roller_diameter = parameters["roller_diameter"]
+    pressure_angle_limit = parameters["pressure_angle_limit"]
+    eccentricity = parameters["eccentricity"]
+    p = pin_circle_radius / tooth_count
+
+    minAngle = -1.0
+    maxAngle = -1.0
+    for i in range(0, 180):
+        x = calculate_pressure_angle(p,roller_diameter,tooth_count, i * math.pi / 180.)
+        if ( x < pressure_angle_limit) and (minAngle < 0):
+            minAngle = float(i)
+        if (x < -pressure_angle_limit) and (maxAngle < 0):
+            maxAngle = float(i-1)
+    min_radius = calculate_pressure_limit(p,roller_diameter,eccentricity,tooth_count, minAngle * math.pi / 180.)
+    max_radius = calculate_pressure_limit(p,roller_diameter,eccentricity,tooth_count, maxAngle * math.pi / 180.)
+
+    return min_radius, max_radius
+
+
+
+def calc_DriveHoleRRadius(driver_circle_diameter,shaft_diameter):
+    """ Calculates the radius that the drive holes are in
+    about 1/2 way between rollers and central shaft."""  
+    #not using parameters as these values might be resized from requested  
+    cent = (driver_circle_diameter/2+shaft_diameter)/2
+    return cent
+
+
+def generate_slot_size(parameters,add_clearence):        
+    key_radius = parameters["key_diameter"]/2
+    key_flat = parameters["key_flat_diameter"] -key_radius    
+    key_radius += add_clearence /2
+    key_flat += add_clearence /2
+    return key_radius,key_flat
+
+
+def generate_default_parameters():
+    parameters = {
+        "eccentricity": 2.0,#4.7 / 2,
+        "tooth_count": 11,#12,
+        "driver_disk_hole_count": 6,
+        "driver_hole_diameter": 10,
+        "driver_circle_diameter": 50.0,
+        "line_segment_count": 42, #tooth_count squared
+        "tooth_pitch": 4,
+        "Diameter" : 95,#110,
+        "roller_diameter": 9.4,
+        "roller_circle_diameter" : 80,
+        "pressure_angle_limit": 50.0,
+        "pressure_angle_offset": 0.1,
+        "base_height":10.0,
+        "disk_height":5.0,
+        "shaft_diameter":13.0,
+        "key_diameter":5,
+        "key_flat_diameter": 4.8,
+        "Height" : 20.0,
+        "clearance" : 0.5        
+        }
+    minr,maxr = calculate_min_max_radii(parameters)            
+    parameters["min_rad"] = minr
+    parameters["max_rad"] = maxr
+    return parameters
+
+
+def pin_contact_geometry(parameters: Dict[str, Any], phase: float = 0.0) -> Dict[str, np.ndarray]:
+    """Contact geometry between the ring pins and one cycloidal disk.
+
+    The common normal at every pin passes through the pitch point, which sits
+    (tooth_count + 1) * eccentricity from the box centre along the eccentric.
+    That gives the line of action of every pin force without having to sample
+    the profile.
+
+    Args:
+        parameters: Gearbox parameters (min_rad/max_rad are used when present)
+        phase: Input shaft angle in radians
+
+    Returns:
+        Dictionary of per-pin numpy arrays:
+            lever_arm: signed moment arm of the pin force about the disk centre
+            pressure_angle: angle in degrees between the pin force and the
+                direction the contact point moves in
+            contact_radius: distance of the contact point from the disk centre
+            loaded: True for pins that push the disk in the positive direction
+                and whose contact lies inside the pressure angle limit circles
+    """
+    tooth_count = int(parameters["tooth_count"])
+    eccentricity = parameters["eccentricity"]
+    roller_radius = parameters["roller_diameter"] / 2.0
+    pin_circle_radius = parameters["roller_circle_diameter"] / 2.0
+
+    pin_angles = np.arange(tooth_count + 1) * (2.0 * math.pi / (tooth_count + 1))
+    pins = pin_circle_radius * np.stack((np.cos(pin_angles), np.sin(pin_angles)), axis=-1)
+    direction = np.array((math.cos(phase), math.sin(phase)))
+    center = eccentricity * direction
+    pitch_point = (tooth_count + 1) * eccentricity * direction
+
+    normal = pins - pitch_point
+    normal /= np.hypot(normal[:, 0], normal[:, 1])[:, None]
+    relative = pins - center
+    lever_arm = relative[:, 0] * normal[:, 1] - relative[:, 1] * normal[:, 0]
+    pin_distance = np.hypot(relative[:, 0], relative[:, 1])
+    pressure_angle = np.degrees(np.arccos(np.clip(np.abs(lever_arm) / pin_distance, 0.0, 1.0)))
+    contact = relative - roller_radius * normal
+    contact_radius = np.hypot(contact[:, 0], contact[:, 1])
+
+    loaded = lever_arm > 0
+    if "min_rad" in parameters and "max_rad" in parameters:
+        loaded &= (contact_radius >= parameters["min_rad"]) & (contact_radius <= parameters["max_rad"])
+    return {"lever_arm": lever_arm,
+            "pressure_angle": pressure_angle,
+            "contact_radius": contact_radius,
+            "loaded": loaded}
+
+
+def estimate_torque_capacity(parameters: Dict[str, Any],
+                             allowable_pressure: float = DEFAULT_ALLOWABLE_PRESSURE) -> float:
+    """Estimate the output torque the two disks can carry, in N*mm.
+
+    The most heavily loaded pin is limited to allowable_pressure over its
+    projected area (roller_diameter * disk_height); the other loaded pins
+    share the load in proportion to their lever arms, as they would for a
+    uniformly stiff disk.
+
+    Args:
+        parameters: Gearbox parameters including min_rad/max_rad
+        allowable_pressure: Permitted contact pressure in N/mm^2 (MPa)
+
+    Returns:
+        Torque estimate, 0.0 if no pin is able to carry load
+    """
+    geometry = pin_contact_geometry(parameters)
+    lever_arm = geometry["lever_arm"][geometry["loaded"]]
+    if lever_arm.size == 0:
+        return 0.0
+    max_pin_force = allowable_pressure * parameters["roller_diameter"] * parameters["disk_height"]
+    return float(2.0 * max_pin_force * np.sum(lever_arm ** 2) / np.max(lever_arm))
+
+
+# Names of the bodies generate_parts creates, in the order it creates them
+PART_NAMES = ("pinDisk", "driverDisk", "inputShaft", "cycloidalDisk1",
+              "cycloidalDisk2", "eccentricKey", "outputShaft")
+
+
+def calc_xy_array(p: float, roller_diameter: float, eccentricity: float,
+                  tooth_count: int, angles: np.ndarray) -> np.ndarray:
+    """Vectorised calc_x/calc_y for an array of angles.
+
+    Args:
+        p: Pitch parameter
+        roller_diameter: Diameter of roller pins
+        eccentricity: Eccentricity of disk
+        tooth_count: Number of teeth
+        angles: Angles in radians
+
+    Returns:
+        (len(angles), 2) array of x, y coordinates
+
+    Raises:
+        ValueError: If the calcyp denominator is too close to zero at any angle
+    """
+    n = tooth_count
+    denominator = np.cos(n * angles) + (n * p) / (eccentricity * (n + 1))
+    if np.any(np.abs(denominator) < 1e-10):
+        bad = angles[np.argmin(np.abs(denominator))]
+        raise ValueError(f"Division by zero in calcyp at angle {bad}")
+    normal_angle = np.arctan(np.sin(n * angles) / denominator) + angles
+    x = n * p * np.cos(angles) + eccentricity * np.cos((n + 1) * angles) - roller_diameter / 2 * np.cos(normal_angle)
+    y = n * p * np.sin(angles) + eccentricity * np.sin((n + 1) * angles) - roller_diameter / 2 * np.sin(normal_angle)
+    return np.stack((x, y), axis=-1)
+
+
+def check_limit_array(points: np.ndarray, maxrad: float, minrad: float, offset: float) -> np.ndarray:
+    """Vectorised check_limit: pull points outside the limit circles in by offset."""
+    radius = np.hypot(points[:, 0], points[:, 1])
+    outside = (radius > maxrad) | (radius < minrad)
+    scale = np.where(outside, (radius - offset) / np.where(radius == 0, 1.0, radius), 1.0)
+    return points * scale[:, None]
+
+
+def cycloidal_disk_curve(parameters: Dict[str, Any]) -> np.ndarray:
+    """The calc_x/calc_y points of one tooth, before check_limit.
+
+    Only depends on PROFILE_CURVE_KEYS.
+
+    Args:
+        parameters: Gearbox parameters
+
+    Returns:
+        (line_segment_count + 1, 2) array of x, y coordinates about the disk centre
+    """
+    tooth_count = parameters["tooth_count"]
+    line_segment_count = parameters["line_segment_count"]
+    p = parameters["roller_circle_diameter"] / 2.0 / tooth_count
+    angles = np.arange(line_segment_count + 1) * (2 * math.pi / float(line_segment_count)) / tooth_count
+    return calc_xy_array(p, parameters["roller_diameter"], parameters["eccentricity"], tooth_count, angles)
+
+
+def truncate_disk_curve(curve: np.ndarray, max_radius: float, min_radius: float,
+                        offset: float, eccentricity: float) -> np.ndarray:
+    """Apply check_limit to a raw tooth curve and move it to sketch coordinates."""
+    points = check_limit_array(curve, max_radius, min_radius, offset)
+    points[:, 0] -= eccentricity
+    return points
+
+
+def cycloidal_disk_profile(parameters: Dict[str, Any]) -> np.ndarray:
+    """One tooth of the cycloidal disk, as generate_cycloidal_disk_array makes it.
+
+    Args:
+        parameters: Gearbox parameters including min_rad/max_rad
+
+    Returns:
+        (line_segment_count + 1, 2) array of sketch x, y coordinates
+    """
+    return truncate_disk_curve(cycloidal_disk_curve(parameters), parameters["max_rad"], parameters["min_rad"],
+                               parameters["pressure_angle_offset"], parameters["eccentricity"])
+
+
+def cycloidal_disk_outline(parameters: Dict[str, Any]) -> np.ndarray:
+    """The closed outline of the whole cycloidal disk.
+
+    Repeats the single tooth from cycloidal_disk_profile tooth_count times
+    around (-eccentricity, 0), the same transform the disk sketch applies.
+
+    Args:
+        parameters: Gearbox parameters including min_rad/max_rad
+
+    Returns:
+        (tooth_count * line_segment_count, 2) array, counter-clockwise, without
+        repeating the first point at the end
+    """
+    tooth_count = parameters["tooth_count"]
+    eccentricity = parameters["eccentricity"]
+    tooth = cycloidal_disk_profile(parameters)[:-1]
+    tooth[:, 0] += eccentricity
+    angles = 2 * math.pi / tooth_count * np.arange(1, tooth_count + 1)
+    cos, sin = np.cos(angles)[:, None], np.sin(angles)[:, None]
+    x = cos * tooth[:, 0] - sin * tooth[:, 1] - eccentricity
+    y = sin * tooth[:, 0] + cos * tooth[:, 1]
+    return np.stack((x.ravel(), y.ravel()), axis=-1)
+
+
+# Parameters each cached stage of ProfilePipeline depends on
+PROFILE_CURVE_KEYS = ("tooth_count", "roller_circle_diameter", "roller_diameter",
+                      "eccentricity", "line_segment_count")
+LIMIT_RADII_KEYS = ("tooth_count", "roller_circle_diameter", "roller_diameter",
+                    "eccentricity", "pressure_angle_limit")
+
+
+class ProfilePipeline:
+    """The cycloidal disk profile as a chain of cached stages.
+
+    raw curve -> limit radii -> truncation, plus any later stages (the
+    spline fit and sketch geometry in cycloidFun) registered with stage().
+    Each stage remembers the key of the inputs it was last computed for
+    and only recomputes when that key changes, so changing
+    pressure_angle_offset or pressure_angle_limit skips the trigonometric
+    sampling of the raw curve.
+
+    Cached arrays are read only; copy them before changing them.
+    """
+
+    def __init__(self):
+        self._cache: Dict[str, Tuple[Any, Any]] = {}
+        # Number of times each stage was actually computed
+        self.computed: Dict[str, int] = {}
+
+    def stage(self, name: str, key: Any, compute: Callable[[], Any]) -> Any:
+        """Return the cached value of stage name, computing it if key changed.
+
+        Args:
+            name: Stage name
+            key: Hashable description of everything the stage depends on
+            compute: Called without arguments when the value is stale
+
+        Returns:
+            The stage value
+        """
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        value = compute()
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        self._cache[name] = (key, value)
+        self.computed[name] = self.computed.get(name, 0) + 1
+        return value
+
+    def clear(self) -> None:
+        """Forget every cached stage."""
+        self._cache.clear()
+
+    def curve_key(self, parameters: Dict[str, Any]) -> Tuple:
+        return tuple(parameters[k] for k in PROFILE_CURVE_KEYS)
+
+    def raw_curve(self, parameters: Dict[str, Any]) -> np.ndarray:
+        """Stage 1: cycloidal_disk_curve."""
+        return self.stage("curve", self.curve_key(parameters), lambda: cycloidal_disk_curve(parameters))
+
+    def limit_radii(self, parameters: Dict[str, Any]) -> Tuple[float, float]:
+        """Stage 2: calculate_min_max_radii."""
+        key = tuple(parameters[k] for k in LIMIT_RADII_KEYS)
+        return self.stage("radii", key, lambda: calculate_min_max_radii(parameters))
+
+    def profile_key(self, parameters: Dict[str, Any]) -> Tuple:
+        """Key of the truncated profile; later stages built on it can use it as theirs.
+
+        min_rad/max_rad are taken from parameters when present, like
+        generate_cycloidal_disk_array does, else from the radii stage.
+        """
+        if "min_rad" in parameters and "max_rad" in parameters:
+            radii = (parameters["min_rad"], parameters["max_rad"])
+        else:
+            radii = self.limit_radii(parameters)
+        return self.curve_key(parameters) + radii + (parameters["pressure_angle_offset"],)
+
+    def profile(self, parameters: Dict[str, Any]) -> np.ndarray:
+        """Stage 3: the check_limit truncated tooth, as cycloidal_disk_profile."""
+        key = self.profile_key(parameters)
+        min_radius, max_radius, offset = key[-3:]
+        return self.stage("profile", key, lambda: truncate_disk_curve(
+            self.raw_curve(parameters), max_radius, min_radius, offset, parameters["eccentricity"]))
+
+    def cached(self, name: str) -> Optional[Tuple[Any, Any]]:
+        """The (key, value) a stage currently holds, or None."""
+        return self._cache.get(name)
+
+    def seed(self, name: str, key: Any, value: Any) -> None:
+        """Fill a stage with a value computed elsewhere, e.g. restored from a file."""
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        self._cache[name] = (key, value)
+
+
+# Parameters each body made by generate_parts is built from, read off the
+# generate_*_part functions.  A part whose values are unchanged need not be rebuilt.
+PART_PARAMETERS = {
+    "pinDisk": ("tooth_count", "roller_diameter", "roller_circle_diameter", "Diameter", "base_height",
+                "disk_height", "shaft_diameter", "clearance", "min_rad"),
+    "driverDisk": ("driver_disk_hole_count", "driver_hole_diameter", "driver_circle_diameter",
+                   "eccentricity", "shaft_diameter", "base_height", "disk_height", "clearance", "min_rad"),
+    "inputShaft": ("eccentricity", "shaft_diameter", "base_height", "disk_height",
+                   "key_diameter", "key_flat_diameter"),
+    "cycloidalDisk1": PROFILE_CURVE_KEYS + ("pressure_angle_offset", "min_rad", "max_rad", "base_height",
+                                            "disk_height", "shaft_diameter", "clearance", "driver_disk_hole_count",
+                                            "driver_hole_diameter", "driver_circle_diameter"),
+    "eccentricKey": ("eccentricity", "shaft_diameter", "base_height", "disk_height"),
+    "outputShaft": ("driver_disk_hole_count", "driver_hole_diameter", "driver_circle_diameter", "base_height",
+                    "disk_height", "clearance", "key_diameter", "key_flat_diameter", "min_rad"),
+}
+PART_PARAMETERS["cycloidalDisk2"] = PART_PARAMETERS["cycloidalDisk1"]
+
+
+def parameter_fingerprint(parameters: Dict[str, Any], keys: Optional[Tuple[str, ...]] = None) -> str:
+    """Stable hash of some (by default all) parameter values.
+
+    Numbers are compared as floats, so 5 and 5.0 give the same fingerprint.
+
+    Args:
+        parameters: Gearbox parameters
+        keys: Names to include, all of parameters if None
+
+    Returns:
+        Hex digest
+    """
+    names = sorted(parameters if keys is None else keys)
+    values = []
+    for name in names:
+        value = parameters[name]
+        values.append(repr(float(value)) if isinstance(value, (int, float, np.number)) else repr(value))
+    return hashlib.sha1(repr(list(zip(names, values))).encode()).hexdigest()
+
+
+def part_fingerprint(name: str, parameters: Dict[str, Any]) -> str:
+    """Fingerprint of the parameters one part is built from, see PART_PARAMETERS."""
+    return parameter_fingerprint(parameters, PART_PARAMETERS[name])
+
+
+def pack_geometry_state(arrays: Dict[str, np.ndarray]) -> str:
+    """Pack arrays into a compact ASCII blob that can be stored in a document."""
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def unpack_geometry_state(blob: str) -> Dict[str, np.ndarray]:
+    """Inverse of pack_geometry_state.
+
+    Raises:
+        ValueError: If blob is not a packed geometry state
+    """
+    try:
+        with np.load(io.BytesIO(base64.b64decode(blob.encode("ascii"), validate=True)), allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+    except (OSError, EOFError, KeyError, ValueError) as e:
+        raise ValueError(f"Not a geometry state: {e}")
+
+
+class GearBoxParameters(Mapping):
+    """Immutable, hashable gearbox parameters.
+
+    Reads like the parameter dictionary (parameters["tooth_count"],
+    .get(), `in`, iteration), so every generator accepts it unchanged, but
+    it cannot be modified: use replace() to get a changed copy.  Field
+    values are converted to their declared type (see field_value).  min_rad and max_rad are
+    computed from the other fields on first use and kept; p is the pitch
+    radius per tooth.  The hash is computed once, and fingerprint gives a
+    hash that is stable between processes for on-disk caches.
+
+    Example:
+        params = GearBoxParameters(tooth_count=13)
+        bigger = params.replace(Diameter=110.0)
+    """
+
+    # (name, type) of every field, the keys of generate_default_parameters
+    FIELDS = (("eccentricity", float), ("tooth_count", int), ("driver_disk_hole_count", int),
+              ("driver_hole_diameter", float), ("driver_circle_diameter", float),
+              ("line_segment_count", int), ("tooth_pitch", float), ("Diameter", float),
+              ("roller_diameter", float), ("roller_circle_diameter", float),
+              ("pressure_angle_limit", float), ("pressure_angle_offset", float),
+              ("base_height", float), ("disk_height", float), ("shaft_diameter", float),
+              ("key_diameter", float), ("key_flat_diameter", float), ("Height", float),
+              ("clearance", float))
+    DERIVED = ("min_rad", "max_rad")
+    _KEYS = frozenset(name for name, _ in FIELDS) | frozenset(DERIVED)
+    __slots__ = tuple(name for name, _ in FIELDS) + ("_min_rad", "_max_rad", "_overrides", "_hash", "_fingerprint")
+    _defaults: Optional[Dict[str, Any]] = None
+
+    def __init__(self, min_rad: Optional[float] = None, max_rad: Optional[float] = None, **values: Any):
+        """Create parameters, taking missing fields from generate_default_parameters.
+
+        Args:
+            min_rad: Fixes min_rad instead of computing it
+            max_rad: Fixes max_rad instead of computing it
+            **values: Field values
+
+        Raises:
+            TypeError: If a value is not a known field
+            ParameterValidationError: If a value does not fit its field's type
+        """
+        unknown = set(values) - {name for name, _ in self.FIELDS}
+        if unknown:
+            raise TypeError(f"Unknown gearbox parameters {sorted(unknown)}")
+        if GearBoxParameters._defaults is None:
+            defaults = generate_default_parameters()
+            GearBoxParameters._defaults = {name: defaults[name] for name, _ in self.FIELDS}
+        for name, kind in self.FIELDS:
+            object.__setattr__(self, name, self.field_value(name, values.get(name, self._defaults[name])))
+        object.__setattr__(self, "_min_rad", None if min_rad is None else float(min_rad))
+        object.__setattr__(self, "_max_rad", None if max_rad is None else float(max_rad))
+        # only radii given by the caller are part of the identity, computed ones follow from the fields
+        object.__setattr__(self, "_overrides", (self._min_rad, self._max_rad))
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_fingerprint", None)
+
+    @classmethod
+    def field_value(cls, name: str, value: Any) -> Any:
+        """value converted to the declared type of field name.
+
+        Int fields take only whole numbers (11.0 but not 11.7), and no field
+        takes a bool, so nothing is silently truncated.
+
+        Raises:
+            KeyError: If name is not a field
+            ParameterValidationError: If value does not fit the field
+        """
+        kind = dict(cls.FIELDS)[name]
+        if isinstance(value, (bool, np.bool_)):
+            raise ParameterValidationError(f"{name} must be a number, not {value!r}")
+        try:
+            if kind is float:
+                return float(value)
+            try:
+                return operator.index(value)
+            except TypeError:
+                if float(value).is_integer():
+                    return int(value)
+        except (TypeError, ValueError, OverflowError):
+            raise ParameterValidationError(f"{name} must be a number, not {value!r}") from None
+        raise ParameterValidationError(f"{name} must be a whole number, not {value!r}")
+
+    @classmethod
+    def from_dict(cls, parameters: Dict[str, Any], keep_radii: bool = False) -> "GearBoxParameters":
+        """From a parameter dictionary; other keys than the fields are ignored.
+
+        Args:
+            parameters: Parameter dictionary
+            keep_radii: Use the dictionary's min_rad/max_rad instead of
+                deriving them.  Off by default, as dictionaries normally
+                carry radii that generate_parts computed from the fields.
+        """
+        values = {name: parameters[name] for name, _ in cls.FIELDS if name in parameters}
+        if keep_radii:
+            return cls(min_rad=parameters.get("min_rad"), max_rad=parameters.get("max_rad"), **values)
+        return cls(**values)
+
+    @classmethod
+    def from_object(cls, obj: Any) -> "GearBoxParameters":
+        """From the properties of the GearBoxParameters FeaturePython object."""
+        values = {}
+        for name, _ in cls.FIELDS:
+            value = getattr(obj, name)
+            values[name] = getattr(value, "Value", value)
+        return cls(**values)
+
+    def apply_to_object(self, obj: Any) -> List[str]:
+        """Set the FeaturePython properties that differ from these values.
+
+        Returns:
+            Names of the properties changed
+        """
+        changed = []
+        for name, _ in self.FIELDS:
+            current = getattr(obj, name)
+            if getattr(current, "Value", current) != getattr(self, name):
+                setattr(obj, name, getattr(self, name))
+                changed.append(name)
+        return changed
+
+    def replace(self, **changes: Any) -> "GearBoxParameters":
+        """A copy with some fields changed.  Derived values are recomputed."""
+        values = {name: getattr(self, name) for name, _ in self.FIELDS}
+        values.update(changes)
+        return GearBoxParameters(**values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """A plain, mutable parameter dictionary including min_rad and max_rad."""
+        return dict(self.items())
+
+    def _radii(self) -> None:
+        min_rad, max_rad = calculate_min_max_radii(self)
+        if self._min_rad is None:
+            object.__setattr__(self, "_min_rad", min_rad)
+        if self._max_rad is None:
+            object.__setattr__(self, "_max_rad", max_rad)
+
+    @property
+    def min_rad(self) -> float:
+        if self._min_rad is None:
+            self._radii()
+        return self._min_rad
+
+    @property
+    def max_rad(self) -> float:
+        if self._max_rad is None:
+            self._radii()
+        return self._max_rad
+
+    @property
+    def p(self) -> float:
+        return self.roller_circle_diameter / 2.0 / self.tooth_count
+
+    @property
+    def fingerprint(self) -> str:
+        """parameter_fingerprint of all values, stable across processes."""
+        if self._fingerprint is None:
+            object.__setattr__(self, "_fingerprint", parameter_fingerprint(self))
+        return self._fingerprint
+
+    def _key(self) -> Tuple:
+        return tuple(getattr(self, name) for name, _ in self.FIELDS) + self._overrides
+
+    def __getitem__(self, name: str) -> Any:
+        if name in self._KEYS:
+            return getattr(self, name)
+        raise KeyError(name)
+
+    def __iter__(self):
+        yield from (name for name, _ in self.FIELDS)
+        yield from self.DERIVED
+
+    def __len__(self) -> int:
+        return len(self.FIELDS) + len(self.DERIVED)
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash(self._key()))
+        return self._hash
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, GearBoxParameters):
+            return self._key() == other._key()
+        return Mapping.__eq__(self, other)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"GearBoxParameters is immutable, use replace({name}=...)")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("GearBoxParameters is immutable")
+
+    def __reduce__(self):
+        values = {name: getattr(self, name) for name, _ in self.FIELDS}
+        return (_gear_box_parameters, (values, self._overrides))
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name, _ in self.FIELDS)
+        return f"GearBoxParameters({values})"
+
+
+def _gear_box_parameters(values: Dict[str, Any], overrides: Tuple) -> GearBoxParameters:
+    """Unpickle helper, pickle stores the field values and any fixed radii."""
+    return GearBoxParameters(min_rad=overrides[0], max_rad=overrides[1], **values)
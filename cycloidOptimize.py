@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Design-space optimizer for the cycloidal gearbox.
+
+Searches the parameter dictionary used by cycloidFun.generate_parts for the
+best designs that fit inside a given outer Diameter.  Candidates are scored
+with the FreeCAD-free math in cycloidMath only, so the search can be spread
+over worker processes on any machine with numpy.  The best designs can then
+be handed to the FreeCAD generator.
+
+Example (plain python or FreeCADCmd):
+    import cycloidOptimize
+    best = cycloidOptimize.optimize(120, objective="max_torque", top_k=3)
+    cycloidOptimize.generate_designs(best)    # needs FreeCAD
+
+License 	LGPL V2.1
+Homepage https://github.com/iplayfast/CycloidGearBox
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+import cycloidMath
+from cycloidMath import (MIN_TOOTH_COUNT, MAX_TOOTH_COUNT, MIN_PRESSURE_ANGLE_LIMIT,
+                         DEFAULT_ALLOWABLE_PRESSURE, ParameterValidationError,
+                         validate_parameters, calculate_min_max_radii, check_feasibility,
+                         pin_contact_geometry, estimate_torque_capacity,
+                         generate_default_parameters)
+
+logger = logging.getLogger(__name__)
+
+# Candidates evaluated per task sent to a worker process
+BATCH_SIZE = 64
+
+
+class Design(NamedTuple):
+    """One evaluated candidate; a higher score is better."""
+    score: float
+    parameters: Dict[str, Any]
+    metrics: Dict[str, float]
+
+
+def _torque_score(metrics: Dict[str, float]) -> float:
+    return metrics["torque"]
+
+
+def _peak_pressure_angle_score(metrics: Dict[str, float]) -> float:
+    return -metrics["peak_pressure_angle"]
+
+
+OBJECTIVES: Dict[str, Callable[[Dict[str, float]], float]] = {
+    "max_torque": _torque_score,
+    "min_peak_pressure_angle": _peak_pressure_angle_score,
+}
+
+
+def default_search_space(diameter: float) -> Dict[str, Any]:
+    """Return the search ranges used when none are given.
+
+    A (low, high) tuple is sampled uniformly, as integers when both bounds are
+    ints.  A list is sampled as a set of choices.  Lengths scale with the
+    outer diameter so the same space works for any envelope.
+
+    Args:
+        diameter: Outer Diameter of the gearbox
+
+    Returns:
+        Dictionary of parameter name to range or choices
+    """
+    return {
+        "tooth_count": (MIN_TOOTH_COUNT + 2, MAX_TOOTH_COUNT - 10),
+        "eccentricity": (0.005 * diameter, 0.05 * diameter),
+        "roller_diameter": (0.03 * diameter, 0.15 * diameter),
+        "roller_circle_diameter": (0.5 * diameter, 0.95 * diameter),
+        "pressure_angle_limit": (MIN_PRESSURE_ANGLE_LIMIT + 20.0, 70.0),
+        "driver_circle_diameter": (0.3 * diameter, 0.6 * diameter),
+        "driver_disk_hole_count": [4, 5, 6, 8],
+        "driver_hole_diameter": (0.05 * diameter, 0.12 * diameter),
+    }
+
+
+def sample_candidates(space: Dict[str, Any], count: int, base: Dict[str, Any],
+                      rng: np.random.Generator) -> List[Dict[str, Any]]:
+    """Draw count parameter dictionaries from space, filling the rest from base.
+
+    Args:
+        space: Ranges or choices as returned by default_search_space
+        count: Number of candidates to draw
+        base: Parameters that are not being searched
+        rng: numpy random generator
+
+    Returns:
+        List of parameter dictionaries (without min_rad/max_rad)
+    """
+    columns = {}
+    for name, bounds in space.items():
+        if isinstance(bounds, list):
+            columns[name] = [bounds[i] for i in rng.integers(0, len(bounds), count)]
+        elif isinstance(bounds[0], int) and isinstance(bounds[1], int):
+            columns[name] = [int(v) for v in rng.integers(bounds[0], bounds[1] + 1, count)]
+        else:
+            columns[name] = [float(v) for v in rng.uniform(bounds[0], bounds[1], count)]
+    fixed = {k: v for k, v in base.items() if k not in ("min_rad", "max_rad")}
+    return [dict(fixed, **{name: values[i] for name, values in columns.items()}) for i in range(count)]
+
+
+class _QuietThread(logging.Filter):
+    """Drops cycloidMath warnings logged by one thread, other threads' records pass."""
+
+    def __init__(self):
+        super().__init__()
+        self.thread = threading.get_ident()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.thread != self.thread or record.levelno >= logging.ERROR
+
+
+@contextmanager
+def _quiet_math_logger():
+    """Silence the per-point warnings cycloidMath emits for hopeless candidates.
+
+    Only this thread's records are dropped, and the logger's level is left
+    alone, so a generation running on another thread keeps its warnings.
+    """
+    math_logger = logging.getLogger(cycloidMath.__name__)
+    quiet = _QuietThread()
+    math_logger.addFilter(quiet)
+    try:
+        yield
+    finally:
+        math_logger.removeFilter(quiet)
+
+
+def evaluate_design(parameters: Dict[str, Any],
+                    allowable_pressure: float = DEFAULT_ALLOWABLE_PRESSURE) -> Optional[Dict[str, float]]:
+    """Check a candidate against the generator's constraints and measure it.
+
+    Besides validate_parameters the rollers have to fit inside Diameter,
+    the pressure angle limit circles have to exist and no two features of
+    the parts may overlap (check_feasibility).  min_rad and max_rad are
+    added to parameters when the candidate is feasible.
+
+    Args:
+        parameters: Candidate parameter dictionary
+        allowable_pressure: Contact pressure used for the torque estimate
+
+    Returns:
+        Metrics dictionary, or None if the candidate is infeasible
+    """
+    try:
+        validate_parameters(parameters)
+        min_rad, max_rad = calculate_min_max_radii(parameters)
+    except (ParameterValidationError, ValueError, ZeroDivisionError):
+        return None
+    roller_ring_radius = parameters["roller_circle_diameter"] / 2 + parameters["clearance"]
+    if roller_ring_radius + parameters["roller_diameter"] / 2 > parameters["Diameter"] / 2:
+        return None
+    if not (0 < min_rad < max_rad) or not np.isfinite(max_rad):
+        return None
+    parameters["min_rad"] = min_rad
+    parameters["max_rad"] = max_rad
+    if check_feasibility(parameters):
+        return None
+
+    geometry = pin_contact_geometry(parameters)
+    loaded = geometry["loaded"]
+    if not loaded.any():
+        return None
+    return {"torque": estimate_torque_capacity(parameters, allowable_pressure),
+            "peak_pressure_angle": float(geometry["pressure_angle"][loaded].max()),
+            "loaded_pins": float(loaded.sum()),
+            "min_rad": min_rad,
+            "max_rad": max_rad}
+
+
+def evaluate_batch(candidates: List[Dict[str, Any]], objective: str,
+                   allowable_pressure: float = DEFAULT_ALLOWABLE_PRESSURE) -> List[Design]:
+    """Evaluate candidates and return the feasible ones as Designs.
+
+    This is the unit of work sent to worker processes.
+    """
+    score = OBJECTIVES[objective]
+    designs = []
+    with _quiet_math_logger():
+        for parameters in candidates:
+            metrics = evaluate_design(parameters, allowable_pressure)
+            if metrics is not None:
+                designs.append(Design(score(metrics), parameters, metrics))
+    return designs
+
+
+def _narrow_space(space: Dict[str, Any], elite: List[Design]) -> Dict[str, Any]:
+    """Shrink the numeric ranges to the span of the elite designs plus a margin."""
+    narrowed = {}
+    for name, bounds in space.items():
+        if isinstance(bounds, list):
+            narrowed[name] = bounds
+            continue
+        values = [d.parameters[name] for d in elite]
+        margin = 0.1 * (bounds[1] - bounds[0])
+        low, high = max(bounds[0], min(values) - margin), min(bounds[1], max(values) + margin)
+        if isinstance(bounds[0], int) and isinstance(bounds[1], int):
+            low, high = int(round(low)), int(round(high))
+        narrowed[name] = (low, high)
+    return narrowed
+
+
+def optimize(diameter: float, objective: str = "max_torque", space: Optional[Dict[str, Any]] = None,
+             samples: int = 2000, rounds: int = 3, top_k: int = 5, workers: Optional[int] = None,
+             seed: int = 0, base: Optional[Dict[str, Any]] = None,
+             allowable_pressure: float = DEFAULT_ALLOWABLE_PRESSURE) -> List[Design]:
+    """Search for the best gearbox designs that fit within diameter.
+
+    Each round draws samples candidates, evaluates them in parallel and then
+    narrows the search ranges around the best designs found so far.
+
+    Args:
+        diameter: Outer Diameter of the gearbox
+        objective: Key of OBJECTIVES to rank designs by
+        space: Search ranges, default_search_space(diameter) if None
+        samples: Candidates drawn per round
+        rounds: Number of sample/narrow rounds
+        top_k: Number of designs to return
+        workers: Worker processes, os.cpu_count() if None, 1 runs in-process
+        seed: Random seed so runs are repeatable
+        base: Values for parameters not being searched, the defaults if None
+        allowable_pressure: Contact pressure used for the torque estimate
+
+    Returns:
+        Up to top_k Designs, best first
+
+    Raises:
+        ValueError: If objective is unknown
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective {objective}, expected one of {sorted(OBJECTIVES)}")
+    space = dict(space if space is not None else default_search_space(diameter))
+    base = dict(base if base is not None else generate_default_parameters())
+    base["Diameter"] = diameter
+    workers = workers or os.cpu_count() or 1
+    rng = np.random.default_rng(seed)
+
+    best: List[Design] = []
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for round_number in range(rounds):
+            candidates = sample_candidates(space, samples, base, rng)
+            batches = [candidates[i:i + BATCH_SIZE] for i in range(0, len(candidates), BATCH_SIZE)]
+            if executor:
+                results = executor.map(evaluate_batch, batches, [objective] * len(batches),
+                                       [allowable_pressure] * len(batches))
+            else:
+                results = (evaluate_batch(b, objective, allowable_pressure) for b in batches)
+            feasible = [design for batch in results for design in batch]
+            best = sorted(best + feasible, key=lambda d: d.score, reverse=True)[:max(top_k, 10)]
+            logger.info(f"optimize round {round_number}: {len(feasible)}/{samples} feasible, "
+                        f"best score {best[0].score if best else None}")
+            if best:
+                space = _narrow_space(space, best)
+    finally:
+        if executor:
+            executor.shutdown()
+    return best[:top_k]
+
+
+def generate_designs(designs: List[Design], name: str = "CycloidalDrive") -> List[Any]:
+    """Build each design in its own new FreeCAD document.
+
+    Requires FreeCAD; the search itself does not.
+
+    Args:
+        designs: Designs as returned by optimize
+        name: Prefix for the document names
+
+    Returns:
+        List of the FreeCAD documents created
+    """
+    import FreeCAD as App
+    import cycloidFun
+
+    documents = []
+    for rank, design in enumerate(designs, 1):
+        doc = App.newDocument(f"{name}_{rank}")
+        cycloidFun.generate_parts(doc, dict(design.parameters))
+        documents.append(doc)
+    return documents
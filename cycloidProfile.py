@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Profile captures of a gearbox regeneration that users can send in.
+
+profile_call runs any function under cProfile and, optionally, a
+sampling profiler that records the whole call stack of the profiled
+thread every few milliseconds.  It writes
+
+    <prefix>.pstats   cProfile statistics, for pstats or snakeviz
+    <prefix>.folded   collapsed stacks, one "a;b;c count" line per stack,
+                      for flamegraph.pl or speedscope
+
+and returns a short summary of the hottest functions.  Without sampling
+the collapsed stacks are the caller -> callee pairs from cProfile, two
+frames deep.
+
+profile_regeneration profiles a forced regeneration of a gearbox object
+and writes the files next to its document; it is what the "Regenerate
+with profiling" context menu entry runs.
+
+Example:
+    import cycloidProfile, cycloidMath, cycloidStl
+    capture = cycloidProfile.profile_call(cycloidStl.write_parts, cycloidMath.generate_default_parameters(),
+                                          "Parts", prefix="/tmp/stl-profile")
+    print(capture.summary)
+
+License 	LGPL V2.1
+Homepage https://github.com/iplayfast/CycloidGearBox
+"""
+
+import collections
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Counter, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+TOP_FUNCTIONS = 20
+SAMPLE_INTERVAL = 0.005
+
+
+class ProfileCapture(NamedTuple):
+    """What profile_call made."""
+    result: Any         # return value of the profiled function
+    pstats_path: str
+    folded_path: str
+    summary: str        # top functions by own time
+    seconds: float
+
+
+def _frame_name(code: Any) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Background thread recording the call stack of another thread.
+
+    Args:
+        thread_id: threading.get_ident() of the thread to sample
+        interval: Seconds between samples
+    """
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter[str] = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cycloid-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def __enter__(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def _pstats_name(function: tuple) -> str:
+    filename, line, name = function
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def _folded_from_stats(stats: pstats.Stats) -> Counter[str]:
+    """Caller;callee stacks weighted by microseconds of the callee's own time."""
+    counts: Counter[str] = collections.Counter()
+    for function, (_, _, tottime, _, callers) in stats.stats.items():
+        name = _pstats_name(function)
+        if not callers:
+            counts[name] += int(tottime * 1e6)
+        for caller, (_, _, caller_tottime, _) in callers.items():
+            counts[f"{_pstats_name(caller)};{name}"] += int(caller_tottime * 1e6)
+    return counts
+
+
+def summarize(stats: pstats.Stats, top: int = TOP_FUNCTIONS) -> str:
+    """The top functions by own time, one line each."""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+    lines = [f"{'own s':>9} {'total s':>9} {'calls':>8}  function"]
+    for function, (_, calls, tottime, cumtime, _) in rows:
+        lines.append(f"{tottime:9.4f} {cumtime:9.4f} {calls:8d}  {_pstats_name(function)}")
+    return "\n".join(lines)
+
+
+def profile_call(func: Callable[..., Any], *args: Any, prefix: Optional[str] = None, sample: bool = True,
+                 interval: float = SAMPLE_INTERVAL, top: int = TOP_FUNCTIONS, **kwargs: Any) -> ProfileCapture:
+    """Run func(*args, **kwargs) under cProfile and write the profile files.
+
+    Args:
+        func: Function to profile
+        prefix: Path the .pstats and .folded suffixes are added to, a
+            temporary file name if None
+        sample: Also sample the full call stack every interval seconds
+            for the collapsed stacks
+        interval: Seconds between stack samples
+        top: Number of functions in the summary
+
+    Returns:
+        ProfileCapture; if func raises the files are still written and
+        the exception is raised after
+    """
+    if prefix is None:
+        handle, prefix = tempfile.mkstemp(prefix="cycloid-profile-")
+        os.close(handle)
+        os.remove(prefix)
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident(), interval) if sample else None
+    start = time.perf_counter()
+    try:
+        if sampler:
+            sampler.__enter__()
+        try:
+            result = profiler.runcall(func, *args, **kwargs)
+        finally:
+            if sampler:
+                sampler.__exit__(None, None, None)
+    finally:
+        seconds = time.perf_counter() - start
+        stats = pstats.Stats(profiler)
+        pstats_path = prefix + ".pstats"
+        folded_path = prefix + ".folded"
+        stats.dump_stats(pstats_path)
+        counts = sampler.counts if sampler and sampler.counts else _folded_from_stats(stats)
+        with open(folded_path, "w") as stream:
+            for stack, count in sorted(counts.items()):
+                if count:
+                    stream.write(f"{stack} {count}\n")
+    summary = summarize(stats, top)
+    logger.info(f"profiled {seconds:.3f}s, wrote {pstats_path} and {folded_path}")
+    return ProfileCapture(result, pstats_path, folded_path, summary, seconds)
+
+
+def profile_regeneration(obj: Any, directory: Optional[str] = None, sample: bool = True) -> ProfileCapture:
+    """Profile a forced regeneration of a gearbox object.  Needs FreeCAD.
+
+    Every part is rebuilt through force_Recompute, even when nothing
+    changed, so the capture shows generation and not the skip of
+    unchanged parts.
+
+    The files are named <document>-profile-<time> and written to
+    directory, next to the saved document if None, else to the temporary
+    directory.  The summary is printed on the FreeCAD console.
+
+    Args:
+        obj: CycloidalGearBox document object
+        directory: Where the files go
+        sample: Also sample full call stacks
+
+    Returns:
+        ProfileCapture
+    """
+    import FreeCAD as App
+
+    doc = obj.Document
+    if directory is None:
+        directory = os.path.dirname(doc.FileName) if doc.FileName else tempfile.gettempdir()
+    prefix = os.path.join(directory, f"{doc.Name}-profile-{time.strftime('%Y%m%d-%H%M%S')}")
+    capture = profile_call(obj.Proxy.force_Recompute, prefix=prefix, sample=sample)
+    App.Console.PrintMessage(f"Cycloidal Gearbox regeneration took {capture.seconds:.3f}s\n"
+                             f"{capture.summary}\n"
+                             f"Profile written to {capture.pstats_path} and {capture.folded_path}\n")
+    return capture
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local HTTP server generating gearbox parts from warm worker processes.
+
+Starting FreeCADCmd and importing cycloidFun takes seconds, far longer
+than generating a small part.  The server starts a pool of worker
+processes once; each imports everything up front and keeps its own
+hidden FreeCAD document, which generate_parts then only updates for the
+parts a request changes.  Requests are JSON over HTTP on localhost:
+
+    POST /generate
+    {"parameters": {"tooth_count": 20}, "format": "stl",
+     "parts": ["cycloidalDisk1"], "output": "bytes"}
+
+Parameters not given take their defaults.  The reply holds each part as
+base64 ("output": "bytes") or the path of a file written to the server's
+output directory ("output": "path").  GET /health reports the workers and
+request timings.
+
+The "numpy" engine makes STL files with cycloidStl and needs no FreeCAD;
+the "freecad" engine also writes STEP and BREP.
+
+Example:
+    python cycloidServer.py --port 8765 --workers 4 --engine freecad
+
+    import json, urllib.request
+    body = json.dumps({"parameters": {"tooth_count": 20}, "output": "path"}).encode()
+    reply = json.load(urllib.request.urlopen("http://127.0.0.1:8765/generate", body))
+
+License 	LGPL V2.1
+Homepage https://github.com/iplayfast/CycloidGearBox
+"""
+
+import argparse
+import base64
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from cycloidMath import PART_NAMES, GearBoxParameters, ParameterValidationError, validate_parameters
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ("freecad", "numpy")
+# Request format -> file suffix
+FORMATS = {"stl": ".stl", "step": ".step", "brep": ".brep"}
+ENGINE_FORMATS = {"freecad": ("stl", "step", "brep"), "numpy": ("stl",)}
+MAX_REQUEST_BYTES = 1 << 20
+
+# State of a worker process, set up once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def default_engine() -> str:
+    """freecad if FreeCAD can be imported, else numpy."""
+    try:
+        import FreeCAD  # noqa: F401
+    except ImportError:
+        return "numpy"
+    return "freecad"
+
+
+def _init_worker(engine: str) -> None:
+    """Import everything a request needs, so the first request is as fast as the rest."""
+    _worker["engine"] = engine
+    if engine == "freecad":
+        import FreeCAD as App
+        import cycloidFun  # noqa: F401
+
+        _worker["doc"] = App.newDocument("CycloidServer", hidden=True)
+        _worker["built"] = {}
+    else:
+        import cycloidStl  # noqa: F401
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _freecad_parts(parameters: GearBoxParameters, fmt: str, names: List[str]) -> Dict[str, bytes]:
+    import cycloidFun
+
+    doc = _worker["doc"]
+    built = cycloidFun.generate_parts(doc, parameters, _worker["built"])
+    if built is not None:
+        _worker["built"] = built
+    result = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name in names:
+            shape = doc.getObject(name).Shape
+            path = os.path.join(directory, name + FORMATS[fmt])
+            if fmt == "stl":
+                shape.exportStl(path)
+            elif fmt == "step":
+                shape.exportStep(path)
+            else:
+                shape.exportBrep(path)
+            with open(path, "rb") as stream:
+                result[name] = stream.read()
+    return result
+
+
+def render(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Generate the parts of one request.  Runs in a worker process.
+
+    Args:
+        request: Decoded /generate request
+
+    Returns:
+        {"fingerprint": parameter fingerprint, "parts": {name: file bytes},
+        "seconds": time taken in the worker}
+
+    Raises:
+        ParameterValidationError: If the parameters are invalid
+        ValueError: If the format or a part name is unknown
+        TypeError: If a parameter name is unknown
+    """
+    start = time.perf_counter()
+    engine = _worker.get("engine") or default_engine()
+    fmt = request.get("format", "stl")
+    if fmt not in ENGINE_FORMATS[engine]:
+        raise ValueError(f"Format {fmt} is not available with the {engine} engine, "
+                         f"expected one of {ENGINE_FORMATS[engine]}")
+    names = list(request.get("parts") or PART_NAMES)
+    unknown = [name for name in names if name not in PART_NAMES]
+    if unknown:
+        raise ValueError(f"Unknown parts {unknown}, expected some of {PART_NAMES}")
+    parameters = GearBoxParameters(**request.get("parameters", {}))
+    validate_parameters(parameters)
+    if engine == "freecad":
+        parts = _freecad_parts(parameters, fmt, names)
+    else:
+        from cycloidCache import part_stl
+
+        parts = {name: part_stl(name, parameters) for name in names}
+    return {"fingerprint": parameters.fingerprint, "parts": parts, "seconds": time.perf_counter() - start}
+
+
+class GenerationServer:
+    """HTTP front end dispatching requests to a pool of warm workers.
+
+    Args:
+        host: Address to listen on, localhost by default
+        port: Port, 0 picks a free one (see address)
+        workers: Worker processes, os.cpu_count() if None
+        engine: "freecad" or "numpy", default_engine() if None
+        output_dir: Where "path" output is written, a temporary
+            directory if None
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, workers: Optional[int] = None,
+                 engine: Optional[str] = None, output_dir: Optional[str] = None):
+        self.engine = engine or default_engine()
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unknown engine {self.engine}, expected one of {ENGINES}")
+        self.workers = workers or os.cpu_count() or 1
+        self.output_dir = os.path.abspath(output_dir or tempfile.mkdtemp(prefix="cycloid-server-"))
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(self.engine,))
+        # start every worker now rather than on the first requests
+        pids = {f.result() for f in [self.pool.submit(_ping) for _ in range(self.workers)]}
+        logger.info(f"{len(pids)} {self.engine} workers ready")
+        self._lock = threading.Lock()
+        self.served = 0
+        self.failed = 0
+        self.dispatch_seconds = 0.0
+        self.worker_seconds = 0.0
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.generation = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.httpd.server_address[:2]
+
+    @property
+    def url(self) -> str:
+        host, port = self.address
+        return f"http://{host}:{port}"
+
+    def generate(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Serve one decoded /generate request.
+
+        Returns:
+            JSON ready reply: fingerprint, seconds, and parts as base64 or paths
+        """
+        start = time.perf_counter()
+        result = self.pool.submit(render, request).result()
+        total = time.perf_counter() - start
+        parts = result["parts"]
+        suffix = FORMATS[request.get("format", "stl")]
+        if request.get("output", "bytes") == "path":
+            folder = os.path.join(self.output_dir, result["fingerprint"])
+            os.makedirs(folder, exist_ok=True)
+            encoded = {}
+            for name, data in parts.items():
+                path = os.path.join(folder, name + suffix)
+                with open(path, "wb") as stream:
+                    stream.write(data)
+                encoded[name] = path
+        else:
+            encoded = {name: base64.b64encode(data).decode("ascii") for name, data in parts.items()}
+        with self._lock:
+            self.served += 1
+            self.worker_seconds += result["seconds"]
+            self.dispatch_seconds += total - result["seconds"]
+        return {"fingerprint": result["fingerprint"], "seconds": result["seconds"], "parts": encoded}
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            served = max(self.served, 1)
+            return {"engine": self.engine, "workers": self.workers, "served": self.served,
+                    "failed": self.failed, "mean_dispatch_seconds": self.dispatch_seconds / served,
+                    "mean_worker_seconds": self.worker_seconds / served}
+
+    def serve_forever(self) -> None:
+        self.httpd.serve_forever()
+
+    def start(self) -> "GenerationServer":
+        """Serve from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, name="cycloid-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        if self._thread is not None:
+            # shutdown waits for serve_forever, only call it when start ran one
+            self.httpd.shutdown()
+            self._thread.join()
+        self.httpd.server_close()
+        self.pool.shutdown()
+
+    def __enter__(self) -> "GenerationServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._reply(200, self.server.generation.health())
+        else:
+            self._reply(404, {"error": f"no such path {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path != "/generate":
+            self._reply(404, {"error": f"no such path {self.path}"})
+            return
+        server = self.server.generation
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length > MAX_REQUEST_BYTES:
+                raise ValueError(f"request of {length} bytes is too large")
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            self._reply(200, server.generate(request))
+        except (ParameterValidationError, ValueError, TypeError) as e:
+            with server._lock:
+                server.failed += 1
+            self._reply(400, {"error": str(e)})
+        except Exception as e:
+            logger.exception("generation failed")
+            with server._lock:
+                server.failed += 1
+            self._reply(500, {"error": str(e)})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format % args)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve cycloidal gearbox parts over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--engine", choices=ENGINES, default=None)
+    parser.add_argument("--output-dir", default=None)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    server = GenerationServer(args.host, args.port, args.workers, args.engine, args.output_dir)
+    logger.info(f"serving on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Queued, thread-safe gearbox generation.
+
+GenerationService takes generate_parts requests from any number of
+threads and returns a concurrent.futures.Future for each.  Requests are
+kept in a bounded queue; requests for the same document run one at a
+time, and a request for a document that already has one waiting replaces
+it (latest wins), so a burst of parameter edits costs one generation.
+The futures of replaced requests resolve with the result of the request
+that replaced them.  Different documents are generated in parallel when
+the service has more than one worker.
+
+FreeCAD documents are not safe to change from several threads at once;
+keep the default single worker unless each worker has its own documents.
+
+Example:
+    import FreeCAD, cycloidMath, cycloidService
+    service = cycloidService.GenerationService()
+    doc = FreeCAD.newDocument("gearbox")
+    future = service.submit(doc, cycloidMath.GearBoxParameters(tooth_count=20))
+    fingerprints = future.result()
+    print(service.metrics())
+
+License 	LGPL V2.1
+Homepage https://github.com/iplayfast/CycloidGearBox
+"""
+
+import collections
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PENDING = 64
+# Number of finished requests the latency figures are taken over
+LATENCY_WINDOW = 1000
+
+
+class GenerationQueueFull(RuntimeError):
+    """Raised when a request does not fit the queue in the time allowed."""
+
+
+def _document_key(doc: Any) -> Any:
+    return getattr(doc, "Name", id(doc))
+
+
+def _generate_parts(doc: Any, parameters: Any, **kwargs: Any) -> Any:
+    import cycloidFun
+
+    return cycloidFun.generate_parts(doc, parameters, **kwargs)
+
+
+class _Request:
+    __slots__ = ("doc", "parameters", "kwargs", "futures", "queued")
+
+    def __init__(self, doc: Any, parameters: Any, kwargs: Dict[str, Any], future: Future):
+        self.doc = doc
+        self.parameters = parameters
+        self.kwargs = kwargs
+        self.futures = [future]
+        self.queued = time.perf_counter()
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class GenerationService:
+    """Worker threads generating gearboxes from a coalescing request queue.
+
+    Args:
+        generate: Called as generate(doc, parameters, **kwargs) for each
+            request, cycloidFun.generate_parts by default
+        max_pending: Most documents that can have a request waiting
+        workers: Number of worker threads
+    """
+
+    def __init__(self, generate: Optional[Callable[..., Any]] = None,
+                 max_pending: int = DEFAULT_MAX_PENDING, workers: int = 1):
+        self.generate = generate or _generate_parts
+        self.max_pending = max_pending
+        self._condition = threading.Condition()
+        # document key -> request waiting to run, in arrival order
+        self._pending: "collections.OrderedDict[Any, _Request]" = collections.OrderedDict()
+        self._running = set()
+        self._closed = False
+        self._counts = collections.Counter()
+        self._waits: Deque[float] = collections.deque(maxlen=LATENCY_WINDOW)
+        self._latencies: Deque[float] = collections.deque(maxlen=LATENCY_WINDOW)
+        self._threads = [threading.Thread(target=self._work, name=f"cycloid-generation-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, doc: Any, parameters: Any, block: bool = True, timeout: Optional[float] = None,
+               **kwargs: Any) -> Future:
+        """Queue a generation of doc.
+
+        Args:
+            doc: FreeCAD document
+            parameters: Gearbox parameters
+            block: Wait for room in the queue, else raise at once
+            timeout: Most seconds to wait for room, forever if None
+            **kwargs: Passed on to generate, e.g. instancing=True
+
+        Returns:
+            Future of what generate returns
+
+        Raises:
+            GenerationQueueFull: If the queue stays full
+            RuntimeError: If the service was shut down
+        """
+        future = Future()
+        key = _document_key(doc)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("GenerationService is shut down")
+            self._counts["submitted"] += 1
+            request = self._pending.get(key)
+            if request is not None:
+                # latest wins, the waiting request now builds these parameters
+                request.parameters = parameters
+                request.kwargs = kwargs
+                request.futures.append(future)
+                self._counts["coalesced"] += 1
+                return future
+            if not self._condition.wait_for(lambda: len(self._pending) < self.max_pending or self._closed,
+                                            timeout if block else 0):
+                self._counts["rejected"] += 1
+                raise GenerationQueueFull(f"{len(self._pending)} documents waiting for generation")
+            if self._closed:
+                raise RuntimeError("GenerationService is shut down")
+            request = self._pending.get(key)
+            if request is not None:
+                # another thread queued this document while we waited
+                request.parameters = parameters
+                request.kwargs = kwargs
+                request.futures.append(future)
+                self._counts["coalesced"] += 1
+                return future
+            self._pending[key] = _Request(doc, parameters, kwargs, future)
+            self._condition.notify_all()
+        return future
+
+    def _next(self) -> Optional[_Request]:
+        """The oldest request whose document is not being generated, or None."""
+        for key in self._pending:
+            if key not in self._running:
+                self._running.add(key)
+                return self._pending.pop(key)
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                request = None
+                while request is None:
+                    request = self._next()
+                    if request is None:
+                        if self._closed:
+                            return
+                        self._condition.wait()
+                self._condition.notify_all()
+            futures = [f for f in request.futures if f.set_running_or_notify_cancel()]
+            started = time.perf_counter()
+            result = error = None
+            if futures:
+                try:
+                    result = self.generate(request.doc, request.parameters, **request.kwargs)
+                except BaseException as e:
+                    error = e
+            finished = time.perf_counter()
+            with self._condition:
+                self._running.discard(_document_key(request.doc))
+                if futures:
+                    self._counts["failed" if error is not None else "completed"] += 1
+                    self._waits.append(started - request.queued)
+                    self._latencies.append(finished - request.queued)
+                self._condition.notify_all()
+            for future in futures:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+            if error is not None:
+                logger.warning(f"Generation of {_document_key(request.doc)} failed: {error}")
+
+    def metrics(self) -> Dict[str, float]:
+        """Queue depth, request counts and latencies in seconds.
+
+        Returns:
+            Dictionary with queue_depth, running, submitted, coalesced,
+            rejected, completed, failed, and wait_/latency_ mean, p50, p95
+            and max over the last LATENCY_WINDOW requests.  wait is the time
+            from submit to the start of the generation, latency to its end.
+        """
+        with self._condition:
+            result = {"queue_depth": len(self._pending), "running": len(self._running)}
+            for name in ("submitted", "coalesced", "rejected", "completed", "failed"):
+                result[name] = self._counts[name]
+            for name, values in (("wait", list(self._waits)), ("latency", list(self._latencies))):
+                result[f"{name}_mean"] = sum(values) / len(values) if values else 0.0
+                result[f"{name}_p50"] = _percentile(values, 0.5) if values else 0.0
+                result[f"{name}_p95"] = _percentile(values, 0.95) if values else 0.0
+                result[f"{name}_max"] = max(values) if values else 0.0
+        return result
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False) -> None:
+        """Stop taking requests and stop the workers once the queue is empty.
+
+        Args:
+            wait: Wait for the workers to finish
+            cancel_pending: Cancel the requests that have not started
+        """
+        with self._condition:
+            self._closed = True
+            if cancel_pending:
+                for request in self._pending.values():
+                    for future in request.futures:
+                        future.cancel()
+                self._pending.clear()
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self) -> "GenerationService":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.shutdown()
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append-only store of design sweep results on memory-mapped NumPy columns.
+
+A store is a directory:
+
+    schema.json         column names and dtypes, the indexed columns and
+                        the chunk size
+    chunk-000000/       one .npy file per column holding up to chunk_rows
+    chunk-000001/         rows, never changed once written
+    index.sqlite        the indexed columns of every row, for range queries
+
+Rows are buffered in memory until chunk_rows of them are waiting, then
+written as a new chunk, so a sweep of millions of rows streams through a
+buffer of one chunk.  A chunk is written to a temporary directory and
+renamed into place before its rows enter the index, which makes it
+visible; after a crash the store holds every row of the last committed
+chunk.  Reading opens the column files with mmap_mode="r", so only the
+pages a query touches are read.  One process writes a store at a time;
+any number may read it.
+
+query finds row numbers by ranges of indexed columns (tooth_count and
+Diameter by default) in SQLite; rows gathers their columns; nearest
+finds the stored design closest to a target and nearest_design returns
+its parameters ready for generate_parts:
+
+Example:
+    import cycloidStore
+    with cycloidStore.ResultStore("sweep") as store:
+        cycloidStore.store_sweep(store, candidates)
+        rows = store.query(tooth_count=(11, 15), Diameter=(90.0, 100.0))
+        torque = store.rows(rows, ["torque"])["torque"]
+        parameters, distance = cycloidStore.nearest_design(store, {"tooth_count": 13, "Diameter": 97.0})
+
+License 	LGPL V2.1
+Homepage https://github.com/iplayfast/CycloidGearBox
+"""
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cycloidMath import GearBoxParameters, generate_default_parameters
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+DEFAULT_CHUNK_ROWS = 65536
+DEFAULT_INDEX_COLUMNS = ("tooth_count", "Diameter")
+SCHEMA_FILE = "schema.json"
+INDEX_FILE = "index.sqlite"
+
+
+def _dtype_of(value: Any) -> str:
+    if isinstance(value, (bool, np.bool_)):
+        return "bool"
+    if isinstance(value, (int, np.integer)):
+        return "int64"
+    if isinstance(value, (float, np.floating)):
+        return "float64"
+    raise ValueError(f"only numbers can be stored, not {type(value).__name__}")
+
+
+def _chunk_name(chunk: int) -> str:
+    return f"chunk-{chunk:06d}"
+
+
+class ResultStore:
+    """Columnar, append-only store of result rows, see the module docstring.
+
+    The columns are fixed by the first rows appended.  A later row may
+    leave out float columns, which are stored as NaN, but may not bring
+    new ones.  Rows can be read once flush has written them.
+    """
+
+    def __init__(self, directory: str, index_columns: Sequence[str] = DEFAULT_INDEX_COLUMNS,
+                 chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        """Open the store in directory, creating it if missing.
+
+        Args:
+            directory: Store directory
+            index_columns: Columns to index for query, used when the store is new
+            chunk_rows: Rows per chunk, used when the store is new
+        """
+        self.directory = os.path.expanduser(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.columns: Dict[str, str] = {}
+        self.index_columns = tuple(index_columns)
+        self.chunk_rows = int(chunk_rows)
+        schema_path = os.path.join(self.directory, SCHEMA_FILE)
+        if os.path.exists(schema_path):
+            with open(schema_path) as stream:
+                schema = json.load(stream)
+            if schema["version"] != STORE_VERSION:
+                raise ValueError(f"{self.directory} is a version {schema['version']} store, "
+                                 f"this is version {STORE_VERSION}")
+            self.columns = schema["columns"]
+            self.index_columns = tuple(schema["index_columns"])
+            self.chunk_rows = schema["chunk_rows"]
+        self._index = sqlite3.connect(os.path.join(self.directory, INDEX_FILE))
+        self._index.execute("CREATE TABLE IF NOT EXISTS chunks (chunk INTEGER PRIMARY KEY, "
+                            "first_row INTEGER NOT NULL, rows INTEGER NOT NULL)")
+        self._index.commit()
+        self._buffer: List[Mapping[str, Any]] = []
+        self._maps: Dict[Tuple[int, str], np.ndarray] = {}
+        self._load_chunks()
+
+    def _load_chunks(self) -> None:
+        chunks = self._index.execute("SELECT first_row, rows FROM chunks ORDER BY chunk").fetchall()
+        self._first_rows = np.array([first for first, _ in chunks], dtype=np.int64)
+        self._rows = sum(rows for _, rows in chunks)
+
+    def __len__(self) -> int:
+        """Rows that can be read, not counting buffered ones."""
+        return self._rows
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Write the buffered rows and close the index."""
+        self.flush()
+        self._maps.clear()
+        self._index.close()
+
+    def _create(self, row: Mapping[str, Any]) -> None:
+        columns = {name: _dtype_of(value) for name, value in row.items()}
+        missing = [name for name in self.index_columns if name not in columns]
+        if missing:
+            raise ValueError(f"index columns {missing} are not in the rows")
+        self.columns = columns
+        indexed = ", ".join(f'"{name}" REAL' for name in self.index_columns)
+        self._index.execute(f"CREATE TABLE rows (row INTEGER PRIMARY KEY, {indexed})")
+        for name in self.index_columns:
+            self._index.execute(f'CREATE INDEX "rows_{name}" ON rows ("{name}")')
+        self._index.commit()
+        path = os.path.join(self.directory, SCHEMA_FILE)
+        with open(path + ".tmp", "w") as stream:
+            json.dump({"version": STORE_VERSION, "columns": self.columns,
+                       "index_columns": list(self.index_columns), "chunk_rows": self.chunk_rows},
+                      stream, indent=1)
+        os.replace(path + ".tmp", path)
+
+    def append(self, row: Mapping[str, Any]) -> int:
+        """Buffer one row, writing a chunk when chunk_rows are waiting.
+
+        Returns:
+            The row number the row gets
+        """
+        if not self.columns:
+            self._create(row)
+        extra = set(row) - set(self.columns)
+        if extra:
+            raise ValueError(f"columns {sorted(extra)} are not in the store")
+        for name, dtype in self.columns.items():
+            if name in row:
+                kind = _dtype_of(row[name])
+                if kind != dtype and (dtype == "bool" or kind == "float64"):
+                    raise ValueError(f"the {dtype} column {name} cannot hold {row[name]!r}")
+            elif dtype != "float64":
+                raise ValueError(f"the row has no value for the {dtype} column {name}")
+        self._buffer.append(row)
+        number = self._rows + len(self._buffer) - 1
+        if len(self._buffer) >= self.chunk_rows:
+            self.flush()
+        return number
+
+    def extend(self, rows: Iterable[Mapping[str, Any]]) -> int:
+        """Append every row of an iterable, which can be a generator.
+
+        Returns:
+            Number of rows appended
+        """
+        count = 0
+        for row in rows:
+            self.append(row)
+            count += 1
+        return count
+
+    def _column(self, name: str) -> np.ndarray:
+        return np.array([row.get(name, np.nan) for row in self._buffer], dtype=self.columns[name])
+
+    def flush(self) -> None:
+        """Write the buffered rows as a new chunk and index them."""
+        if not self._buffer:
+            return
+        arrays = {name: self._column(name) for name in self.columns}
+        chunk = len(self._first_rows)
+        final = os.path.join(self.directory, _chunk_name(chunk))
+        temporary = final + ".tmp"
+        for path in (temporary, final):
+            # left over from a write that never reached the index
+            if os.path.exists(path):
+                shutil.rmtree(path)
+        os.makedirs(temporary)
+        for name, values in arrays.items():
+            np.save(os.path.join(temporary, f"{name}.npy"), values, allow_pickle=False)
+        os.replace(temporary, final)
+        first, count = self._rows, len(self._buffer)
+        numbers = np.arange(first, first + count)
+        names = ", ".join(f'"{name}"' for name in self.index_columns)
+        with self._index:
+            self._index.executemany(
+                f"INSERT INTO rows (row, {names}) VALUES (?{', ?' * len(self.index_columns)})",
+                zip(numbers.tolist(), *(arrays[name].astype(float).tolist() for name in self.index_columns)))
+            self._index.execute("INSERT INTO chunks VALUES (?, ?, ?)", (chunk, first, count))
+        self._buffer = []
+        self._load_chunks()
+
+    def _map(self, chunk: int, name: str) -> np.ndarray:
+        key = (chunk, name)
+        if key not in self._maps:
+            if name not in self.columns:
+                raise KeyError(f"no column {name}")
+            path = os.path.join(self.directory, _chunk_name(chunk), f"{name}.npy")
+            self._maps[key] = np.load(path, mmap_mode="r", allow_pickle=False)
+        return self._maps[key]
+
+    def chunks(self, columns: Optional[Sequence[str]] = None) -> Iterator[Tuple[int, Dict[str, np.ndarray]]]:
+        """Iterate over the written chunks without loading them.
+
+        Args:
+            columns: Names to include, all if None
+
+        Yields:
+            (first row number, {name: read-only memory-mapped array})
+        """
+        names = list(self.columns if columns is None else columns)
+        for chunk, first in enumerate(self._first_rows.tolist()):
+            yield first, {name: self._map(chunk, name) for name in names}
+
+    def query(self, **ranges: Any) -> np.ndarray:
+        """Row numbers whose indexed columns lie in the given ranges.
+
+        Args:
+            **ranges: column=(low, high), inclusive, None for an open end,
+                or column=value for an exact match
+
+        Returns:
+            Sorted int64 array of row numbers
+
+        Raises:
+            ValueError: If a column is not indexed
+        """
+        clauses, values = [], []
+        for name, bounds in ranges.items():
+            if name not in self.index_columns:
+                raise ValueError(f"{name} is not indexed, the indexed columns are {list(self.index_columns)}")
+            low, high = bounds if isinstance(bounds, (tuple, list)) else (bounds, bounds)
+            if low is not None:
+                clauses.append(f'"{name}" >= ?')
+                values.append(float(low))
+            if high is not None:
+                clauses.append(f'"{name}" <= ?')
+                values.append(float(high))
+        if not self.columns:
+            return np.zeros(0, dtype=np.int64)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        found = self._index.execute(f"SELECT row FROM rows{where} ORDER BY row", values).fetchall()
+        return np.array([row for row, in found], dtype=np.int64)
+
+    def rows(self, numbers: Sequence[int], columns: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """Gather the columns of the given rows.
+
+        Args:
+            numbers: Row numbers, as from query
+            columns: Names to include, all if None
+
+        Returns:
+            {name: array} in the order of numbers
+        """
+        numbers = np.asarray(numbers, dtype=np.int64)
+        names = list(self.columns if columns is None else columns)
+        if len(numbers) and (numbers.min() < 0 or numbers.max() >= self._rows):
+            raise IndexError(f"row numbers must be in [0, {self._rows})")
+        chunk_of = np.searchsorted(self._first_rows, numbers, side="right") - 1
+        result = {name: np.empty(len(numbers), dtype=self.columns[name]) for name in names}
+        for chunk in np.unique(chunk_of).tolist():
+            selected = chunk_of == chunk
+            offsets = numbers[selected] - self._first_rows[chunk]
+            for name in names:
+                result[name][selected] = self._map(chunk, name)[offsets]
+        return result
+
+    def row(self, number: int) -> Dict[str, Any]:
+        """One row as a dictionary of Python numbers."""
+        return {name: values[0].item() for name, values in self.rows([number]).items()}
+
+    def nearest(self, target: Mapping[str, Any], columns: Optional[Sequence[str]] = None,
+                **ranges: Any) -> Tuple[int, float]:
+        """The stored row closest to target.
+
+        The distance is the root sum of squares of the relative differences
+        (stored - target) / |target| over columns.  Chunks are scanned one
+        at a time, or only the rows query(**ranges) finds when ranges are
+        given.
+
+        Args:
+            target: Values to match
+            columns: Columns compared, the stored columns of target if None
+            **ranges: As for query, limiting the candidates
+
+        Returns:
+            (row number, distance)
+
+        Raises:
+            LookupError: If no row is a candidate
+        """
+        names = [name for name in (target if columns is None else columns) if name in self.columns]
+        if not names:
+            raise ValueError("target shares no columns with the store")
+        goal = {name: float(target[name]) for name in names}
+        scale = {name: max(abs(value), 1e-9) for name, value in goal.items()}
+
+        def distances(values: Dict[str, np.ndarray]) -> np.ndarray:
+            total = sum(((np.asarray(values[n], dtype=float) - goal[n]) / scale[n]) ** 2 for n in names)
+            # rows with a missing value never win
+            return np.where(np.isnan(total), np.inf, total)
+
+        best, best_distance = -1, np.inf
+        if ranges:
+            numbers = self.query(**ranges)
+            candidates = [(numbers, self.rows(numbers, names))] if len(numbers) else []
+        else:
+            candidates = ((first + np.arange(len(values[names[0]])), values)
+                          for first, values in self.chunks(names))
+        for numbers, values in candidates:
+            found = distances(values)
+            index = int(np.argmin(found))
+            if found[index] < best_distance:
+                best, best_distance = int(numbers[index]), float(found[index])
+        if best < 0:
+            raise LookupError(f"no stored design matches {ranges or target}")
+        return best, float(np.sqrt(best_distance))
+
+
+def design_row(parameters: Mapping[str, Any], metrics: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    """A store row of the parameters and the metrics of one design.
+
+    Parameters get their GearBoxParameters type, so a Diameter of 95 and
+    one of 95.5 land in the same float column.
+
+    Raises:
+        ParameterValidationError: If an int parameter is not a whole number
+    """
+    row = {name: GearBoxParameters.field_value(name, parameters[name])
+           for name, _ in GearBoxParameters.FIELDS if name in parameters}
+    row.update(metrics or {})
+    return row
+
+
+def store_sweep(store: ResultStore, candidates: Iterable[Dict[str, Any]],
+                allowable_pressure: Optional[float] = None) -> int:
+    """Evaluate candidates and append the feasible ones with their metrics.
+
+    Candidates are taken BATCH_SIZE at a time and can come from a
+    generator, so a sweep of any size runs in the memory of one chunk.
+
+    Args:
+        store: Store to append to
+        candidates: Parameter dictionaries
+        allowable_pressure: Contact pressure for the torque estimate,
+            cycloidOptimize's default if None
+
+    Returns:
+        Number of designs appended
+    """
+    from cycloidOptimize import BATCH_SIZE, evaluate_batch
+
+    options = {} if allowable_pressure is None else {"allowable_pressure": allowable_pressure}
+    count = 0
+    candidates = iter(candidates)
+    while True:
+        batch = list(islice(candidates, BATCH_SIZE))
+        if not batch:
+            break
+        for design in evaluate_batch(batch, "max_torque", **options):
+            store.append(design_row(design.parameters, design.metrics))
+            count += 1
+    store.flush()
+    return count
+
+
+def nearest_design(store: ResultStore, target: Mapping[str, Any], columns: Optional[Sequence[str]] = None,
+                   **ranges: Any) -> Tuple[Dict[str, Any], float]:
+    """Parameters of the stored design nearest target, ready for generate_parts.
+
+    Args:
+        store: Store of rows written by design_row
+        target: Parameter values to match, see ResultStore.nearest
+        columns: Columns compared, the stored columns of target if None
+        **ranges: As for ResultStore.query, limiting the candidates
+
+    Returns:
+        (parameter dictionary, distance); parameters the store lacks are
+        the defaults, min_rad and max_rad are left for generate_parts
+    """
+    number, distance = store.nearest(target, columns, **ranges)
+    row = store.row(number)
+    parameters = generate_default_parameters()
+    del parameters["min_rad"], parameters["max_rad"]
+    for name, kind in GearBoxParameters.FIELDS:
+        if name in row:
+            parameters[name] = kind(row[name])
+    return parameters, distance
+
+
+def generate_nearest(doc: Any, store: ResultStore, target: Mapping[str, Any], **kwargs: Any) -> Dict[str, Any]:
+    """Build the stored design nearest target into a FreeCAD document.
+
+    Args:
+        doc: FreeCAD document
+        store: Store to search
+        target: Parameter values to match
+        **kwargs: columns and ranges, as for nearest_design
+
+    Returns:
+        The parameters built, with min_rad and max_rad added
+    """
+    import cycloidFun
+
+    parameters, distance = nearest_design(store, target, **kwargs)
+    logger.info(f"nearest stored design is {distance:.3g} from the target")
+    cycloidFun.generate_parts(doc, parameters)
+    return parameters
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo tolerance analysis of backlash and clearance.
+
+The generator models one clearance value; real parts come out of the
+printer or the mill a little off.  analyse draws manufacturing deviations
+from given distributions and, for every sample, works out the backlash
+at the output and the smallest clearance over a full cycle.  A sample
+whose parts interfere, or whose backlash or clearance is out of limits,
+fails; the report gives the distributions and the yield.
+
+The contact model is first order about the nominal geometry.  The
+nominal profile is conjugate to every ring pin, so at input angle theta
+each pin touches it along the line through the pitch point
+(cycloidMath.pin_contact_geometry).  The gap along that line is the
+radial clearance the pin disk is drawn with, plus the pressure angle
+relief where the contact lies outside min_rad/max_rad, and each
+deviation moves it by its component along the line.  Turning the disk
+by a small angle closes the gap of a pin by its lever arm times the
+angle, so the disk's play is the smallest gap over lever arm on each
+side.  The driver pins sit in the disk holes the same way: the hole is
+the eccentricity larger than the pin, and the play of the output
+against the disk is the smallest hole gap over its lever arm about the
+axis.  The backlash is the sum of the two plays in both directions.
+
+Deviations, in mm (see DEVIATIONS):
+    eccentricity        the key's eccentricity, one per sample
+    roller_diameter     every roller's diameter
+    pin_circle_radius   the radius of the roller circle, one per sample
+    pin_position        x and y of every roller pin
+    hole_position       x and y of every driver hole in the disk
+    hole_diameter       every driver hole's diameter
+    profile_offset      material added all round the disk profile
+
+The generator draws the disk's driver holes with no clearance round the
+driver pins, so with hole deviations centred on zero nearly every sample
+interferes there; give hole_diameter a positive mean to study oversized
+holes.
+
+A distribution is ("normal", mean, standard deviation),
+("uniform", low, high) or a plain number, the standard deviation of a
+normal with mean 0.  Samples are drawn and evaluated in vectorised
+batches spread over worker processes; the results only depend on the
+seed, not on the number of workers.
+
+Example:
+    import cycloidMath, cycloidTolerance
+    params = cycloidMath.generate_default_parameters()
+    tolerances = dict(cycloidTolerance.default_tolerances(), hole_diameter=("normal", 0.3, 0.05))
+    report = cycloidTolerance.analyse(params, tolerances, samples=20000, max_backlash=120)
+    print(report.yield_percent, report.summary["backlash"])
+
+License 	LGPL V2.1
+Homepage https://github.com/iplayfast/CycloidGearBox
+"""
+
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from cycloidMath import calculate_min_max_radii
+
+logger = logging.getLogger(__name__)
+
+# Samples evaluated per task sent to a worker process
+BATCH_SIZE = 256
+DEFAULT_STEPS = 360
+PERCENTILES = (1, 5, 50, 95, 99)
+ARCMIN_PER_RADIAN = 60 * 180 / math.pi
+
+# Deviation name -> what one sample holds: a value, one per roller or hole, or x and y of each
+DEVIATIONS = {
+    "eccentricity": "sample",
+    "roller_diameter": "roller",
+    "pin_circle_radius": "sample",
+    "pin_position": "roller_xy",
+    "hole_position": "hole_xy",
+    "hole_diameter": "hole",
+    "profile_offset": "sample",
+}
+
+Distribution = Union[float, Tuple[str, float, float]]
+
+
+class ToleranceReport(NamedTuple):
+    """Outcome of analyse, one entry per sample in the arrays."""
+    backlash: np.ndarray        # largest backlash over the cycle at the output, arcmin
+    clearance: np.ndarray       # smallest clearance over the cycle, mm, negative for interference
+    ring_clearance: np.ndarray  # smallest clearance between the rollers and the disk, mm
+    driver_clearance: np.ndarray  # smallest clearance between the driver pins and holes, mm
+    passed: np.ndarray          # bool, within every limit
+    yield_percent: float
+    summary: Dict[str, Dict[str, float]]  # percentiles of backlash and clearance
+
+
+def default_tolerances() -> Dict[str, Distribution]:
+    """Standard deviations typical of a well tuned FDM printer, in mm."""
+    return {
+        "eccentricity": 0.02,
+        "roller_diameter": 0.03,
+        "pin_circle_radius": 0.05,
+        "pin_position": 0.05,
+        "hole_position": 0.05,
+        "hole_diameter": 0.05,
+        "profile_offset": 0.05,
+    }
+
+
+def _draw(distribution: Distribution, shape: Tuple[int, ...], rng: np.random.Generator) -> np.ndarray:
+    if isinstance(distribution, (int, float)):
+        return rng.normal(0.0, distribution, shape)
+    kind, a, b = distribution
+    if kind == "normal":
+        return rng.normal(a, b, shape)
+    if kind == "uniform":
+        return rng.uniform(a, b, shape)
+    raise ValueError(f"Unknown distribution {kind}, expected normal or uniform")
+
+
+def sample_deviations(parameters: Dict[str, Any], tolerances: Dict[str, Distribution], count: int,
+                      rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """Draw count sets of deviations; the ones not in tolerances are zero.
+
+    Returns:
+        Dictionary of DEVIATIONS name to an array with the samples first
+
+    Raises:
+        ValueError: If a name or distribution is unknown
+    """
+    unknown = set(tolerances) - set(DEVIATIONS)
+    if unknown:
+        raise ValueError(f"Unknown deviations {sorted(unknown)}, expected some of {sorted(DEVIATIONS)}")
+    shapes = {"sample": (count,),
+              "roller": (count, parameters["tooth_count"] + 1),
+              "roller_xy": (count, parameters["tooth_count"] + 1, 2),
+              "hole": (count, parameters["driver_disk_hole_count"]),
+              "hole_xy": (count, parameters["driver_disk_hole_count"], 2)}
+    deviations = {}
+    for name, kind in DEVIATIONS.items():
+        shape = shapes[kind]
+        deviations[name] = _draw(tolerances[name], shape, rng) if name in tolerances else np.zeros(shape)
+    return deviations
+
+
+def _unit(angle: np.ndarray) -> np.ndarray:
+    return np.stack((np.cos(angle), np.sin(angle)), axis=-1)
+
+
+def _play(gap: np.ndarray, lever: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Rotation each way until the first gap closes, and the clearance at the best rotation.
+
+    The smallest gap is a concave, piecewise linear function of the
+    rotation.  Its largest value is where a gap closing one way meets one
+    closing the other way, so it is the smallest such crossing over the
+    pairs of opposite lever arms.  With interference the forward and
+    backward rotations are negative and so is the clearance.
+
+    Args:
+        gap: (..., M) gaps at rotation 0
+        lever: (..., M) rate each gap closes at per radian of positive rotation
+
+    Returns:
+        (forward, backward, clearance), each shaped (...)
+    """
+    positive, negative = lever > 0, lever < 0
+    clearance = np.where(lever == 0, gap, np.inf).min(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        forward = np.where(positive, gap / lever, np.inf).min(axis=-1)
+        backward = np.where(negative, gap / -lever, np.inf).min(axis=-1)
+        # one gap closing forward at a time against all closing backward, so memory stays O(gap.size)
+        for i in range(gap.shape[-1]):
+            gi, li = gap[..., i:i + 1], lever[..., i:i + 1]
+            crossing = np.where(positive[..., i:i + 1] & negative, (gi * -lever + gap * li) / (li - lever), np.inf)
+            clearance = np.minimum(clearance, crossing.min(axis=-1))
+    # free to turn one way: the rotation is not what limits the clearance
+    return forward, backward, np.where(np.isfinite(clearance), clearance, gap.min(axis=-1))
+
+
+def evaluate_samples(parameters: Dict[str, Any], deviations: Dict[str, np.ndarray],
+                     steps: int = DEFAULT_STEPS) -> Dict[str, np.ndarray]:
+    """Backlash and clearance of every sample over a full cycle.
+
+    Args:
+        parameters: Nominal gearbox parameters including min_rad/max_rad
+        deviations: As returned by sample_deviations
+        steps: Input angles sampled over the tooth_count input turns of a cycle
+
+    Returns:
+        Dictionary of per-sample arrays: backlash (arcmin), clearance,
+        ring_clearance and driver_clearance (mm)
+    """
+    n = parameters["tooth_count"]
+    e = parameters["eccentricity"]
+    roller_r = parameters["roller_diameter"] / 2
+    pin_circle_r = parameters["roller_circle_diameter"] / 2
+    offset = parameters["pressure_angle_offset"]
+    theta = np.arange(steps) * (2 * math.pi * n / steps)
+    psi = -theta / n
+    direction = _unit(theta)                                    # (K, 2)
+
+    # rollers: nominal contact normal, lever arm and gap at every angle, (K, P)
+    radial = _unit(np.arange(n + 1) * (2 * math.pi / (n + 1)))  # (P, 2)
+    pins = pin_circle_r * radial
+    normal = pins[None] - ((n + 1) * e * direction)[:, None]
+    normal /= np.linalg.norm(normal, axis=-1, keepdims=True)
+    relative = pins[None] - (e * direction)[:, None]
+    lever = relative[..., 0] * normal[..., 1] - relative[..., 1] * normal[..., 0]
+    contact = relative - roller_r * normal
+    contact_r = np.linalg.norm(contact, axis=-1)
+    relieved = (contact_r < parameters["min_rad"]) | (contact_r > parameters["max_rad"])
+    outward = np.einsum("kpi,kpi->kp", normal, contact / contact_r[..., None])
+    along_radial = np.einsum("kpi,pi->kp", normal, radial)
+    nominal = parameters["clearance"] * along_radial + np.where(relieved, offset * outward, 0.0)
+
+    d = deviations
+    gap = (nominal[None]
+           + d["pin_circle_radius"][:, None, None] * along_radial[None]
+           + np.einsum("npi,kpi->nkp", d["pin_position"], normal)
+           - d["roller_diameter"][:, None, :] / 2
+           - d["profile_offset"][:, None, None]
+           - d["eccentricity"][:, None, None] * np.einsum("kpi,ki->kp", normal, direction)[None])
+    ring_forward, ring_backward, ring_clearance = _play(gap, np.broadcast_to(lever, gap.shape))
+
+    # driver pins in the disk holes: the pin sits the eccentricity off the hole centre
+    holes = parameters["driver_disk_hole_count"]
+    driver_r = parameters["driver_circle_diameter"] / 2
+    hole_angles = np.arange(holes) * (2 * math.pi / holes)
+    turn = psi[:, None] + hole_angles[None]                     # (K, H)
+    tangent = driver_r * _unit(turn + math.pi / 2)              # d(pin position)/d(rotation)
+    c, s = np.cos(psi), np.sin(psi)
+    error = -d["hole_position"]                                 # pin relative to hole, in the disk frame
+    error = np.stack((c[None, :, None] * error[:, None, :, 0] - s[None, :, None] * error[:, None, :, 1],
+                      s[None, :, None] * error[:, None, :, 0] + c[None, :, None] * error[:, None, :, 1]), axis=-1)
+    shift = -(e + d["eccentricity"])[:, None, None, None] * direction[None, :, None, :] + error
+    distance = np.linalg.norm(shift, axis=-1)                   # (N, K, H)
+    hole_gap = e + d["hole_diameter"][:, None, :] / 2 - distance
+    hole_lever = np.einsum("nkhi,khi->nkh", shift, tangent) / distance
+    drive_forward, drive_backward, driver_clearance = _play(hole_gap, hole_lever)
+
+    backlash = (ring_forward + ring_backward + drive_forward + drive_backward) * ARCMIN_PER_RADIAN
+    ring_clearance = ring_clearance.min(axis=1)
+    driver_clearance = driver_clearance.min(axis=1)
+    return {"backlash": np.maximum(backlash, 0.0).max(axis=1),
+            "clearance": np.minimum(ring_clearance, driver_clearance),
+            "ring_clearance": ring_clearance,
+            "driver_clearance": driver_clearance}
+
+
+def evaluate_batch(parameters: Dict[str, Any], tolerances: Dict[str, Distribution], count: int,
+                   seed: np.random.SeedSequence, steps: int = DEFAULT_STEPS) -> Dict[str, np.ndarray]:
+    """Draw and evaluate count samples.  The unit of work sent to worker processes."""
+    rng = np.random.default_rng(seed)
+    return evaluate_samples(parameters, sample_deviations(parameters, tolerances, count, rng), steps)
+
+
+def _summary(values: np.ndarray) -> Dict[str, float]:
+    result = {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+    result.update(mean=float(values.mean()), std=float(values.std()), min=float(values.min()),
+                  max=float(values.max()))
+    return result
+
+
+def analyse(parameters: Dict[str, Any], tolerances: Optional[Dict[str, Distribution]] = None,
+            samples: int = 10000, max_backlash: Optional[float] = None, min_clearance: float = 0.0,
+            steps: int = DEFAULT_STEPS, workers: Optional[int] = None, seed: int = 0,
+            batch_size: int = BATCH_SIZE) -> ToleranceReport:
+    """Monte Carlo backlash and clearance study.
+
+    Args:
+        parameters: Nominal gearbox parameters
+        tolerances: Distribution of each deviation, default_tolerances() if None
+        samples: Number of samples
+        max_backlash: Most backlash a sample may have in arcmin, no limit if None
+        min_clearance: Least clearance a sample must keep in mm; 0 fails
+            only samples whose parts interfere
+        steps: Input angles sampled over a cycle
+        workers: Worker processes, os.cpu_count() if None, 1 runs in-process
+        seed: Random seed so runs are repeatable
+        batch_size: Samples per task
+
+    Returns:
+        ToleranceReport
+
+    Raises:
+        ValueError: If a deviation or distribution is unknown, or samples is less than 1
+    """
+    if samples < 1:
+        raise ValueError("samples must be at least 1")
+    tolerances = dict(default_tolerances() if tolerances is None else tolerances)
+    parameters = dict(parameters)
+    if "min_rad" not in parameters or "max_rad" not in parameters:
+        parameters["min_rad"], parameters["max_rad"] = calculate_min_max_radii(parameters)
+    # fail on bad tolerances here rather than in every worker
+    sample_deviations(parameters, tolerances, 1, np.random.default_rng(0))
+
+    counts = [min(batch_size, samples - start) for start in range(0, samples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    workers = workers or os.cpu_count() or 1
+    args = ([parameters] * len(counts), [tolerances] * len(counts), counts, seeds, [steps] * len(counts))
+    if workers > 1 and len(counts) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(counts))) as executor:
+            results: List[Dict[str, np.ndarray]] = list(executor.map(evaluate_batch, *args))
+    else:
+        results = list(map(evaluate_batch, *args))
+    merged = {name: np.concatenate([r[name] for r in results]) for name in results[0]}
+
+    passed = merged["clearance"] >= min_clearance
+    if max_backlash is not None:
+        passed &= merged["backlash"] <= max_backlash
+    yield_percent = 100.0 * float(passed.mean())
+    logger.info(f"tolerance study: {yield_percent:.1f}% of {samples} samples pass")
+    return ToleranceReport(merged["backlash"], merged["clearance"], merged["ring_clearance"],
+                           merged["driver_clearance"], passed, yield_percent,
+                           {"backlash": _summary(merged["backlash"]), "clearance": _summary(merged["clearance"])})
@@ -44,7 +44,7 @@ import random
 import FreeCADGui
 import FreeCAD as App
 import cycloidFun
-from PySide import QtCore
+from PySide import QtCore, QtGui
 smWBpath = os.path.dirname(cycloidFun.__file__)
 smWB_icons_path = os.path.join(smWBpath, 'icons')
 global mainIcon
@@ -181,22 +181,69 @@ class CycloidalGearBox():
             "App::Property", "Pressure Angle Offset")).pressure_angle_offset = H["pressure_angle_offset"]
         obj.addProperty("App::PropertyLength", "clearance", "CycloidGearBox", QT_TRANSLATE_NOOP(
             "App::Property", "clearance between parts")).clearance = H["clearance"]
+        obj.addProperty("App::PropertyBool", "Instancing", "CycloidGearBox", QT_TRANSLATE_NOOP(
+            "App::Property", "Build the rollers and the second disk once and place copies with links")).Instancing = False
         # input Shaft
         # shaft diameter also in output shaft
         # driver_disk_hole_count (also in output shaft)              
         self.Type = 'CycloidalGearBox'
         self.Object = obj
         self.doc = App.ActiveDocument
+        # fingerprints of the parts in the document and the parameters they were built from
+        self.Built = {}
+        self.BuiltParameters = None
+        self._geometry_state = ""
         obj.Proxy = self
         attrs = vars(self)
 
     def __getstate__(self):
-        return self.Type
+        """Return object state for serialization.
+
+        Besides the type this keeps Dirty and a packed blob of what was
+        built (parameter hash, part fingerprints, disk profile and spline),
+        so a reopened gearbox only rebuilds the parts an edit touches.
+
+        Returns:
+            State dictionary
+        """
+        geometry = getattr(self, "_geometry_state", "")
+        if getattr(self, "BuiltParameters", None) is not None:
+            geometry = cycloidFun.export_geometry_state(self.BuiltParameters, self.Built)
+        return {"Type": self.Type, "Dirty": getattr(self, "Dirty", True), "Geometry": geometry}
 
     def __setstate__(self, state):
-        if state:
+        """Restore object state from serialization.
+
+        Args:
+            state: State dictionary, or the type string older files stored
+        """
+        self.Built = {}
+        self.BuiltParameters = None
+        self._geometry_state = ""
+        if isinstance(state, dict):
+            self.Type = state.get("Type", 'CycloidalGearBox')
+            self.Dirty = state.get("Dirty", True)
+            self._geometry_state = state.get("Geometry", "")
+        elif state:
             self.Type = state
 
+    def onDocumentRestored(self, obj):
+        """Reconnect to the object and load the saved geometry after opening.
+
+        Args:
+            obj: Feature Python object
+        """
+        self.Object = obj
+        self.doc = obj.Document
+        if not self._geometry_state:
+            return
+        try:
+            _, self.Built = cycloidFun.import_geometry_state(self._geometry_state)
+        except ValueError as e:
+            App.Console.PrintWarning(f"Cycloidal Gearbox: saved geometry ignored, parts will be rebuilt: {e}\n")
+            self.Built = {}
+            self._geometry_state = ""
+
     def onChanged(self, fp, prop):
         """Called when a property changes.
 
@@ -259,47 +306,86 @@ class CycloidalGearBox():
         return False
 
     def GetParameters(self):
-        parameters = {"tooth_count": int(self.Object.__getattribute__("tooth_count")),
-                           "line_segment_count": int(self.Object.__getattribute__("line_segment_count")),
-                           "roller_diameter": float(self.Object.__getattribute__("roller_diameter").Value),
-                           "roller_circle_diameter": float(self.Object.__getattribute__("roller_circle_diameter").Value),
-                           "driver_circle_diameter" : float(self.Object.__getattribute__("driver_circle_diameter").Value),
-                           "Diameter": float(self.Object.__getattribute__("Diameter").Value),
-                           "tooth_pitch": float(self.Object.__getattribute__("tooth_pitch").Value),
-                           "eccentricity": float(self.Object.__getattribute__("eccentricity").Value),
-                           "pressure_angle_limit": float(self.Object.__getattribute__("pressure_angle_limit").Value),
-                           "pressure_angle_offset": float(self.Object.__getattribute__("pressure_angle_offset").Value),
-                           "base_height": float(self.Object.__getattribute__("base_height").Value),
-                           "disk_height": float(self.Object.__getattribute__("disk_height").Value),
-                           "driver_disk_hole_count": int(self.Object.__getattribute__("driver_disk_hole_count")),
-                           "driver_hole_diameter" : float(self.Object.__getattribute__("driver_hole_diameter").Value),
-                           "Height": int(self.Object.__getattribute__("Height")),
-                           "shaft_diameter": float(self.Object.__getattribute__("shaft_diameter")),
-                           "key_diameter" : float(self.Object.__getattribute__("key_diameter")),
-                           "key_flat_diameter" : float(self.Object.__getattribute__("key_flat_diameter")),
-                           "clearance": float(self.Object.__getattribute__("clearance"))
-                           }
-        minr,maxr = cycloidFun.calculate_min_max_radii(parameters)
+        """Read the properties into an immutable GearBoxParameters.
+
+        Also updates the read only Min_Diameter and Max_Diameter properties.
+
+        Returns:
+            GearBoxParameters
+        """
+        parameters = cycloidFun.GearBoxParameters.from_object(self.Object)
+        minr, maxr = parameters.min_rad, parameters.max_rad
             
         if (self.Object.__getattribute__("Max_Diameter")!=maxr*2):
             self.Object.__setattr__("Max_Diameter",maxr*2)    
         if (self.Object.__getattribute__("Min_Diameter")!=minr*2):
                 self.Object.__setattr__("Min_Diameter",minr*2)    
-        parameters["min_rad"] = minr
-        parameters["max_rad"] = maxr        
         return parameters
 
     def force_Recompute(self):
+        """Rebuild every part, even those whose parameters did not change.
+
+        This is how a hand-damaged body is repaired, so the fingerprints of
+        the last build are not used.
+        """
         self.Dirty = True
-        self.recompute()
+        self.recompute(force=True)
+
+    def progress_dialog(self):
+        """A progress dialog with a Cancel button for generate_parts.
+
+        Returns:
+            (dialog, progress callback, CancellationToken), all None without the GUI
+        """
+        if not App.GuiUp:
+            return None, None, None
+        dialog = QtGui.QProgressDialog("Generating gearbox", "Cancel", 0, 100, FreeCADGui.getMainWindow())
+        dialog.setWindowModality(QtCore.Qt.WindowModal)
+        dialog.setMinimumDuration(500)
+
+        def progress(fraction, message):
+            dialog.setLabelText(message)
+            dialog.setValue(int(fraction * 100))
+            QtGui.QApplication.processEvents()
+
+        def poll():
+            # generation runs in the GUI thread, let the Cancel click through
+            QtGui.QApplication.processEvents()
+            return dialog.wasCanceled()
 
-    def recompute(self):
-        """Recompute all gearbox parts if parameters changed."""
+        return dialog, progress, cycloidFun.CancellationToken(poll)
+
+    def recompute(self, force=False):
+        """Recompute the gearbox parts whose parameters changed.
+
+        If a property changes while the parts are being built, another
+        recompute is scheduled once this one finishes.
+
+        Args:
+            force: Rebuild every part, not only the changed ones
+        """
         if self.Dirty:
+            dialog, progress, cancel = self.progress_dialog()
             try:
-                cycloidFun.generate_parts(App.ActiveDocument, self.GetParameters())
+                parameters = self.GetParameters()
+                previous = None if force else getattr(self, "Built", {})
+                built = cycloidFun.generate_parts(App.ActiveDocument, parameters, previous,
+                                                  instancing=getattr(self.Object, "Instancing", False),
+                                                  progress=progress, cancel=cancel)
+                if built is None:
+                    # called back from the event loop inside a running generation, stay dirty for the outer one
+                    return
+                self.Built = built
+                self.BuiltParameters = parameters
+                # generate_parts recomputed the parts it built, the rest of the document is left alone
                 self.Dirty = False
-                App.ActiveDocument.recompute()
+                if self.GetParameters() != parameters:
+                    # a property changed while the progress callbacks ran the event loop
+                    self.Dirty = True
+                    self.execute(self.Object)
+            except cycloidFun.GenerationCancelled:
+                # the document was rolled back, stay dirty so the next recompute tries again
+                App.Console.PrintMessage("Cycloidal Gearbox: generation cancelled, previous parts kept\n")
             except cycloidFun.ParameterValidationError as e:
                 # Show error to user in FreeCAD console
                 App.Console.PrintError(f"Cycloidal Gearbox Parameter Error: {str(e)}\n")
@@ -314,6 +400,9 @@ class CycloidalGearBox():
                 import traceback
                 App.Console.PrintError(traceback.format_exc())
                 raise
+            finally:
+                if dialog is not None:
+                    dialog.close()
         
     """    def recompute(self):        
         print("gearbox recompute started")
@@ -446,12 +535,21 @@ class ViewProviderCGBox:
         action = QtGui.QAction("Regenerate Gearbox", menu)
         action.triggered.connect(lambda: self.regenerate())
         menu.addAction(action)
+        action = QtGui.QAction("Regenerate with profiling", menu)
+        action.triggered.connect(lambda: self.regenerate_with_profiling())
+        menu.addAction(action)
 
     def regenerate(self):
         """Force regeneration of the gearbox."""
         if hasattr(self.Object, 'Proxy'):
             self.Object.Proxy.force_Recompute()
 
+    def regenerate_with_profiling(self):
+        """Force regeneration under the profiler, see cycloidProfile.profile_regeneration."""
+        if hasattr(self.Object, 'Proxy'):
+            import cycloidProfile
+            cycloidProfile.profile_regeneration(self.Object)
+
     def __getstate__(self):
         """Return object state for serialization.
 
@@ -0,0 +1,22 @@
+"""Shared fixtures.
+
+freecad gives a test the stub FreeCAD modules from freecad_stub, with
+cycloidFun imported against them, and removes both afterwards.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import freecad_stub  # noqa: E402
+
+
+@pytest.fixture
+def freecad():
+    """The stub FreeCAD module; cycloidFun imports against it inside the test."""
+    with freecad_stub.install() as module:
+        yield module
@@ -0,0 +1,616 @@
+"""In-memory stand-ins for the FreeCAD modules the generator uses.
+
+install() puts FreeCAD, Part and Sketcher modules into sys.modules that
+keep the document in plain python: bodies, sketches with their geometry
+and constraints, pads, pockets, polar patterns and links.  They check
+what FreeCAD would refuse (constraints on geometry that does not exist,
+a pad whose profile is in another body, duplicate names) and record
+every document operation, so cycloidFun.generate_parts runs in CI and
+the tests can count what it did:
+
+    with freecad_stub.install():
+        import cycloidFun
+        doc = FreeCAD.newDocument("gearbox")
+        cycloidFun.generate_parts(doc, parameters)
+        doc.api_calls()["cycloidalDisk1"]["addGeometry"]
+
+gearbox_object gives a gearbox document object whose proxy is the real
+cycloidbox.CycloidalGearBox, for the recompute paths of the workbench.
+
+Nothing is solved or meshed; feature shapes are not computed.
+"""
+
+import collections
+import math
+import sys
+import types
+from contextlib import contextmanager
+from typing import Any, Counter, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# The operations counted per part
+OPERATIONS = ("addObject", "addGeometry", "addConstraint", "recompute")
+
+# Which positional arguments of a Sketcher.Constraint are geometry indices
+_GEOMETRY_ARGUMENTS = {
+    "Coincident": (0, 2),
+    "PointOnObject": (0, 2),
+    "Equal": (0, 1),
+    "Diameter": (0,),
+    "Radius": (0,),
+    "Horizontal": (0,),
+    "Vertical": (0,),
+    "Block": (0,),
+}
+# distance constraints take (geo, pos, value) or (geo, pos, geo, pos, value)
+_DISTANCE_CONSTRAINTS = ("DistanceX", "DistanceY", "Distance")
+# external geometry the sketch always has: -1 is the H axis (and root point), -2 the V axis
+_AXES = (-1, -2)
+
+
+class Vector:
+    """FreeCAD.Vector."""
+
+    def __init__(self, x: float = 0.0, y: float = 0.0, z: float = 0.0):
+        self.x, self.y, self.z = float(x), float(y), float(z)
+
+    def __iter__(self) -> Iterator[float]:
+        return iter((self.x, self.y, self.z))
+
+    def __len__(self) -> int:
+        return 3
+
+    def __getitem__(self, index: int) -> float:
+        return (self.x, self.y, self.z)[index]
+
+    def __repr__(self) -> str:
+        return f"Vector ({self.x}, {self.y}, {self.z})"
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, Vector) and tuple(self) == tuple(other)
+
+    def add(self, other: "Vector") -> "Vector":
+        return Vector(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def sub(self, other: "Vector") -> "Vector":
+        return Vector(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    @property
+    def Length(self) -> float:
+        return math.sqrt(self.x ** 2 + self.y ** 2 + self.z ** 2)
+
+
+class Rotation:
+    """FreeCAD.Rotation about an axis, by an angle in degrees."""
+
+    def __init__(self, axis: Optional[Vector] = None, angle: float = 0.0):
+        self.Axis = axis if axis is not None else Vector(0, 0, 1)
+        self.Angle = math.radians(angle)
+
+
+class Placement:
+    """FreeCAD.Placement."""
+
+    def __init__(self, base: Optional[Vector] = None, rotation: Optional[Rotation] = None):
+        self.Base = base if base is not None else Vector()
+        self.Rotation = rotation if rotation is not None else Rotation()
+
+
+class Matrix:
+    """FreeCAD.Matrix; move and rotateZ apply after what the matrix already does."""
+
+    def __init__(self):
+        self.A = np.eye(4)
+
+    def move(self, vector: Vector) -> None:
+        self.A[:3, 3] += tuple(vector)
+
+    def rotateZ(self, angle: float) -> None:
+        c, s = math.cos(angle), math.sin(angle)
+        rotation = np.eye(4)
+        rotation[:2, :2] = ((c, -s), (s, c))
+        self.A = rotation @ self.A
+
+    def multVec(self, vector: Vector) -> Vector:
+        return Vector(*(self.A @ np.array((*vector, 1.0)))[:3])
+
+
+# -- Part ------------------------------------------------------------------------------------------
+
+class Geometry:
+    """Base of the Part geometry classes a sketch holds."""
+
+    def copy(self) -> "Geometry":
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        return clone
+
+
+class Circle(Geometry):
+    def __init__(self, center: Optional[Vector] = None, normal: Optional[Vector] = None, radius: float = 1.0):
+        self.Center = center if center is not None else Vector()
+        self.Axis = normal if normal is not None else Vector(0, 0, 1)
+        self.Radius = radius
+
+
+class ArcOfCircle(Geometry):
+    def __init__(self, circle: Circle, first: float, last: float):
+        self.Circle = circle
+        self.FirstParameter, self.LastParameter = first, last
+
+
+class LineSegment(Geometry):
+    def __init__(self, start: Vector, end: Vector):
+        self.StartPoint, self.EndPoint = start, end
+
+
+class BSplineCurve(Geometry):
+    """Keeps the points it interpolates and hands them back as its poles."""
+
+    def __init__(self):
+        self.points: List[Vector] = []
+        self.Degree = 3
+
+    def interpolate(self, points: List[Vector], **kwargs: Any) -> None:
+        if len(points) < 2:
+            raise ValueError("interpolate needs at least two points")
+        self.points = list(points)
+
+    def buildFromPolesMultsKnots(self, poles: List[Vector], mults: List[int], knots: List[float],
+                                 periodic: bool, degree: int) -> None:
+        self.points = list(poles)
+        self.Degree = degree
+
+    def transform(self, matrix: Matrix) -> None:
+        self.points = [matrix.multVec(v) for v in self.points]
+
+    def copy(self) -> "BSplineCurve":
+        clone = BSplineCurve()
+        clone.points = list(self.points)
+        clone.Degree = self.Degree
+        return clone
+
+    def getPoles(self) -> List[Vector]:
+        return list(self.points)
+
+    def getKnots(self) -> List[float]:
+        return [float(i) for i in range(len(self.points))]
+
+    def getMultiplicities(self) -> List[int]:
+        return [1] * len(self.points)
+
+    def toShape(self) -> "Shape":
+        return Shape([self])
+
+
+class Shape:
+    def __init__(self, edges: Optional[List[Geometry]] = None):
+        self.Edges = list(edges or [])
+
+
+def _shape_factory(*args: Any, **kwargs: Any) -> Shape:
+    return Shape()
+
+
+# -- Sketcher --------------------------------------------------------------------------------------
+
+class Constraint:
+    """Sketcher.Constraint(type, *arguments)."""
+
+    def __init__(self, type_name: str, *arguments: Any):
+        self.Type = type_name
+        self.arguments = arguments
+        self.Name = ""
+
+    def geometry(self) -> Tuple[int, ...]:
+        """Indices of the geometry this constraint refers to."""
+        if self.Type in _DISTANCE_CONSTRAINTS:
+            positions = (0, 2) if len(self.arguments) >= 5 else (0,)
+        else:
+            positions = _GEOMETRY_ARGUMENTS.get(self.Type, ())
+        return tuple(self.arguments[i] for i in positions)
+
+
+# -- document --------------------------------------------------------------------------------------
+
+class DocumentObject:
+    """Any document object; properties are plain attributes."""
+
+    def __init__(self, document: "Document", type_id: str, name: str):
+        self.Document = document
+        self.TypeId = type_id
+        self.Name = name
+        self.Label = name
+        self.Visibility = True
+        self.ViewObject = None      # headless, as FreeCADCmd
+        self.Placement = Placement()
+        self.State: List[str] = []
+        self.owner: Optional[str] = None   # name of the body or link the object belongs to
+
+    def links(self) -> Iterator["DocumentObject"]:
+        """Every document object a property of this one points at."""
+        for key, value in vars(self).items():
+            if key in ("Document", "owner"):
+                continue
+            for item in value if isinstance(value, (list, tuple)) else (value,):
+                if isinstance(item, DocumentObject):
+                    yield item
+                elif isinstance(item, tuple):
+                    yield from (i for i in item if isinstance(i, DocumentObject))
+
+    @property
+    def InList(self) -> List["DocumentObject"]:
+        return [o for o in self.Document.Objects if any(link is self for link in o.links())]
+
+    @property
+    def InListRecursive(self) -> List["DocumentObject"]:
+        found: Dict[str, DocumentObject] = {}
+        todo = [self]
+        while todo:
+            for parent in todo.pop().InList:
+                if parent.Name not in found and parent is not self:
+                    found[parent.Name] = parent
+                    todo.append(parent)
+        return list(found.values())
+
+
+class SketchObject(DocumentObject):
+    """Sketcher::SketchObject holding geometry and constraints."""
+
+    def __init__(self, document: "Document", type_id: str, name: str):
+        super().__init__(document, type_id, name)
+        self.Geometry: List[Geometry] = []
+        self.Constraints: List[Constraint] = []
+        self.construction: List[bool] = []
+        self.AttachmentOffset = Placement()
+
+    def addGeometry(self, geometry: Geometry, construction: bool = False) -> int:
+        self.Document.record("addGeometry", self)
+        self.Geometry.append(geometry.copy())
+        self.construction.append(bool(construction))
+        return len(self.Geometry) - 1
+
+    def addConstraint(self, constraint: Constraint) -> int:
+        self.Document.record("addConstraint", self)
+        for index in constraint.geometry():
+            if index not in _AXES and not 0 <= index < len(self.Geometry):
+                raise ValueError(f"{self.Name}: {constraint.Type} constraint on missing geometry {index}")
+        self.Constraints.append(constraint)
+        return len(self.Constraints) - 1
+
+    def renameConstraint(self, index: int, name: str) -> None:
+        if not 0 <= index < len(self.Constraints):
+            raise IndexError(f"{self.Name}: no constraint {index}")
+        self.Constraints[index].Name = name
+
+    def toggleConstruction(self, index: int) -> None:
+        self.construction[index] = not self.construction[index]
+
+
+class Body(DocumentObject):
+    """PartDesign::Body with its Origin."""
+
+    def __init__(self, document: "Document", type_id: str, name: str):
+        super().__init__(document, type_id, name)
+        self.Group: List[DocumentObject] = []
+        self.Tip: Optional[DocumentObject] = None
+        self.owner = name
+        origin = document.add_object("App::Origin", "Origin", self)
+        origin.OriginFeatures = [document.add_object(type_id, label, self)
+                                 for type_id, label in (("App::Line", "X_Axis"), ("App::Line", "Y_Axis"),
+                                                        ("App::Line", "Z_Axis"), ("App::Plane", "XY_Plane"),
+                                                        ("App::Plane", "XZ_Plane"), ("App::Plane", "YZ_Plane"))]
+        self.Origin = origin
+
+    def addObject(self, obj: DocumentObject) -> None:
+        self.Document.record("addObject", obj)
+        if obj.owner not in (None, self.Name):
+            raise ValueError(f"{obj.Name} is already in {obj.owner}")
+        obj.owner = self.Name
+        self.Group.append(obj)
+
+    def newObject(self, type_id: str, name: str) -> DocumentObject:
+        obj = self.Document.addObject(type_id, name)
+        self.addObject(obj)
+        return obj
+
+    def removeObjectsFromDocument(self) -> None:
+        for obj in list(self.Group):
+            self.Document.removeObject(obj.Name)
+        self.Group = []
+        self.Tip = None
+
+
+class Link(DocumentObject):
+    """App::Link, optionally an array of ElementCount copies."""
+
+    def __init__(self, document: "Document", type_id: str, name: str):
+        super().__init__(document, type_id, name)
+        self.LinkedObject: Optional[DocumentObject] = None
+        self.ElementCount = 0
+        self.ShowElement = True
+        self.PlacementList: List[Placement] = []
+        self.owner = name
+
+
+_CLASSES = {"Sketcher::SketchObject": SketchObject, "PartDesign::Body": Body, "App::Link": Link}
+
+
+class Document:
+    """An App.Document that records every operation.
+
+    Each record is (operation, object).  api_calls() groups them by the
+    part (body or link) the object belongs to.
+    """
+
+    def __init__(self, name: str):
+        self.Name = name
+        self.FileName = ""
+        self.UndoMode = 0
+        self.HasPendingTransaction = False
+        self.objects: Dict[str, DocumentObject] = {}
+        self.records: List[Tuple[str, DocumentObject]] = []
+        self.recomputed: List[DocumentObject] = []
+        self._transaction: Optional[Dict[str, Tuple[DocumentObject, Dict[str, Any]]]] = None
+
+    # -- recording ---------------------------------------------------------------------------------
+
+    def record(self, operation: str, obj: DocumentObject) -> None:
+        self.records.append((operation, obj))
+
+    def reset_calls(self) -> None:
+        """Forget the operations recorded so far."""
+        self.records = []
+        self.recomputed = []
+
+    def api_calls(self) -> Dict[str, Counter[str]]:
+        """Operations per part, by the body or link each object ended up in.
+
+        Objects that never joined a body count under "document".  A
+        recompute counts once for every part it recomputed objects of,
+        and "recomputed" is the number of that part's objects it touched.
+        """
+        calls: Dict[str, Counter[str]] = collections.defaultdict(collections.Counter)
+        for operation, obj in self.records:
+            part = obj.owner or "document"
+            if operation == "recompute":
+                calls[part]["recompute"] += 1
+            else:
+                calls[part][operation] += 1
+        for obj in self.recomputed:
+            calls[obj.owner or "document"]["recomputed"] += 1
+        return dict(calls)
+
+    # -- objects -----------------------------------------------------------------------------------
+
+    @property
+    def Objects(self) -> List[DocumentObject]:
+        return list(self.objects.values())
+
+    def _unique_name(self, name: str) -> str:
+        name = name or "Unnamed"
+        if name not in self.objects:
+            return name
+        number = 1
+        while f"{name}{number:03d}" in self.objects:
+            number += 1
+        return f"{name}{number:03d}"
+
+    def add_object(self, type_id: str, name: str, owner: Optional[Body] = None) -> DocumentObject:
+        """Make an object without recording it, for what FreeCAD makes implicitly."""
+        cls = _CLASSES.get(type_id, DocumentObject)
+        obj = cls(self, type_id, self._unique_name(name))
+        if owner is not None:
+            obj.owner = owner.Name
+        self.objects[obj.Name] = obj
+        return obj
+
+    def addObject(self, type_id: str, name: str = "") -> DocumentObject:
+        obj = self.add_object(type_id, name)
+        self.record("addObject", obj)
+        return obj
+
+    def getObject(self, name: str) -> Optional[DocumentObject]:
+        return self.objects.get(name)
+
+    def removeObject(self, name: str) -> None:
+        obj = self.objects.pop(name, None)
+        if obj is None:
+            raise ValueError(f"no object {name}")
+        if isinstance(obj, Body):
+            for feature in [obj.Origin] + obj.Origin.OriginFeatures:
+                self.objects.pop(feature.Name, None)
+        for other in self.objects.values():
+            group = getattr(other, "Group", None)
+            if isinstance(group, list) and obj in group:
+                group.remove(obj)
+
+    # -- recompute ---------------------------------------------------------------------------------
+
+    def _check(self, obj: DocumentObject) -> List[str]:
+        """Why FreeCAD would mark obj invalid, empty if it would not."""
+        if obj.TypeId in ("PartDesign::Pad", "PartDesign::Pocket"):
+            profile = getattr(obj, "Profile", None)
+            if not isinstance(profile, SketchObject):
+                return [f"{obj.Name} has no sketch"]
+            if profile.owner != obj.owner:
+                return [f"{obj.Name} uses {profile.Name} from another body"]
+            if not profile.Geometry:
+                return [f"{obj.Name} uses the empty sketch {profile.Name}"]
+            if not getattr(obj, "Length", 0) > 0:
+                return [f"{obj.Name} has length {getattr(obj, 'Length', 0)}"]
+        if obj.TypeId == "PartDesign::PolarPattern":
+            originals = getattr(obj, "Originals", [])
+            if not originals or any(o.owner != obj.owner for o in originals):
+                return [f"{obj.Name} has no originals in its body"]
+            if not getattr(obj, "Occurrences", 0) >= 1:
+                return [f"{obj.Name} has {getattr(obj, 'Occurrences', 0)} occurrences"]
+        if obj.TypeId == "App::Link" and getattr(obj, "LinkedObject", None) is None:
+            return [f"{obj.Name} links nothing"]
+        return []
+
+    def recompute(self, objects: Optional[List[DocumentObject]] = None) -> int:
+        """Check every object given (all if None) and return how many there were."""
+        scope = self.Objects if objects is None else list(objects)
+        for part in {obj.owner or "document" for obj in scope} or {"document"}:
+            self.records.append(("recompute", _PartMarker(part)))
+        for obj in scope:
+            obj.State = ["Invalid"] if self._check(obj) else []
+        self.recomputed.extend(scope)
+        return len(scope)
+
+    def invalid_objects(self) -> Dict[str, List[str]]:
+        """Objects FreeCAD would mark invalid, with the reason."""
+        return {obj.Name: problems for obj in self.Objects for problems in [self._check(obj)] if problems}
+
+    # -- undo --------------------------------------------------------------------------------------
+
+    def openTransaction(self, name: str = "") -> None:
+        # like FreeCAD, nothing is recorded while undo is off
+        if not self.UndoMode:
+            return
+        self._transaction = {key: (obj, {attribute: list(value) if isinstance(value, list) else value
+                                         for attribute, value in vars(obj).items()})
+                             for key, obj in self.objects.items()}
+        self.HasPendingTransaction = True
+
+    def commitTransaction(self) -> None:
+        self._transaction = None
+        self.HasPendingTransaction = False
+
+    def abortTransaction(self) -> None:
+        if self._transaction is not None:
+            self.objects = {}
+            for name, (obj, state) in self._transaction.items():
+                obj.__dict__.clear()
+                obj.__dict__.update(state)
+                self.objects[name] = obj
+        self.commitTransaction()
+
+
+class _PartMarker:
+    """Stands in for an object in a recompute record, so it counts under owner."""
+
+    def __init__(self, owner: str):
+        self.owner = owner
+
+
+# -- modules ---------------------------------------------------------------------------------------
+
+def _freecad_module() -> types.ModuleType:
+    module = types.ModuleType("FreeCAD")
+    base = types.ModuleType("FreeCAD.Base")
+    for cls in (Vector, Rotation, Placement, Matrix):
+        setattr(base, cls.__name__, cls)
+        setattr(module, cls.__name__, cls)
+    module.Base = base
+    module.ActiveDocument = None
+    module.documents: Dict[str, Document] = {}
+
+    def newDocument(name: str = "Unnamed") -> Document:
+        doc = Document(name)
+        module.documents[name] = doc
+        module.ActiveDocument = doc
+        return doc
+
+    def getDocument(name: str) -> Document:
+        return module.documents[name]
+
+    def closeDocument(name: str) -> None:
+        doc = module.documents.pop(name)
+        if module.ActiveDocument is doc:
+            module.ActiveDocument = None
+
+    module.newDocument = newDocument
+    module.getDocument = getDocument
+    module.closeDocument = closeDocument
+    module.Console = types.SimpleNamespace(PrintMessage=lambda text: None, PrintWarning=lambda text: None,
+                                           PrintError=lambda text: None)
+    module.GuiUp = False
+    return module
+
+
+def _part_module() -> types.ModuleType:
+    module = types.ModuleType("Part")
+    for cls in (Circle, ArcOfCircle, LineSegment, BSplineCurve, Shape):
+        setattr(module, cls.__name__, cls)
+    module.Line = LineSegment
+    for name in ("Wire", "Face", "makePolygon", "makeLoft", "BSplineSurface", "makeHelix", "makeShell",
+                 "makeSolid"):
+        setattr(module, name, _shape_factory)
+    return module
+
+
+def _sketcher_module() -> types.ModuleType:
+    module = types.ModuleType("Sketcher")
+    module.Constraint = Constraint
+    return module
+
+
+# modules that import FreeCAD, dropped on install so they import against the stubs
+DEPENDENT_MODULES = ("cycloidFun", "cycloidbox")
+
+
+def _import_gearbox_module() -> types.ModuleType:
+    """Import cycloidbox, which needs FreeCADGui and PySide at import time.
+
+    cycloidFun is imported first, without them, so it keeps its headless
+    path; the GUI modules are only there while cycloidbox imports.
+    """
+    import cycloidFun  # noqa: F401
+
+    if "cycloidbox" in sys.modules:
+        return sys.modules["cycloidbox"]
+    gui = types.ModuleType("FreeCADGui")
+    gui.addCommand = lambda *args: None
+    pyside = types.ModuleType("PySide")
+    pyside.QtCore, pyside.QtGui = types.SimpleNamespace(), types.SimpleNamespace()
+    sys.modules.update(FreeCADGui=gui, PySide=pyside)
+    try:
+        import cycloidbox
+    finally:
+        sys.modules.pop("FreeCADGui")
+        sys.modules.pop("PySide")
+    return cycloidbox
+
+
+def gearbox_object(doc: Document, **changes: Any) -> types.SimpleNamespace:
+    """A gearbox document object with a cycloidbox.CycloidalGearBox proxy.
+
+    Only the properties GetParameters and recompute read are set, from the
+    default parameters with changes applied; the proxy is dirty.  Call
+    inside install() with doc the active document.
+    """
+    cycloidbox = _import_gearbox_module()
+    values = dict(cycloidbox.cycloidFun.generate_default_parameters(), **changes)
+    del values["min_rad"], values["max_rad"]
+    obj = types.SimpleNamespace(Name="GearBox", Document=doc, Min_Diameter=0.0, Max_Diameter=0.0,
+                                Instancing=False, **values)
+    proxy = cycloidbox.CycloidalGearBox.__new__(cycloidbox.CycloidalGearBox)
+    proxy.Object, proxy.Dirty, proxy.Built = obj, True, {}
+    obj.Proxy = proxy
+    return obj
+
+
+@contextmanager
+def install() -> Iterator[types.ModuleType]:
+    """Put the stub FreeCAD, Part and Sketcher modules in sys.modules.
+
+    FreeCADGui is left out, so code takes its headless path.  Modules
+    that import FreeCAD are imported afresh inside the block and dropped
+    again after it, along with the stubs.
+
+    Yields:
+        The stub FreeCAD module
+    """
+    names = ("FreeCAD", "Part", "Sketcher", "FreeCADGui") + DEPENDENT_MODULES
+    saved = {name: sys.modules.pop(name) for name in names if name in sys.modules}
+    freecad = _freecad_module()
+    sys.modules.update(FreeCAD=freecad, Part=_part_module(), Sketcher=_sketcher_module())
+    try:
+        yield freecad
+    finally:
+        for name in names:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
@@ -0,0 +1,167 @@
+"""Unit tests for the cycloidCache content-addressed part cache."""
+
+import pytest
+import os
+import sys
+import threading
+
+# Add parent directory to path to import cycloidCache
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestPartCache:
+    """Test keys, storage and eviction."""
+
+    def test_key_ignores_unrelated_parameters(self, tmp_path):
+        """The shaft key does not change with the disk profile, the disk key does."""
+        from cycloidMath import generate_default_parameters
+        from cycloidCache import PartCache
+
+        cache = PartCache(str(tmp_path))
+        params = generate_default_parameters()
+        other = dict(params, pressure_angle_offset=0.3)
+
+        assert cache.key("inputShaft", params, ".stl") == cache.key("inputShaft", other, ".stl")
+        assert cache.key("cycloidalDisk1", params, ".stl") != cache.key("cycloidalDisk1", other, ".stl")
+        assert cache.key("inputShaft", params, ".stl") != cache.key("inputShaft", params, ".brep")
+
+    def test_put_get_is_atomic(self, tmp_path):
+        """Stored data comes back and no temporary or lock files are left."""
+        from cycloidMath import generate_default_parameters
+        from cycloidCache import PartCache
+
+        cache = PartCache(str(tmp_path))
+        params = generate_default_parameters()
+
+        assert cache.get("pinDisk", params, ".stl") is None
+        assert cache.get_or_build("pinDisk", params, ".stl", lambda: b"mesh") == b"mesh"
+        assert cache.get("pinDisk", params, ".stl") == b"mesh"
+        leftovers = [f for _, _, files in os.walk(tmp_path) for f in files if f.endswith((".tmp", ".lock"))]
+        assert leftovers == []
+
+    def test_eviction_removes_least_recently_used(self, tmp_path):
+        """Over max_bytes the oldest entries go first."""
+        from cycloidMath import generate_default_parameters
+        from cycloidCache import PartCache
+
+        cache = PartCache(str(tmp_path), max_bytes=250)
+        params = generate_default_parameters()
+        variants = [dict(params, key_diameter=4 + i * 0.1) for i in range(3)]
+        cache.put("inputShaft", variants[0], ".stl", b"a" * 100)
+        cache.put("inputShaft", variants[1], ".stl", b"b" * 100)
+        # use the first entry so the second is now the least recently used
+        path = cache.path(cache.key("inputShaft", variants[0], ".stl"), ".stl")
+        os.utime(path, (os.path.getmtime(path) + 10,) * 2)
+        cache.put("inputShaft", variants[2], ".stl", b"c" * 100)
+
+        assert cache.size() <= 250
+        assert cache.get("inputShaft", variants[0], ".stl") is not None
+        assert cache.get("inputShaft", variants[1], ".stl") is None
+        assert cache.get("inputShaft", variants[2], ".stl") is not None
+
+    def test_put_scans_only_when_over_budget(self, tmp_path, monkeypatch):
+        """Writes under max_bytes keep a running total instead of scanning the directory."""
+        import cycloidCache
+        from cycloidMath import generate_default_parameters
+
+        cache = cycloidCache.PartCache(str(tmp_path), max_bytes=1000)
+        params = generate_default_parameters()
+        scans = []
+        entries = cache.entries
+        monkeypatch.setattr(cache, "entries", lambda: scans.append(1) or entries())
+        monkeypatch.setattr(cycloidCache, "EVICT_EVERY", 8)
+        for i in range(9):
+            cache.put("inputShaft", dict(params, key_diameter=4 + i * 0.1), ".stl", b"x" * 10)
+        assert len(scans) == 2
+        cache.put("inputShaft", dict(params, key_diameter=5.0), ".stl", b"x" * 1000)
+
+        assert len(scans) == 3
+        assert cache.size() <= 1000
+
+    def test_stale_lock_taken_over_is_kept(self, tmp_path):
+        """A builder whose lock was taken over as stale leaves the new holder's lock alone."""
+        from cycloidMath import generate_default_parameters
+        from cycloidCache import PartCache
+
+        cache = PartCache(str(tmp_path))
+        params = generate_default_parameters()
+        lock = cache.path(cache.key("pinDisk", params, ".stl"), ".stl") + ".lock"
+
+        def build():
+            with open(lock, "rb") as stream:
+                assert stream.read()
+            with open(lock, "wb") as stream:
+                stream.write(b"another worker")
+            return b"mesh"
+
+        assert cache.get_or_build("pinDisk", params, ".stl", build) == b"mesh"
+        with open(lock, "rb") as stream:
+            assert stream.read() == b"another worker"
+
+        def build_without_lock():
+            os.remove(lock)
+            return b"mesh"
+
+        cache.clear()
+        os.remove(lock)
+        assert cache.get_or_build("pinDisk", params, ".stl", build_without_lock) == b"mesh"
+
+    def test_concurrent_workers_build_once(self, tmp_path):
+        """Workers asking for the same entry at once share one build."""
+        from cycloidMath import generate_default_parameters
+        from cycloidCache import PartCache
+
+        params = generate_default_parameters()
+        calls = []
+        started = threading.Event()
+
+        def build():
+            calls.append(1)
+            started.wait(1.0)
+            return b"shape"
+
+        results = []
+        workers = [threading.Thread(target=lambda: results.append(
+            PartCache(str(tmp_path)).get_or_build("eccentricKey", params, ".stl", build))) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        started.set()
+        for worker in workers:
+            worker.join()
+
+        assert results == [b"shape"] * 4
+        assert len(calls) == 1
+
+
+class TestCatalog:
+    """Test building a catalog of variants through the cache."""
+
+    def test_shared_parts_are_built_once(self, tmp_path, monkeypatch):
+        """Varying only the driver holes rebuilds neither shaft nor the pin disk."""
+        from cycloidMath import generate_default_parameters
+        from cycloidCache import PartCache, build_catalog
+        import cycloidCache
+
+        params = generate_default_parameters()
+        variants = [dict(params, driver_hole_diameter=7 + i * 0.5) for i in range(4)]
+        built = []
+        stl = cycloidCache.BUILDERS[".stl"]
+
+        def counting(name, parameters):
+            built.append(name)
+            return stl(name, parameters)
+
+        monkeypatch.setitem(cycloidCache.BUILDERS, ".stl", counting)
+        cache = PartCache(str(tmp_path / "cache"))
+        paths = build_catalog(variants, str(tmp_path / "out"), cache, formats=(".stl",))
+
+        assert len(paths) == 4 * 7
+        for name in ("pinDisk", "inputShaft", "eccentricKey"):
+            assert built.count(name) == 1
+        for name in ("driverDisk", "cycloidalDisk1", "cycloidalDisk2", "outputShaft"):
+            assert built.count(name) == 4
+        assert cache.builds == len(built)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
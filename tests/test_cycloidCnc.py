@@ -0,0 +1,118 @@
+"""Unit tests for the cycloidCnc toolpath generator."""
+
+import pytest
+import sys
+import os
+
+import numpy as np
+
+# Add parent directory to path to import cycloidCnc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestProfileFrame:
+    """Test the analytic outline, normals and curvature."""
+
+    def test_points_match_outline(self):
+        """The analytic outline is the outline the disk sketch uses."""
+        from cycloidMath import generate_default_parameters, cycloidal_disk_outline
+        from cycloidCnc import profile_frame
+
+        params = generate_default_parameters()
+
+        assert profile_frame(params).points == pytest.approx(cycloidal_disk_outline(params), abs=1e-9)
+
+    def test_normals_are_perpendicular(self):
+        """Normals are unit length and perpendicular to the outline."""
+        from cycloidMath import generate_default_parameters
+        from cycloidCnc import profile_frame
+
+        params = generate_default_parameters()
+        params["line_segment_count"] = 400
+        frame = profile_frame(params)
+        chord = np.roll(frame.points, -1, axis=0) - np.roll(frame.points, 1, axis=0)
+        chord /= np.hypot(chord[:, 0], chord[:, 1])[:, None]
+        # check_limit steps the outline at the limit circles, skip the points next to a step
+        smooth = ~(frame.limited ^ np.roll(frame.limited, 1)) & ~(frame.limited ^ np.roll(frame.limited, -1))
+
+        assert np.hypot(frame.normals[:, 0], frame.normals[:, 1]) == pytest.approx(1.0)
+        assert np.abs(np.einsum("ij,ij->i", frame.normals, chord))[smooth].max() < 1e-3
+
+    def test_curvature_matches_finite_differences(self):
+        """The exact curvature agrees with a finite difference estimate."""
+        from cycloidMath import generate_default_parameters
+        from cycloidCnc import profile_frame
+
+        params = generate_default_parameters()
+        params["line_segment_count"] = 400
+        params["pressure_angle_offset"] = 0.0
+        frame = profile_frame(params)
+        p = frame.points
+        d1 = (np.roll(p, -1, axis=0) - np.roll(p, 1, axis=0)) / 2
+        d2 = np.roll(p, -1, axis=0) - 2 * p + np.roll(p, 1, axis=0)
+        curvature = (d1[:, 0] * d2[:, 1] - d1[:, 1] * d2[:, 0]) / np.hypot(d1[:, 0], d1[:, 1]) ** 3
+
+        assert curvature == pytest.approx(frame.curvature, abs=1e-3)
+
+
+class TestToolpath:
+    """Test offsetting and G-code output."""
+
+    def test_offset_keeps_tool_radius_clearance(self):
+        """Every tool centre is tool_radius from the outline."""
+        from cycloidMath import generate_default_parameters
+        from cycloidCnc import profile_frame, offset_outline
+
+        params = generate_default_parameters()
+        # without the check_limit step the outline is smooth everywhere
+        params["pressure_angle_offset"] = 0.0
+        frame = profile_frame(params)
+        path, valid = offset_outline(frame, 1.5)
+
+        assert valid.all()
+        distance = np.hypot(*(path[:, None, :] - frame.points[None, :, :]).transpose(2, 0, 1)).min(axis=1)
+        assert distance == pytest.approx(1.5, abs=1e-6)
+
+    def test_tool_too_large_for_concave_flanks(self):
+        """A tool wider than the concave flank radius is reported."""
+        from cycloidMath import generate_default_parameters
+        from cycloidCnc import check_tool, disk_toolpath
+
+        params = generate_default_parameters()
+        problems = check_tool(params, 6.0)
+
+        assert [p.contour for p in problems] == ["outline"]
+        assert len(problems[0].indices) > 0
+        with pytest.raises(ValueError, match="outline"):
+            disk_toolpath(params, 6.0)
+
+    def test_tool_too_large_for_holes(self):
+        """A tool that does not fit a hole is reported for that hole."""
+        from cycloidMath import generate_default_parameters
+        from cycloidCnc import check_tool
+
+        params = generate_default_parameters()
+        params["shaft_diameter"] = 2.0
+
+        assert [p.contour for p in check_tool(params, 1.5)] == ["center_hole"]
+
+    def test_gcode_passes(self):
+        """Each contour is cut in step_down passes ending at the full depth."""
+        from cycloidMath import generate_default_parameters
+        from cycloidCnc import disk_toolpath
+
+        params = generate_default_parameters()
+        gcode = disk_toolpath(params, 1.5, depth=5.0, step_down=2.0)
+        lines = gcode.splitlines()
+        contours = 2 + params["driver_disk_hole_count"]
+
+        assert lines[-1] == "M2"
+        assert sum(1 for l in lines if l.startswith("G1 Z")) == 3 * contours
+        assert sum(1 for l in lines if l.startswith("G1 Z-5.0000")) == contours
+        assert sum(1 for l in lines if l.startswith("G3")) == 3 * (contours - 1)
+        outline_moves = sum(1 for l in lines if l.startswith("G1 X"))
+        assert outline_moves == 3 * params["tooth_count"] * params["line_segment_count"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,99 @@
+"""Unit tests for the cycloidDiagnostics leak tracking."""
+
+import pytest
+import os
+import sys
+from types import SimpleNamespace
+
+# Add parent directory to path to import cycloidDiagnostics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Document:
+    """Just enough of a FreeCAD document for the orphan checks."""
+
+    def __init__(self):
+        self.objects = {}
+
+    @property
+    def Objects(self):
+        return list(self.objects.values())
+
+    def add(self, type_id, name, group=()):
+        obj = SimpleNamespace(TypeId=type_id, Name=name, Group=list(group))
+        self.objects[name] = obj
+        return obj
+
+    def getObject(self, name):
+        return self.objects.get(name)
+
+    def removeObject(self, name):
+        del self.objects[name]
+
+
+def gearbox_document():
+    doc = Document()
+    sketch = doc.add("Sketcher::SketchObject", "Sketch")
+    pad = doc.add("PartDesign::Pad", "Pad")
+    doc.add("PartDesign::Body", "pinDisk", [sketch, pad])
+    doc.add("Sketcher::SketchObject", "UserSketch")
+    doc.add("Sketcher::SketchObject", "LeftSketch")
+    return doc
+
+
+class TestOrphans:
+    """Test finding and removing features outside bodies."""
+
+    def test_orphans_are_features_outside_bodies(self):
+        """Body members and the body itself are not orphans."""
+        from cycloidDiagnostics import orphaned_objects
+
+        doc = gearbox_document()
+
+        assert [o.Name for o in orphaned_objects(doc)] == ["UserSketch", "LeftSketch"]
+
+    def test_remove_only_candidates(self):
+        """Orphans the generator did not make are left alone."""
+        from cycloidDiagnostics import remove_orphans
+
+        doc = gearbox_document()
+
+        assert remove_orphans(doc, ["LeftSketch", "Sketch", "Gone"]) == ["LeftSketch"]
+        assert doc.getObject("UserSketch") is not None
+        assert doc.getObject("Sketch") is not None
+
+
+class TestStress:
+    """Test the repeated generation check."""
+
+    def test_steady_generation_passes(self):
+        """A generation that replaces its objects shows no growth."""
+        from cycloidDiagnostics import stress
+
+        doc = gearbox_document()
+        doc.removeObject("UserSketch")
+        doc.removeObject("LeftSketch")
+
+        report = stress(doc, {}, runs=5, generate=lambda doc, parameters: None)
+
+        assert report.runs == 5
+        assert report.growth["objects"] == 0
+        assert len(report.snapshots) == 5
+
+    def test_leaking_generation_is_detected(self):
+        """A generation that leaves a sketch behind each time fails."""
+        from cycloidDiagnostics import stress, LeakDetected
+
+        doc = gearbox_document()
+        doc.removeObject("UserSketch")
+        doc.removeObject("LeftSketch")
+
+        def leaky(doc, parameters):
+            doc.add("Sketcher::SketchObject", f"Sketch{len(doc.objects)}")
+
+        with pytest.raises(LeakDetected, match="objects grew by 4"):
+            stress(doc, {}, runs=5, generate=leaky)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
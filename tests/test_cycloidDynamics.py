@@ -0,0 +1,112 @@
+"""Unit tests for the cycloidDynamics shaking force and bearing load analysis."""
+
+import pytest
+import math
+import os
+import sys
+
+import numpy as np
+
+# Add parent directory to path to import cycloidDynamics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def momentum(parameters, t, omega):
+    """Linear and angular momentum about the origin of the moving parts at time t, from their motion."""
+    from cycloidDynamics import DISK_PARTS, INPUT_PARTS, OUTPUT_PARTS, disk_centers
+    from cycloidMass import mass_properties
+
+    def turn(a):
+        c, s = math.cos(a), math.sin(a)
+        return np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]])
+
+    ratio = -1.0 / parameters["tooth_count"]
+    bodies = [(mass_properties(INPUT_PARTS, parameters), 1.0, np.zeros(3)),
+              (mass_properties(OUTPUT_PARTS, parameters), ratio, np.zeros(3))]
+    bodies += [(mass_properties(name, parameters), ratio, np.append(center, 0))
+               for name, center in zip(DISK_PARTS, disk_centers(parameters))]
+    linear, angular = np.zeros(3), np.zeros(3)
+    for props, spin, orbit in bodies:
+        def position(tt):
+            return turn(omega * tt) @ orbit + turn(spin * omega * tt) @ (props.center - orbit)
+
+        dt = 1e-7
+        r, v = position(t), (position(t + dt) - position(t - dt)) / (2 * dt)
+        rotation = turn(spin * omega * t)
+        inertia = rotation @ props.inertia @ rotation.T
+        linear += props.mass * v
+        angular += props.mass * np.cross(r, v) + inertia @ np.array([0, 0, spin * omega])
+    return linear, angular
+
+
+class TestAnalyse:
+    """Test the shaking force, moment and bearing loads."""
+
+    def test_matches_rate_of_change_of_momentum(self):
+        """The shaking force and moment are minus the rates of change of momentum."""
+        from cycloidMath import generate_default_parameters
+        from cycloidDynamics import analyse
+
+        params = generate_default_parameters()
+        rpm = 600.0
+        omega = rpm * 2 * math.pi / 60
+        steps = 1000
+        report = analyse(params, rpm, steps=steps)
+        k = 137
+        t, dt = report.angle[k] / omega, 1e-5
+        (p0, h0), (p1, h1) = momentum(params, t - dt, omega), momentum(params, t + dt, omega)
+
+        assert report.shaking_force[0, k] == pytest.approx(-(p1 - p0)[:2] / (2 * dt) * 1e-6, rel=1e-4)
+        assert report.shaking_moment[0, k] == pytest.approx(-(h1 - h0) / (2 * dt) * 1e-6, rel=1e-4)
+
+    def test_loads_grow_with_speed_squared(self):
+        """Doubling the speed quadruples every load."""
+        from cycloidMath import generate_default_parameters
+        from cycloidDynamics import analyse
+
+        report = analyse(generate_default_parameters(), [1000, 2000, 4000], steps=90)
+
+        assert report.shaking_force.shape == (3, 90, 2)
+        assert report.peak_force[1:] == pytest.approx(report.peak_force[:-1] * 4)
+        assert report.eccentric_loads[2] == pytest.approx(report.eccentric_loads[0] * 16)
+        assert report.support_loads[1] == pytest.approx(report.support_loads[0] * 4)
+
+    def test_support_loads_balance_the_shaking_force(self):
+        """The support reactions add up to the force and moment the frame supplies."""
+        from cycloidMath import generate_default_parameters
+        from cycloidDynamics import analyse
+
+        params = generate_default_parameters()
+        report = analyse(params, 3000, steps=60, supports=(2.0, 30.0))
+        disk = report.eccentric_loads[0, :, 0]
+        mass = 17.836  # g, one disk with the default parameters
+        omega = 3000 * 2 * math.pi / 60
+
+        # the disks orbit at the eccentricity, their slow spin adds little
+        assert disk == pytest.approx(mass * params["eccentricity"] * omega ** 2 * 1e-6, rel=0.01)
+        # the two disks nearly cancel, so the supports see a couple that grows with their spacing
+        assert report.peak_force[0] < 0.05 * disk.max()
+        assert report.support_loads[0, :, 0] == pytest.approx(report.support_loads[0, :, 1], rel=0.05)
+        assert report.support_loads[0, :, 0] * 28.0 == pytest.approx(
+            np.hypot(*report.shaking_moment[0, :, :2].T), rel=0.05)
+
+        with pytest.raises(ValueError):
+            analyse(params, 3000, supports=(5.0, 5.0))
+
+    def test_balance(self):
+        """The disks cancel statically and leave the couple of their spacing."""
+        from cycloidMath import generate_default_parameters
+        from cycloidDynamics import balance
+        from cycloidMass import mass_properties
+
+        params = generate_default_parameters()
+        result = balance(params)
+        orbit = mass_properties("cycloidalDisk1", params).mass * params["eccentricity"]
+
+        assert result.disk_phase == pytest.approx(180 - (params["tooth_count"] + 1) / params["tooth_count"])
+        assert np.hypot(*result.static) < 0.05 * orbit
+        assert np.hypot(*result.couple) == pytest.approx(orbit * params["disk_height"], rel=0.05)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,140 @@
+"""Unit tests for the cycloidExport DXF/SVG profile writer."""
+
+import pytest
+import io
+import sys
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+# Add parent directory to path to import cycloidExport
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestProfiles:
+    """Test the 2D entities of the plate parts."""
+
+    def test_cycloidal_disk_entities(self):
+        """The disk has its outline, the centre hole and every driver hole."""
+        from cycloidMath import generate_default_parameters
+        from cycloidExport import profile_entities
+
+        params = generate_default_parameters()
+        entities = profile_entities("cycloidalDisk", params)
+
+        assert entities[0][0] == "spline"
+        assert len(entities) == 2 + params["driver_disk_hole_count"]
+        assert entities[1] == ("circle", (params["eccentricity"], 0.0,
+                                          (params["shaft_diameter"] + params["clearance"]) / 2))
+        assert profile_entities("cycloidalDisk", params, splines=False)[0][0] == "polyline"
+
+    def test_pin_disk_has_a_hole_per_roller(self):
+        """The pin disk has one pin hole per roller."""
+        from cycloidMath import generate_default_parameters
+        from cycloidExport import profile_entities
+
+        params = generate_default_parameters()
+
+        assert len(profile_entities("pinDisk", params)) == 2 + params["tooth_count"] + 1
+
+    def test_unknown_profile(self):
+        """Parts that are not plates raise KeyError."""
+        from cycloidMath import generate_default_parameters
+        from cycloidExport import profile_entities
+
+        with pytest.raises(KeyError):
+            profile_entities("eccentricKey", generate_default_parameters())
+
+
+class TestSplines:
+    """Test the closed spline through the profile points."""
+
+    def test_poles_interpolate_points(self):
+        """The periodic spline passes through every point."""
+        from cycloidExport import periodic_spline_poles
+
+        angles = np.linspace(0, 2 * np.pi, 40, endpoint=False)
+        points = np.stack((3 * np.cos(angles), np.sin(2 * angles)), axis=-1)
+        poles = periodic_spline_poles(points)
+
+        assert (np.roll(poles, 1, axis=0) + 4 * poles + np.roll(poles, -1, axis=0)) / 6 == pytest.approx(points)
+
+    def test_beziers_are_a_closed_chain(self):
+        """Each Bezier segment ends where the next one starts."""
+        from cycloidExport import spline_beziers
+
+        angles = np.linspace(0, 2 * np.pi, 12, endpoint=False)
+        points = np.stack((np.cos(angles), np.sin(angles)), axis=-1)
+        beziers = spline_beziers(points)
+
+        assert beziers[:, 0] == pytest.approx(points)
+        assert beziers[:, 3] == pytest.approx(np.roll(beziers[:, 0], -1, axis=0))
+        # a spline through points on a circle stays close to the circle
+        middle = (beziers[:, 0] + 3 * beziers[:, 1] + 3 * beziers[:, 2] + beziers[:, 3]) / 8
+        assert np.hypot(middle[:, 0], middle[:, 1]) == pytest.approx(1.0, abs=2e-3)
+
+
+class TestWriters:
+    """Test the streamed DXF and SVG files."""
+
+    def test_write_profiles(self, tmp_path):
+        """One DXF per plate part with every entity in it."""
+        from cycloidMath import generate_default_parameters
+        from cycloidExport import write_profiles, profile_entities, PROFILE_NAMES
+
+        params = generate_default_parameters()
+        paths = write_profiles(params, str(tmp_path))
+
+        assert [os.path.basename(p) for p in paths] == [f"CycloidalDrive-{n}.dxf" for n in PROFILE_NAMES]
+        for name, path in zip(PROFILE_NAMES, paths):
+            lines = open(path).read().split("\n")
+            kinds = [lines[i + 1] for i in range(0, len(lines) - 1, 2) if lines[i] == "0"]
+            assert kinds[-2:] == ["ENDSEC", "EOF"]
+            assert kinds.count("CIRCLE") + kinds.count("SPLINE") == len(profile_entities(name, params))
+
+    def test_sheet_layout(self):
+        """Parts are packed inside the sheet width without overlapping."""
+        from cycloidMath import generate_default_parameters
+        from cycloidExport import write_sheet, profile_entities, entity_bounds
+
+        params = generate_default_parameters()
+        variants = [dict(params, driver_hole_diameter=6 + i) for i in range(5)]
+        layout = write_sheet(io.StringIO(), iter(variants), 300, fmt="dxf")
+
+        boxes = []
+        for index, name, x, y in layout:
+            xmin, ymin, xmax, ymax = entity_bounds(profile_entities(name, variants[index]))
+            boxes.append((x, y, x + xmax - xmin, y + ymax - ymin))
+        assert len(layout) == 15
+        assert max(b[2] for b in boxes) <= 300
+        for i, a in enumerate(boxes):
+            for b in boxes[i + 1:]:
+                assert a[2] <= b[0] or b[2] <= a[0] or a[3] <= b[1] or b[3] <= a[1]
+
+    def test_svg_view_box_is_patched(self, tmp_path):
+        """The SVG parses and its view box covers the whole sheet."""
+        from cycloidMath import generate_default_parameters
+        from cycloidExport import write_sheet
+
+        params = generate_default_parameters()
+        path = str(tmp_path / "sheet.svg")
+        write_sheet(path, [params, params], 150)
+
+        root = ET.parse(path).getroot()
+        width, height = [float(v) for v in root.get("viewBox").split()[2:]]
+        assert width <= 150
+        assert height > params["Diameter"]
+        assert len(root.findall(".//{http://www.w3.org/2000/svg}path")) == 2
+
+    def test_sheet_too_narrow(self):
+        """A part wider than the sheet raises ValueError."""
+        from cycloidMath import generate_default_parameters
+        from cycloidExport import write_sheet
+
+        with pytest.raises(ValueError, match="sheet"):
+            write_sheet(io.StringIO(), [generate_default_parameters()], 10, fmt="svg")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,212 @@
+"""Tests of cycloidFun.generate_parts against the stub FreeCAD modules.
+
+See freecad_stub: the document is kept in plain python and every
+addObject, addGeometry, addConstraint and recompute is recorded.
+"""
+
+import pytest
+import os
+import sys
+import numpy as np
+
+# Add parent directory to path to import cycloidFun
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Most calls each part of the default gearbox may make.  A change that adds
+# objects or solver round-trips fails here; lower the numbers when a change
+# saves some.
+CALL_BUDGET = {
+    "pinDisk": {"addObject": 23, "addGeometry": 7, "addConstraint": 17, "recompute": 1},
+    "driverDisk": {"addObject": 11, "addGeometry": 3, "addConstraint": 7, "recompute": 1},
+    "inputShaft": {"addObject": 21, "addGeometry": 6, "addConstraint": 16, "recompute": 1},
+    "cycloidalDisk1": {"addObject": 5, "addGeometry": 18, "addConstraint": 32, "recompute": 1},
+    "cycloidalDisk2": {"addObject": 5, "addGeometry": 18, "addConstraint": 32, "recompute": 1},
+    "eccentricKey": {"addObject": 17, "addGeometry": 4, "addConstraint": 12, "recompute": 1},
+    "outputShaft": {"addObject": 15, "addGeometry": 4, "addConstraint": 11, "recompute": 1},
+}
+
+
+def _generate(freecad, parameters, **kwargs):
+    import cycloidFun
+
+    doc = freecad.newDocument("gearbox")
+    fingerprints = cycloidFun.generate_parts(doc, parameters, **kwargs)
+    return doc, fingerprints
+
+
+class TestGenerateParts:
+    """Test a full generation in the stub document."""
+
+    def test_builds_every_part(self, freecad):
+        """Every body is built with valid features and nothing is left outside a body.
+
+        The Tip is the last feature, so the body shape has all of them.
+        """
+        from cycloidMath import PART_NAMES, generate_default_parameters
+        from cycloidDiagnostics import orphaned_objects
+
+        params = generate_default_parameters()
+        doc, fingerprints = _generate(freecad, params)
+
+        assert sorted(fingerprints) == sorted(PART_NAMES)
+        for name in PART_NAMES:
+            body = doc.getObject(name)
+            assert body.TypeId == "PartDesign::Body"
+            features = [o for o in body.Group if o.TypeId.startswith("PartDesign::")]
+            assert body.Tip is features[-1], name
+        assert doc.invalid_objects() == {}
+        assert orphaned_objects(doc) == []
+
+    def test_call_budget(self, freecad):
+        """No part makes more document calls than CALL_BUDGET allows."""
+        from cycloidMath import generate_default_parameters
+
+        doc, _ = _generate(freecad, generate_default_parameters())
+        calls = doc.api_calls()
+
+        over = {(part, operation): (calls[part][operation], limit)
+                for part, budget in CALL_BUDGET.items() for operation, limit in budget.items()
+                if calls[part][operation] > limit}
+        assert over == {}
+        assert set(calls) == set(CALL_BUDGET)
+
+    def test_disk_sketch_matches_outline(self, freecad):
+        """The spline points in the disk sketch are cycloidMath's outline, placed the same way."""
+        from cycloidMath import cycloidal_disk_outline, generate_default_parameters
+
+        params = generate_default_parameters()
+        doc, _ = _generate(freecad, params)
+        sketch = doc.getObject("cycloid001Sketch")
+        splines = [g for g in sketch.Geometry if hasattr(g, "getPoles")]
+
+        assert len(splines) == params["tooth_count"]
+        points = np.array([tuple(v)[:2] for spline in splines for v in spline.getPoles()[:-1]])
+        np.testing.assert_allclose(points, cycloidal_disk_outline(params), atol=1e-9)
+        # center hole and driver holes
+        assert len(sketch.Geometry) - len(splines) == 1 + params["driver_disk_hole_count"]
+
+    def test_only_changed_parts_are_rebuilt(self, freecad):
+        """Unchanged fingerprints make no calls; a Diameter change only rebuilds the pin disk."""
+        import cycloidFun
+        from cycloidMath import generate_default_parameters
+
+        params = generate_default_parameters()
+        doc, fingerprints = _generate(freecad, params)
+        doc.reset_calls()
+        assert cycloidFun.generate_parts(doc, params, built=fingerprints) == fingerprints
+        assert doc.api_calls() == {}
+
+        params["Diameter"] += 5
+        cycloidFun.generate_parts(doc, params, built=fingerprints)
+        assert set(doc.api_calls()) == {"pinDisk"}
+        assert doc.invalid_objects() == {}
+
+    def test_force_recompute_rebuilds_unchanged_parts(self, freecad):
+        """An edit recompute skips unchanged parts; force_Recompute rebuilds all of them."""
+        from cycloidMath import PART_NAMES
+        from freecad_stub import gearbox_object
+
+        doc = freecad.newDocument("gearbox")
+        obj = gearbox_object(doc)
+        obj.Proxy.recompute()
+        doc.reset_calls()
+
+        obj.Proxy.Dirty = True
+        obj.Proxy.recompute()
+        assert doc.api_calls() == {}
+
+        obj.Proxy.force_Recompute()
+        assert set(doc.api_calls()) == set(PART_NAMES)
+        assert doc.invalid_objects() == {}
+        assert not obj.Proxy.Dirty
+
+    def test_change_during_generation_is_built(self, freecad):
+        """A recompute called back during a generation leaves the change for one more run."""
+        from freecad_stub import gearbox_object
+
+        doc = freecad.newDocument("gearbox")
+        obj = gearbox_object(doc)
+        proxy = obj.Proxy
+        scheduled = []
+        proxy.execute = scheduled.append
+
+        def progress(fraction, message):
+            if not scheduled and obj.tooth_count == 11:
+                # what a queued execute does when processEvents runs it
+                obj.tooth_count = 13
+                proxy.Dirty = True
+                proxy.recompute()
+
+        proxy.progress_dialog = lambda: (None, progress, None)
+        proxy.recompute()
+        assert proxy.BuiltParameters.tooth_count == 11
+        assert proxy.Dirty and scheduled == [obj]
+
+        proxy.recompute()
+        assert proxy.BuiltParameters.tooth_count == 13
+        assert not proxy.Dirty and scheduled == [obj]
+
+    def test_instancing_makes_fewer_calls(self, freecad):
+        """With instancing the rollers and the second disk are not sketched again."""
+        from cycloidMath import generate_default_parameters
+
+        params = dict(generate_default_parameters(), tooth_count=15, eccentricity=1.5)
+        plain, _ = _generate(freecad, params)
+        linked, _ = _generate(freecad, params, instancing=True)
+
+        def total(doc, operation):
+            return sum(counts[operation] for counts in doc.api_calls().values())
+
+        assert total(linked, "addGeometry") < total(plain, "addGeometry")
+        assert linked.getObject("cycloidalDisk2").LinkedObject is linked.getObject("cycloidalDisk1")
+        assert linked.getObject("pinRollers").ElementCount == params["tooth_count"] + 1
+        assert linked.invalid_objects() == {}
+
+    def test_cancel_rolls_back(self, freecad):
+        """A generation cancelled part way leaves the document as it was.
+
+        Only the bodies put back are recomputed, not the whole document.
+        """
+        import cycloidFun
+        from cycloidMath import CancellationToken, GenerationCancelled, generate_default_parameters
+
+        params = generate_default_parameters()
+        doc, fingerprints = _generate(freecad, params)
+        doc.UndoMode = 1
+        before = {o.Name: list(getattr(o, "Group", [])) for o in doc.Objects}
+        token = CancellationToken()
+
+        def progress(fraction, message):
+            if fraction > 0.5:
+                token.cancel()
+
+        doc.reset_calls()
+        with pytest.raises(GenerationCancelled):
+            cycloidFun.generate_parts(doc, dict(params, clearance=0.4), progress=progress, cancel=token)
+        assert {o.Name: list(getattr(o, "Group", [])) for o in doc.Objects} == before
+        recomputed = {obj.owner for obj in doc.recomputed}
+        assert "pinDisk" in recomputed and "outputShaft" not in recomputed
+
+    def test_cancel_rolls_back_without_undo(self, freecad):
+        """Undo is turned on for the call, so a document without it is rolled back too."""
+        import cycloidFun
+        from cycloidMath import CancellationToken, GenerationCancelled, generate_default_parameters
+
+        params = generate_default_parameters()
+        doc, fingerprints = _generate(freecad, params)
+        assert doc.UndoMode == 0
+        before = {o.Name: list(getattr(o, "Group", [])) for o in doc.Objects}
+        token = CancellationToken()
+
+        def progress(fraction, message):
+            if fraction > 0.5:
+                token.cancel()
+
+        with pytest.raises(GenerationCancelled):
+            cycloidFun.generate_parts(doc, dict(params, clearance=0.4), progress=progress, cancel=token)
+        assert {o.Name: list(getattr(o, "Group", [])) for o in doc.Objects} == before
+        assert doc.UndoMode == 0 and not doc.HasPendingTransaction
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,142 @@
+"""Unit tests for the randomised stress runner."""
+
+import pytest
+import json
+import logging
+import os
+import sys
+import time
+import numpy as np
+
+# Add parent directory to path to import cycloidFuzz
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cycloidMath import validate_parameters  # noqa: E402
+
+
+# Stages for the failure tests; module level so spawn can pickle them
+def _sleep_stage(parameters):
+    time.sleep(30)
+
+
+def _flood_stage(parameters):
+    for i in range(1000):
+        logging.getLogger("cycloidMath").warning(f"clamped point {i}")
+
+
+def _fussy_stage(parameters):
+    if parameters["tooth_count"] > 16:
+        raise ValueError("too many teeth")
+
+
+def _hungry_stage(parameters):
+    parameters["ballast"] = np.ones(256 << 20, dtype=np.uint8)
+
+
+QUICK = (("validate", validate_parameters),)
+
+
+class TestSampling:
+    """Test the random parameter sets."""
+
+    def test_sets_are_valid_and_repeatable(self):
+        """Every set passes validate_parameters and a seed gives the same sets."""
+        from cycloidFuzz import sample_parameters
+
+        first = sample_parameters(20, np.random.default_rng(3))
+        second = sample_parameters(20, np.random.default_rng(3))
+
+        assert len(first) == 20
+        assert first == second
+        for parameters in first:
+            validate_parameters(dict(parameters))
+        assert len({p["Diameter"] for p in first}) > 1
+
+
+class TestRunCases:
+    """Test the budgets of run_cases."""
+
+    def test_default_parameters_pass_every_stage(self):
+        """The defaults run the whole pipeline in a worker."""
+        from cycloidFuzz import PIPELINE, run_case
+        from cycloidMath import generate_default_parameters
+
+        result = run_case(generate_default_parameters(), time_budget=60.0)
+
+        assert result.outcome == "ok", result.detail
+        assert list(result.seconds) == [name for name, _ in PIPELINE]
+
+    def test_budget_failures(self):
+        """Timeouts are killed, floods and memory hogs stopped, all named by stage."""
+        from cycloidFuzz import run_cases
+        from cycloidMath import generate_default_parameters
+
+        parameters = generate_default_parameters()
+        start = time.monotonic()
+        results = [run_cases([parameters], time_budget=0.5, memory_budget=64 << 20, workers=1,
+                             stages=QUICK + ((name, stage),))[0]
+                   for name, stage in (("sleep", _sleep_stage), ("flood", _flood_stage),
+                                       ("hungry", _hungry_stage))]
+
+        assert time.monotonic() - start < 20.0
+        assert [(r.outcome, r.stage) for r in results] == [
+            ("timeout", "sleep"), ("flood", "flood"), ("memory", "hungry")]
+        assert results[1].log_records == 101
+
+    def test_earlier_spike_is_not_charged(self):
+        """Memory freed before an in-process run does not count against its budget."""
+        from cycloidFuzz import run_pipeline
+        from cycloidMath import generate_default_parameters
+
+        ballast = np.ones(300 << 20, dtype=np.uint8)
+        del ballast
+        result = run_pipeline(generate_default_parameters(), memory_budget=64 << 20,
+                              stages=(("noop", lambda parameters: None),))
+
+        assert result.outcome == "ok", result.detail
+        assert result.memory < 64 << 20
+
+    def test_generate_stage_with_stub(self, freecad):
+        """With FreeCAD importable the generate stage builds the parts."""
+        from cycloidFuzz import run_pipeline
+        from cycloidMath import generate_default_parameters
+
+        result = run_pipeline(generate_default_parameters(), generate=True, stages=QUICK)
+
+        assert result.outcome == "ok", result.detail
+        assert list(result.seconds) == ["validate", "generate"]
+
+
+class TestMinimize:
+    """Test minimizing failures into case files."""
+
+    def test_failure_is_minimized_and_written(self, tmp_path):
+        """The teeth stay just over the limit and little else is left away from the defaults.
+
+        Seventeen teeth with the default sizes undercut the disk, so one
+        more parameter has to keep its drawn value to stay valid.
+        """
+        from cycloidFuzz import fuzz, load_case, run_case
+        from cycloidMath import generate_default_parameters
+
+        stages = QUICK + (("fussy", _fussy_stage),)
+        report = fuzz(count=6, seed=2, time_budget=30.0, workers=1, output_dir=str(tmp_path),
+                      stages=stages)
+
+        assert report.failures and len(report.files) == len(report.failures)
+        defaults = generate_default_parameters()
+        for path in report.files:
+            with open(path) as stream:
+                record = json.load(stream)
+            assert record["outcome"] == "error" and record["stage"] == "fussy"
+            assert record["original"]["tooth_count"] > 16
+            parameters = load_case(path)
+            changed = {k for k in parameters if parameters[k] != defaults.get(k)}
+            drawn = {k for k in parameters if record["original"][k] != defaults.get(k)}
+            assert "tooth_count" in changed and len(changed) <= 2 < len(drawn)
+            assert parameters["tooth_count"] == 17
+            assert run_case(parameters, stages=stages).outcome == "error"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,66 @@
+"""Unit tests for the golden geometry fingerprints."""
+
+import pytest
+import copy
+import os
+import sys
+import numpy as np
+
+# Add parent directory to path to import cycloidGolden
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+
+class TestGolden:
+    """Test the part geometry against the stored golden fingerprints."""
+
+    def test_parts_match_golden(self):
+        """Every case matches its golden file; update with python cycloidGolden.py --update."""
+        from cycloidGolden import GOLDEN_CASES, check_golden
+
+        problems = check_golden(GOLDEN_DIR, workers=2)
+
+        assert sorted(problems) == sorted(GOLDEN_CASES)
+        assert {case: diffs for case, diffs in problems.items() if diffs} == {}
+
+
+class TestFingerprints:
+    """Test the fingerprints and their comparison."""
+
+    def test_mesh_fingerprint_of_a_box(self):
+        """A 2 x 3 x 4 box made by cycloidStl.extrude."""
+        from cycloidGolden import mesh_fingerprint
+        from cycloidStl import extrude
+
+        square = np.array(((0.0, 0.0), (2.0, 0.0), (2.0, 3.0), (0.0, 3.0)))
+        fingerprint = mesh_fingerprint(extrude([square], 1.0, 5.0))
+
+        assert fingerprint["volume"] == pytest.approx(24.0)
+        assert fingerprint["area"] == pytest.approx(2 * (6 + 8 + 12))
+        assert fingerprint["bbox"] == pytest.approx([0, 0, 1, 2, 3, 5])
+        assert (fingerprint["vertices"], fingerprint["faces"]) == (8, 12)
+
+    def test_compare_finds_changes(self):
+        """A small profile change is caught by the hash of the disks only, and tolerances apply."""
+        from cycloidGolden import case_parameters, compare, fingerprint_case, fingerprint_part
+
+        golden = fingerprint_case("default")
+        assert compare(golden, copy.deepcopy(golden)) == []
+
+        changed = copy.deepcopy(golden)
+        params = dict(case_parameters("default"), pressure_angle_offset=0.1001)
+        for name in ("cycloidalDisk1", "cycloidalDisk2"):
+            changed["parts"][name] = fingerprint_part(name, params)
+        problems = compare(changed, golden)
+        assert {line.split(":")[0] for line in problems} == {"cycloidalDisk1", "cycloidalDisk2"}
+        assert any("profile" in line for line in problems)
+        assert any("volume" in line for line in problems)
+        assert not any("volume" in line for line in compare(changed, golden, {"volume": 1e-3, "area": 1e-3}))
+
+        del changed["parts"]["pinDisk"]
+        assert "pinDisk: only in golden" in compare(changed, golden)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,113 @@
+"""Unit tests for the cycloidMass analytic mass properties."""
+
+import pytest
+import math
+import os
+import sys
+
+import numpy as np
+
+# Add parent directory to path to import cycloidMass
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def fine_mesh(monkeypatch):
+    import cycloidStl
+
+    monkeypatch.setattr(cycloidStl, "CIRCLE_TOLERANCE", 0.001)
+    monkeypatch.setattr(cycloidStl, "MAX_CIRCLE_SEGMENTS", 2048)
+
+
+def mesh_properties(triangles):
+    """Volume, centroid and second moments of a closed mesh from its tetrahedra."""
+    a, b, c = (triangles[:, i].astype(float) for i in range(3))
+    det = np.einsum("ij,ij->i", a, np.cross(b, c))
+    volume = det.sum() / 6
+    center = (det[:, None] * (a + b + c)).sum(0) / 24 / volume
+    s = a + b + c
+    second = sum(np.einsum("n,ni,nj->ij", det, v, v) for v in (s, a, b, c)) / 120
+    return volume, center, second
+
+
+class TestPlaneMoments:
+    """Test the closed form plane integrals."""
+
+    def test_segment_and_lens(self):
+        """Half a circle, and the lens of two circles against its known area."""
+        from cycloidMass import segment_moments, lens_moments
+
+        half = segment_moments(0, 0, 2.0, 0.0, 0.0)
+        assert half[0] == pytest.approx(2 * math.pi)
+        assert half[1] == pytest.approx(2 / 3 * 8)
+        assert half[3] == pytest.approx(half[4]) == pytest.approx(math.pi * 16 / 8)
+
+        r, d = 1.0, 1.0
+        lens = lens_moments(0, 0, r, d, 0, r)
+        assert lens[0] == pytest.approx(2 * r * r * math.acos(d / 2 / r) - d / 2 * math.sqrt(4 * r * r - d * d))
+        assert lens[1] / lens[0] == pytest.approx(0.5)
+        assert lens_moments(0, 0, 1.0, 3.0, 0, 1.0)[0] == 0.0
+        assert lens_moments(0, 0, 3.0, 0.5, 0, 1.0) == pytest.approx(lens_moments(0.5, 0, 1.0, 0.5, 0, 1.0))
+
+    def test_polygon_matches_circle(self):
+        """A fine polygon has the moments of its circle."""
+        from cycloidMass import polygon_moments, circle_moments
+
+        angles = np.linspace(0, 2 * math.pi, 20000, endpoint=False)
+        polygon = np.stack((1.5 + 2 * np.cos(angles), -0.5 + 2 * np.sin(angles)), axis=-1)
+
+        assert polygon_moments(polygon) == pytest.approx(circle_moments(1.5, -0.5, 2.0), rel=1e-6)
+
+
+class TestMassProperties:
+    """Test the parts against the numpy meshes."""
+
+    @pytest.mark.parametrize("name", ["pinDisk", "driverDisk", "inputShaft", "cycloidalDisk1",
+                                      "eccentricKey", "outputShaft"])
+    def test_parts_match_meshes(self, name, monkeypatch):
+        """Volume, centre of mass and inertia agree with a fine mesh of the part."""
+        from cycloidMath import generate_default_parameters
+        from cycloidMass import mass_properties
+        from cycloidStl import part_triangles
+
+        fine_mesh(monkeypatch)
+        params = generate_default_parameters()
+        # keep the driver holes inside the disk outline
+        params["driver_circle_diameter"] = 40.0
+        volume, center, second = mesh_properties(part_triangles(name, params))
+        props = mass_properties(name, params, density=1000.0)
+        second = second - volume * np.outer(center, center)
+        inertia = np.trace(second) * np.eye(3) - second
+
+        assert props.volume == pytest.approx(volume, rel=2e-4)
+        assert props.mass == pytest.approx(props.volume)
+        assert props.center == pytest.approx(center, abs=2e-3)
+        assert props.inertia == pytest.approx(inertia, rel=1e-3, abs=props.inertia.max() * 1e-5)
+
+    def test_batch_matches_single(self):
+        """A batch mixing tooth and hole counts gives the single results."""
+        from cycloidMath import generate_default_parameters
+        from cycloidMass import mass_properties
+
+        params = generate_default_parameters()
+        batch = [dict(params, tooth_count=9, driver_disk_hole_count=4),
+                 params,
+                 dict(params, eccentricity=1.5, driver_circle_diameter=40.0)]
+        for name in ("pinDisk", "cycloidalDisk1", "outputShaft", ("cycloidalDisk1", "cycloidalDisk2")):
+            together = mass_properties(name, batch)
+            for i, single in enumerate(batch):
+                alone = mass_properties(name, single)
+                assert together.mass[i] == pytest.approx(alone.mass)
+                assert together.inertia[i] == pytest.approx(alone.inertia)
+
+    def test_disks_balance(self):
+        """The two disks together have their centre of mass on the axis."""
+        from cycloidMath import generate_default_parameters
+        from cycloidMass import mass_properties
+
+        disks = mass_properties(("cycloidalDisk1", "cycloidalDisk2"), generate_default_parameters())
+
+        assert disks.center[:2] == pytest.approx([0, 0], abs=0.05)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
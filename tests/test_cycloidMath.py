@@ -0,0 +1,492 @@
+"""Unit tests for the FreeCAD-free helpers added to cycloidMath.
+
+The scalar formulas are covered in test_cycloidFun.py; these tests cover
+the batch and array helpers that only need numpy.
+"""
+
+import pytest
+import sys
+import os
+
+import numpy as np
+
+# Add parent directory to path to import cycloidMath
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _default_table(rows):
+    """Columnar table holding rows copies of the default parameters."""
+    from cycloidMath import generate_default_parameters
+
+    params = generate_default_parameters()
+    return {name: np.full(rows, value) for name, value in params.items()}
+
+
+class TestParameterTableValidation:
+    """Test validate_parameter_table against validate_parameters."""
+
+    def test_default_rows_are_valid(self):
+        """Default parameters give an all-zero mask."""
+        from cycloidMath import validate_parameter_table, VALIDATION_RULES
+
+        mask, counts = validate_parameter_table(_default_table(5))
+
+        assert mask.dtype == np.uint32
+        assert (mask == 0).all()
+        assert set(counts) == {name for name, _ in VALIDATION_RULES}
+        assert sum(counts.values()) == 0
+
+    def test_every_violation_is_reported(self):
+        """A row breaking several rules gets every bit, not just the first."""
+        from cycloidMath import validate_parameter_table, describe_validation_mask
+
+        table = _default_table(3)
+        table["tooth_count"][1] = 2
+        table["eccentricity"][1] = 0.0
+        table["pressure_angle_limit"][2] = 90.0
+
+        mask, counts = validate_parameter_table(table)
+
+        assert mask[0] == 0
+        messages = describe_validation_mask(mask[1])
+        assert any("tooth_count" in m for m in messages)
+        assert any("eccentricity" in m for m in messages)
+        assert counts["pressure_angle_limit_max"] == 1
+        assert counts["tooth_count_min"] == 1
+
+    def test_matches_dict_validation(self):
+        """Rows flagged by the table validator are exactly those the dict API rejects."""
+        from cycloidMath import (validate_parameter_table, validate_parameters,
+                                 generate_default_parameters, ParameterValidationError)
+
+        rng = np.random.default_rng(3)
+        rows = 200
+        table = _default_table(rows)
+        table["tooth_count"] = rng.integers(0, 60, rows)
+        table["eccentricity"] = rng.uniform(-1, 5, rows)
+        table["Diameter"] = rng.uniform(60, 120, rows)
+        table["pressure_angle_limit"] = rng.uniform(0, 100, rows)
+
+        mask, _ = validate_parameter_table(table)
+
+        for i in range(rows):
+            params = generate_default_parameters()
+            params.update({k: v[i].item() for k, v in table.items()})
+            try:
+                validate_parameters(params)
+                valid = True
+            except ParameterValidationError:
+                valid = False
+            assert valid == (mask[i] == 0)
+
+    def test_structured_array_and_missing_columns(self):
+        """Structured arrays work and missing columns count as 0."""
+        from cycloidMath import validate_parameter_table
+
+        table = np.zeros(4, dtype=[("tooth_count", "i4"), ("eccentricity", "f8")])
+        table["tooth_count"] = 11
+        table["eccentricity"] = 2.0
+
+        mask, counts = validate_parameter_table(table)
+
+        assert counts["tooth_count_min"] == 0
+        assert counts["eccentricity_min"] == 0
+        assert counts["heights"] == 4
+        assert (mask != 0).all()
+
+    def test_nan_and_fractional_tooth_count(self):
+        """NaN values and fractional tooth counts are violations."""
+        from cycloidMath import validate_parameter_table
+
+        table = _default_table(2)
+        table["tooth_count"] = np.array([11.5, 11.0])
+        table["eccentricity"] = np.array([2.0, np.nan])
+
+        mask, counts = validate_parameter_table(table)
+
+        assert counts["tooth_count_min"] == 1
+        assert counts["eccentricity_min"] == 1
+
+
+class TestProfilePipeline:
+    """Test the cached profile stages."""
+
+    def test_profile_matches_scalar_path(self):
+        """The staged profile is the calc_x/calc_y/check_limit profile."""
+        from cycloidMath import (generate_default_parameters, ProfilePipeline, calc_x, calc_y,
+                                 check_limit)
+
+        params = generate_default_parameters()
+        profile = ProfilePipeline().profile(params)
+        p = params["roller_circle_diameter"] / 2.0 / params["tooth_count"]
+        q = 2 * np.pi / params["line_segment_count"]
+        for i in (0, 7, params["line_segment_count"]):
+            a = q * i / params["tooth_count"]
+            x = calc_x(p, params["roller_diameter"], params["eccentricity"], params["tooth_count"], a)
+            y = calc_y(p, params["roller_diameter"], params["eccentricity"], params["tooth_count"], a)
+            x, y = check_limit(x, y, params["max_rad"], params["min_rad"], params["pressure_angle_offset"])
+            assert profile[i] == pytest.approx((x - params["eccentricity"], y))
+
+    def test_offset_change_skips_sampling(self):
+        """Changing pressure_angle_offset only reruns the truncation."""
+        from cycloidMath import generate_default_parameters, ProfilePipeline, cycloidal_disk_profile
+
+        params = generate_default_parameters()
+        pipeline = ProfilePipeline()
+        pipeline.profile(params)
+        pipeline.profile(params)
+        params["pressure_angle_offset"] = 0.3
+        profile = pipeline.profile(params)
+
+        assert pipeline.computed == {"curve": 1, "profile": 2}
+        assert profile == pytest.approx(cycloidal_disk_profile(params))
+
+    def test_limit_change_skips_sampling(self):
+        """Changing pressure_angle_limit recomputes the radii but not the curve."""
+        from cycloidMath import generate_default_parameters, ProfilePipeline
+
+        params = generate_default_parameters()
+        del params["min_rad"], params["max_rad"]
+        pipeline = ProfilePipeline()
+        pipeline.profile(params)
+        params["pressure_angle_limit"] = 40.0
+        pipeline.profile(params)
+        params["eccentricity"] = 2.1
+        pipeline.profile(params)
+
+        assert pipeline.computed == {"radii": 3, "curve": 2, "profile": 3}
+
+    def test_cached_arrays_are_read_only(self):
+        """Callers cannot change a cached stage by accident."""
+        from cycloidMath import generate_default_parameters, ProfilePipeline
+
+        profile = ProfilePipeline().profile(generate_default_parameters())
+
+        with pytest.raises(ValueError):
+            profile[0, 0] = 1.0
+
+
+class TestPartFingerprints:
+    """Test the per-part fingerprints and the packed geometry state."""
+
+    def test_fingerprint_ignores_number_type(self):
+        """5 and 5.0 give the same fingerprint."""
+        from cycloidMath import generate_default_parameters, parameter_fingerprint
+
+        params = generate_default_parameters()
+        other = dict(params, disk_height=int(params["disk_height"]))
+
+        assert parameter_fingerprint(params) == parameter_fingerprint(other)
+
+    def test_only_dependent_parts_change(self):
+        """Changing the key size only touches the parts with a key."""
+        from cycloidMath import generate_default_parameters, part_fingerprint, PART_NAMES
+
+        params = generate_default_parameters()
+        before = {name: part_fingerprint(name, params) for name in PART_NAMES}
+        params["key_diameter"] += 1
+        changed = [name for name in PART_NAMES if part_fingerprint(name, params) != before[name]]
+
+        assert changed == ["inputShaft", "outputShaft"]
+
+    def test_offset_change_only_touches_disks(self):
+        """pressure_angle_offset only shapes the cycloidal disks."""
+        from cycloidMath import generate_default_parameters, part_fingerprint, PART_NAMES
+
+        params = generate_default_parameters()
+        before = {name: part_fingerprint(name, params) for name in PART_NAMES}
+        params["pressure_angle_offset"] = 0.2
+        changed = [name for name in PART_NAMES if part_fingerprint(name, params) != before[name]]
+
+        assert changed == ["cycloidalDisk1", "cycloidalDisk2"]
+
+    def test_geometry_state_round_trip(self):
+        """Packed arrays come back unchanged, garbage raises ValueError."""
+        from cycloidMath import (generate_default_parameters, cycloidal_disk_profile,
+                                 pack_geometry_state, unpack_geometry_state)
+
+        profile = cycloidal_disk_profile(generate_default_parameters())
+        blob = pack_geometry_state({"profile": profile, "part_names": np.array(["pinDisk"])})
+        arrays = unpack_geometry_state(blob)
+
+        assert blob.isascii()
+        assert np.array_equal(arrays["profile"], profile)
+        assert arrays["part_names"].tolist() == ["pinDisk"]
+        with pytest.raises(ValueError):
+            unpack_geometry_state("not a blob")
+
+
+class TestGearBoxParameters:
+    """Test the immutable parameter object."""
+
+    def test_reads_like_the_dictionary(self):
+        """Defaults, derived radii and the Mapping interface match the dict."""
+        from cycloidMath import GearBoxParameters, generate_default_parameters, validate_parameters
+
+        params = GearBoxParameters()
+        expected = generate_default_parameters()
+
+        assert params == expected
+        assert params.to_dict() == expected
+        assert params["min_rad"] == expected["min_rad"]
+        assert "max_rad" in params
+        assert params.p == pytest.approx(expected["roller_circle_diameter"] / 2 / expected["tooth_count"])
+        validate_parameters(params)
+
+    def test_int_fields_are_not_truncated(self):
+        """Whole numbers become ints, fractions and bools are refused."""
+        from cycloidMath import GearBoxParameters, ParameterValidationError
+        from cycloidStore import design_row
+
+        params = GearBoxParameters(tooth_count=13.0, driver_disk_hole_count=np.int64(6), Diameter=95)
+        assert (params.tooth_count, params.driver_disk_hole_count, params.Diameter) == (13, 6, 95.0)
+        assert type(params.tooth_count) is int
+        for values in ({"tooth_count": 11.7}, {"tooth_count": True}, {"Diameter": False},
+                       {"line_segment_count": "many"}, {"tooth_count": float("nan")}):
+            with pytest.raises(ParameterValidationError):
+                GearBoxParameters(**values)
+        with pytest.raises(ParameterValidationError):
+            design_row({"tooth_count": 11.7})
+
+    def test_immutable(self):
+        """Fields cannot be set, replace returns a changed copy."""
+        from cycloidMath import GearBoxParameters
+
+        params = GearBoxParameters()
+        with pytest.raises(AttributeError):
+            params.tooth_count = 13
+        with pytest.raises(TypeError):
+            params["tooth_count"] = 13
+        changed = params.replace(tooth_count=13)
+
+        assert params.tooth_count == 11
+        assert changed.tooth_count == 13
+        assert changed != params
+
+    def test_types_and_unknown_fields(self):
+        """Values are converted to the field type, unknown names raise TypeError."""
+        from cycloidMath import GearBoxParameters
+
+        params = GearBoxParameters(tooth_count=13.0, Diameter=100)
+
+        assert type(params.tooth_count) is int
+        assert type(params.Diameter) is float
+        with pytest.raises(TypeError, match="toothcount"):
+            GearBoxParameters(toothcount=13)
+
+    def test_hash_and_radii_are_computed_once(self, monkeypatch):
+        """Equal parameters hash equal; the limit circles are found only once."""
+        import pickle
+        import cycloidMath
+        from cycloidMath import GearBoxParameters
+
+        params = GearBoxParameters(Diameter=100)
+        calls = []
+        original = cycloidMath.calculate_min_max_radii
+        monkeypatch.setattr(cycloidMath, "calculate_min_max_radii",
+                            lambda parameters: calls.append(1) or original(parameters))
+        params.min_rad, params.max_rad, params["min_rad"]
+
+        assert len(calls) == 1
+        assert hash(params) == hash(GearBoxParameters(Diameter=100.0))
+        assert len({params, GearBoxParameters(Diameter=100.0)}) == 1
+        assert pickle.loads(pickle.dumps(params)) == params
+        assert params.fingerprint == GearBoxParameters(Diameter=100.0).fingerprint
+
+    def test_feature_python_properties(self):
+        """Values round trip through objects with Quantity style properties."""
+        from types import SimpleNamespace
+        from cycloidMath import GearBoxParameters
+
+        class Quantity:
+            def __init__(self, value):
+                self.Value = value
+
+            def __eq__(self, other):
+                return self.Value == other
+
+        params = GearBoxParameters(eccentricity=2.5)
+        obj = SimpleNamespace(**{name: (value if kind is int else Quantity(value))
+                                 for (name, kind), value in zip(params.FIELDS, GearBoxParameters().values())})
+
+        assert GearBoxParameters.from_object(obj) == GearBoxParameters()
+        assert params.apply_to_object(obj) == ["eccentricity"]
+        assert obj.eccentricity == 2.5
+
+
+class TestCancellationToken:
+    """Test the token generate_parts checks for cancellation."""
+
+    def test_cancel_raises_on_check(self):
+        """check passes until cancel, then raises GenerationCancelled."""
+        from cycloidMath import CancellationToken, GenerationCancelled
+
+        token = CancellationToken()
+        token.check()
+        token.cancel()
+
+        assert token.cancelled
+        with pytest.raises(GenerationCancelled):
+            token.check()
+
+    def test_poll_is_rate_limited(self):
+        """poll is called at most once per poll_interval and cancels once it returns True."""
+        from cycloidMath import CancellationToken, GenerationCancelled
+
+        calls = []
+        token = CancellationToken(poll=lambda: calls.append(1) or len(calls) > 1, poll_interval=60)
+        for _ in range(100):
+            token.check()
+        assert len(calls) == 1
+
+        token.poll_interval = 0
+        with pytest.raises(GenerationCancelled):
+            token.check()
+        assert len(calls) == 2
+
+
+class TestProfileChecks:
+    """Test the undercut and self-intersection checks."""
+
+    def test_curvature_radius_of_roller_path(self):
+        """The smallest convex radius matches the sampled path, and the lobe tip's closed form."""
+        from cycloidMath import pin_path_curvature_radius
+
+        radius, e, n = 40.0, 2.0, 11
+        t = np.linspace(0, 2 * np.pi, 200001)
+        path = np.stack((radius * np.cos(t) + e * np.cos((n + 1) * t),
+                         radius * np.sin(t) + e * np.sin((n + 1) * t)), axis=-1)
+        first, second = np.gradient(path, t, axis=0), np.gradient(np.gradient(path, t, axis=0), t, axis=0)
+        curvature = (first[:, 0] * second[:, 1] - first[:, 1] * second[:, 0]) / np.hypot(*first.T) ** 3
+
+        assert pin_path_curvature_radius(radius, e, n) == pytest.approx(1 / curvature.max(), rel=1e-4)
+        # at a lobe tip the path turns on (R + e (n + 1))^2 / (R + e (n + 1)^2)
+        tip = (radius + e * (n + 1)) ** 2 / (radius + e * (n + 1) ** 2)
+        assert pin_path_curvature_radius(radius, 0.5, n) == pytest.approx(
+            (radius + 0.5 * (n + 1)) ** 2 / (radius + 0.5 * (n + 1) ** 2))
+        assert pin_path_curvature_radius(radius, e, n) <= tip
+        assert pin_path_curvature_radius([radius, radius], [e, 0.5], n).shape == (2,)
+
+    def test_undercut_and_loop_are_rejected(self):
+        """validate_parameters and the table validator agree on undercut and looping profiles."""
+        from cycloidMath import (generate_default_parameters, validate_parameters, validate_parameter_table,
+                                 describe_validation_mask, ParameterValidationError)
+
+        undercut = dict(generate_default_parameters(), roller_diameter=30.0)
+        looped = dict(generate_default_parameters(), eccentricity=3.5)
+        with pytest.raises(ParameterValidationError, match="undercut"):
+            validate_parameters(undercut)
+        with pytest.raises(ParameterValidationError, match="loops"):
+            validate_parameters(looped)
+
+        table = _default_table(3)
+        table["roller_diameter"][1] = 30.0
+        table["eccentricity"][2] = 3.5
+        mask, _ = validate_parameter_table(table)
+        assert mask[0] == 0
+        assert describe_validation_mask(mask[1]) == [
+            "roller_diameter / 2 must be < the smallest radius of curvature of the profile"]
+        assert "eccentricity * (tooth_count + 1) must be < roller_circle_diameter / 2" in describe_validation_mask(mask[2])
+
+    def test_self_intersections_match_brute_force(self):
+        """The spatial hash finds exactly the crossings a test of every pair finds."""
+        from cycloidMath import polyline_self_intersections
+
+        def side(a, b, p):
+            return (b[0] - a[0]) * (p[1] - a[1]) - (b[1] - a[1]) * (p[0] - a[0])
+
+        rng = np.random.default_rng(0)
+        for closed in (True, False):
+            points = rng.uniform(0, 10, (40, 2))
+            segments = len(points) if closed else len(points) - 1
+            expected = set()
+            for i in range(segments):
+                for j in range(i + 2, segments):
+                    if closed and i == 0 and j == segments - 1:
+                        continue
+                    a1, b1 = points[i], points[(i + 1) % len(points)]
+                    a2, b2 = points[j], points[(j + 1) % len(points)]
+                    if side(a1, b1, a2) * side(a1, b1, b2) < 0 and side(a2, b2, a1) * side(a2, b2, b1) < 0:
+                        expected.add((i, j))
+
+            assert set(map(tuple, polyline_self_intersections(points, closed))) == expected
+
+        square = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=float)
+        assert len(polyline_self_intersections(square)) == 0
+        assert polyline_self_intersections(square[[0, 1, 3, 2]]).tolist() == [[1, 3]]
+
+    def test_validate_profile(self):
+        """The default outline is clean, an undercut one crosses itself."""
+        from cycloidMath import (generate_default_parameters, validate_profile, calculate_min_max_radii,
+                                 ParameterValidationError)
+
+        params = generate_default_parameters()
+        params["min_rad"], params["max_rad"] = calculate_min_max_radii(params)
+        validate_profile(params)
+
+        undercut = dict(params, roller_diameter=30.0)
+        undercut["min_rad"], undercut["max_rad"] = calculate_min_max_radii(undercut)
+        with pytest.raises(ParameterValidationError, match="crosses itself"):
+            validate_profile(undercut)
+
+
+
+class TestFeasibility:
+    """Test the cross-part wall thickness checks."""
+
+    def test_defaults_overlap_only_at_the_disk_edge(self):
+        """The default driver holes break through the disk edge, by their distance to the outline."""
+        from cycloidMath import check_feasibility, cycloidal_disk_outline, generate_default_parameters
+
+        params = generate_default_parameters()
+        violations = check_feasibility(params)
+        assert [v.name for v in violations] == ["disk_hole_edge"]
+        assert "overlap" in violations[0].message
+
+        outline = cycloidal_disk_outline(params)
+        e = params["eccentricity"]
+        angles = np.arange(params["driver_disk_hole_count"]) * 2 * np.pi / params["driver_disk_hole_count"]
+        radius = params["driver_circle_diameter"] / 2
+        centers = np.stack((e + radius * np.cos(angles), radius * np.sin(angles)), axis=-1)
+        distance = np.hypot(*(outline[None] - centers[:, None]).transpose(2, 0, 1)).min()
+        wall = distance - (params["driver_hole_diameter"] / 2 + e)
+        # the margin is conservative by at most the pressure angle offset
+        assert wall - params["pressure_angle_offset"] <= violations[0].margin <= wall
+
+    def test_min_wall(self):
+        """Raising the minimum wall reports the thin walls too, and min_rad is worked out when missing."""
+        from cycloidMath import check_feasibility, feasibility_margins, generate_default_parameters
+
+        params = generate_default_parameters()
+        margins = feasibility_margins(params)
+        assert float(margins["input_pins_center"]) == pytest.approx(0.25)
+        names = [v.name for v in check_feasibility(params, min_wall=2.0)]
+        assert names == [name for name, margin in margins.items() if margin < 2.0]
+        assert "roller_recess" in names and "input_pins_center" in names
+
+        del params["min_rad"], params["max_rad"]
+        assert [v.name for v in check_feasibility(params, min_wall=2.0)] == names
+
+    def test_table_matches_dict(self):
+        """feasibility_table flags the same checks as check_feasibility row by row."""
+        from cycloidMath import FEASIBILITY_CHECKS, calculate_min_max_radii, check_feasibility, feasibility_table
+
+        table = _default_table(12)
+        rng = np.random.default_rng(3)
+        table["driver_disk_hole_count"] = rng.integers(3, 10, 12)
+        table["driver_hole_diameter"] = rng.uniform(4, 16, 12)
+        table["tooth_count"] = rng.integers(8, 20, 12)
+        table["roller_diameter"] = rng.uniform(6, 12, 12)
+        rows = [{name: column[i].item() for name, column in table.items()} for i in range(12)]
+        for row in rows:
+            row["min_rad"], row["max_rad"] = calculate_min_max_radii(row)
+        table["min_rad"] = np.array([row["min_rad"] for row in rows])
+
+        mask, counts = feasibility_table(table, min_wall=1.0)
+        assert sum(counts.values()) > 0
+        for row, bits in zip(rows, mask):
+            expected = [name for bit, (name, _) in enumerate(FEASIBILITY_CHECKS) if int(bits) >> bit & 1]
+            assert [v.name for v in check_feasibility(row, min_wall=1.0)] == expected
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,135 @@
+"""Unit tests for the cycloidOptimize design-space search.
+
+These only need numpy; the optimizer never imports FreeCAD.
+"""
+
+import pytest
+import logging
+import sys
+import os
+
+# Add parent directory to path to import cycloidOptimize
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestContactGeometry:
+    """Test the pin contact model the objectives are built on."""
+
+    def test_default_design_has_loaded_pins(self):
+        """The default gearbox carries load on at least one pin."""
+        from cycloidMath import generate_default_parameters, pin_contact_geometry
+
+        params = generate_default_parameters()
+        geometry = pin_contact_geometry(params)
+
+        assert len(geometry["lever_arm"]) == params["tooth_count"] + 1
+        assert geometry["loaded"].any()
+        assert (geometry["pressure_angle"] >= 0).all()
+        assert (geometry["pressure_angle"] <= 90).all()
+
+    def test_lever_arm_bounded_by_pitch_radius(self):
+        """No lever arm can exceed the disk pitch radius tooth_count * e."""
+        from cycloidMath import generate_default_parameters, pin_contact_geometry
+
+        params = generate_default_parameters()
+        geometry = pin_contact_geometry(params)
+
+        limit = params["tooth_count"] * params["eccentricity"]
+        assert abs(geometry["lever_arm"]).max() <= limit + 1e-9
+
+    def test_torque_scales_with_disk_height(self):
+        """Doubling the disk height doubles the torque estimate."""
+        from cycloidMath import generate_default_parameters, estimate_torque_capacity
+
+        params = generate_default_parameters()
+        torque = estimate_torque_capacity(params)
+        params["disk_height"] *= 2
+
+        assert torque > 0
+        assert estimate_torque_capacity(params) == pytest.approx(2 * torque)
+
+
+class TestOptimize:
+    """Test the optimizer search loop."""
+
+    def test_evaluate_rejects_invalid_design(self):
+        """Candidates failing validate_parameters are infeasible."""
+        from cycloidMath import generate_default_parameters
+        from cycloidOptimize import evaluate_design
+
+        params = generate_default_parameters()
+        params["tooth_count"] = 2
+
+        assert evaluate_design(params) is None
+
+    def test_evaluate_rejects_rollers_outside_diameter(self):
+        """Rollers poking out of the outer Diameter are infeasible."""
+        from cycloidMath import generate_default_parameters
+        from cycloidOptimize import evaluate_design
+
+        params = generate_default_parameters()
+        params["Diameter"] = params["roller_circle_diameter"] + 1
+
+        assert evaluate_design(params) is None
+
+    def test_designs_fit_envelope_and_are_ranked(self):
+        """Returned designs are valid, inside the envelope and best first."""
+        from cycloidMath import validate_parameters
+        from cycloidOptimize import optimize
+
+        designs = optimize(100, samples=200, rounds=2, top_k=3, workers=1)
+
+        assert 0 < len(designs) <= 3
+        scores = [d.score for d in designs]
+        assert scores == sorted(scores, reverse=True)
+        for design in designs:
+            validate_parameters(design.parameters)
+            assert design.parameters["Diameter"] == 100
+            assert design.parameters["min_rad"] < design.parameters["max_rad"]
+
+    def test_repeatable_with_seed(self):
+        """The same seed gives the same designs."""
+        from cycloidOptimize import optimize
+
+        first = optimize(100, samples=100, rounds=1, top_k=2, workers=1, seed=7)
+        second = optimize(100, samples=100, rounds=1, top_k=2, workers=1, seed=7)
+
+        assert [d.parameters for d in first] == [d.parameters for d in second]
+
+    def test_parallel_matches_serial(self):
+        """Worker processes find the same designs as an in-process run."""
+        from cycloidOptimize import optimize
+
+        serial = optimize(100, samples=150, rounds=1, top_k=2, workers=1)
+        parallel = optimize(100, samples=150, rounds=1, top_k=2, workers=2)
+
+        assert [d.score for d in serial] == [d.score for d in parallel]
+
+    def test_quiet_only_in_the_evaluating_thread(self, caplog):
+        """Warnings are dropped in the sweep's thread and still logged in others."""
+        import threading
+        from cycloidOptimize import _quiet_math_logger
+
+        math_logger = logging.getLogger("cycloidMath")
+        level = math_logger.level
+        with caplog.at_level(logging.WARNING, logger="cycloidMath"):
+            with _quiet_math_logger(), _quiet_math_logger():
+                math_logger.warning("from the sweep")
+                worker = threading.Thread(target=math_logger.warning, args=("from a generation",))
+                worker.start()
+                worker.join()
+            math_logger.warning("after the sweep")
+
+        assert [r.getMessage() for r in caplog.records] == ["from a generation", "after the sweep"]
+        assert math_logger.level == level and math_logger.filters == []
+
+    def test_unknown_objective(self):
+        """An unknown objective name raises ValueError."""
+        from cycloidOptimize import optimize
+
+        with pytest.raises(ValueError, match="Unknown objective"):
+            optimize(100, objective="fastest", samples=10, rounds=1, workers=1)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,80 @@
+"""Unit tests for the cycloidProfile profile capture."""
+
+import pytest
+import os
+import pstats
+import sys
+
+# Add parent directory to path to import cycloidProfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build_profiles(count):
+    from cycloidMath import generate_default_parameters, cycloidal_disk_outline
+
+    params = generate_default_parameters()
+    for i in range(count):
+        params["line_segment_count"] = 200 + i
+        cycloidal_disk_outline(params)
+    return count
+
+
+class TestProfileCall:
+    """Test the written profile files and the summary."""
+
+    def test_sampled_capture(self, tmp_path):
+        """The pstats file loads and the sampled stacks reach into the profiled code."""
+        from cycloidProfile import profile_call
+
+        capture = profile_call(build_profiles, 40, prefix=str(tmp_path / "run"), interval=0.001)
+
+        assert capture.result == 40
+        assert pstats.Stats(capture.pstats_path).total_calls > 0
+        lines = open(capture.folded_path).read().splitlines()
+        assert lines
+        assert any("build_profiles (test_cycloidProfile.py" in line for line in lines)
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert len(capture.summary.splitlines()) == 21
+
+    def test_unsampled_capture_uses_call_pairs(self, tmp_path):
+        """Without sampling the stacks are caller;callee pairs."""
+        from cycloidProfile import profile_call
+
+        capture = profile_call(build_profiles, 3, prefix=str(tmp_path / "run"), sample=False, top=5)
+
+        lines = open(capture.folded_path).read().splitlines()
+        assert any(line.startswith("build_profiles (") and ";cycloidal_disk_outline (" in line for line in lines)
+        assert len(capture.summary.splitlines()) == 6
+
+    def test_files_are_written_when_the_call_fails(self, tmp_path):
+        """A failing call still leaves its profile behind."""
+        from cycloidProfile import profile_call
+
+        with pytest.raises(ZeroDivisionError):
+            profile_call(lambda: 1 / 0, prefix=str(tmp_path / "fail"))
+        assert os.path.exists(tmp_path / "fail.pstats")
+        assert os.path.exists(tmp_path / "fail.folded")
+
+
+class TestProfileRegeneration:
+    """Test profiling the gearbox's forced regeneration."""
+
+    def test_unchanged_gearbox_is_really_rebuilt(self, tmp_path, freecad):
+        """With nothing changed the capture still holds every part generator."""
+        from cycloidProfile import profile_regeneration
+        from freecad_stub import gearbox_object
+
+        obj = gearbox_object(freecad.newDocument("gearbox"))
+        obj.Proxy.recompute()
+
+        capture = profile_regeneration(obj, directory=str(tmp_path), sample=False)
+
+        profiled = {name for _, _, name in pstats.Stats(capture.pstats_path).stats}
+        for name in ("generate_pin_disk_part", "generate_driver_disk_part", "generate_input_shaft_part",
+                     "generate_cycloidal_disk_part", "generate_eccentric_key_part", "generate_output_shaft_part"):
+            assert name in profiled
+        assert "generate_cycloidal_disk_part (cycloidFun.py" in open(capture.folded_path).read()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,77 @@
+"""Unit tests for the cycloidServer warm worker server."""
+
+import pytest
+import base64
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+
+# Add parent directory to path to import cycloidServer
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def post(url, body):
+    request = urllib.request.Request(url + "/generate", json.dumps(body).encode(),
+                                     {"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=60) as reply:
+        return json.load(reply)
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    from cycloidServer import GenerationServer
+
+    with GenerationServer(workers=1, engine="numpy", output_dir=str(tmp_path_factory.mktemp("out"))) as server:
+        yield server
+
+
+class TestGenerationServer:
+    """Test requests against a numpy engine server."""
+
+    def test_bytes_match_the_mesher(self, server):
+        """The STL sent back is the one cycloidStl writes for those parameters."""
+        from cycloidMath import GearBoxParameters
+        from cycloidCache import part_stl
+
+        reply = post(server.url, {"parameters": {"tooth_count": 14}, "parts": ["inputShaft"]})
+
+        assert list(reply["parts"]) == ["inputShaft"]
+        assert base64.b64decode(reply["parts"]["inputShaft"]) == part_stl(
+            "inputShaft", GearBoxParameters(tooth_count=14))
+        assert reply["fingerprint"] == GearBoxParameters(tooth_count=14).fingerprint
+
+    def test_path_output(self, server):
+        """With path output every part is written under the output directory."""
+        reply = post(server.url, {"output": "path"})
+
+        assert len(reply["parts"]) == 7
+        for path in reply["parts"].values():
+            assert path.startswith(server.output_dir)
+            assert os.path.getsize(path) > 84
+
+    def test_bad_requests_are_rejected(self, server):
+        """Invalid parameters, names and formats give a 400 with the reason."""
+        for body, reason in (({"parameters": {"tooth_count": 1}}, "tooth_count"),
+                             ({"parameters": {"teeth": 10}}, "teeth"),
+                             ({"format": "step"}, "step"),
+                             ({"parts": ["gear"]}, "gear")):
+            with pytest.raises(urllib.error.HTTPError) as error:
+                post(server.url, body)
+            assert error.value.code == 400
+            assert reason in json.load(error.value)["error"]
+
+    def test_health(self, server):
+        """Health reports the workers and what was served."""
+        post(server.url, {"parts": ["eccentricKey"]})
+        with urllib.request.urlopen(server.url + "/health", timeout=10) as reply:
+            health = json.load(reply)
+
+        assert health["engine"] == "numpy"
+        assert health["workers"] == 1
+        assert health["served"] >= 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
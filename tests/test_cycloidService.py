@@ -0,0 +1,117 @@
+"""Unit tests for the cycloidService generation queue."""
+
+import pytest
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+# Add parent directory to path to import cycloidService
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Recorder:
+    """Stand-in for generate_parts that records calls and can be held."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+        self.lock = threading.Lock()
+        self.active = {}
+        self.most_active = 0
+        self.most_active_per_doc = 0
+
+    def __call__(self, doc, parameters, **kwargs):
+        with self.lock:
+            self.calls.append((doc.Name, parameters))
+            self.active[doc.Name] = self.active.get(doc.Name, 0) + 1
+            self.most_active = max(self.most_active, sum(self.active.values()))
+            self.most_active_per_doc = max(self.most_active_per_doc, self.active[doc.Name])
+        self.started.set()
+        self.release.wait(5.0)
+        time.sleep(0.01)
+        with self.lock:
+            self.active[doc.Name] -= 1
+        if parameters == "bad":
+            raise ValueError("bad parameters")
+        return {"parameters": parameters}
+
+
+class TestGenerationService:
+    """Test queueing, coalescing and metrics."""
+
+    def test_latest_request_wins(self):
+        """Requests queued behind a running one collapse into one run of the newest."""
+        from cycloidService import GenerationService
+
+        generate = Recorder()
+        generate.release.clear()
+        doc = SimpleNamespace(Name="A")
+        with GenerationService(generate) as service:
+            first = service.submit(doc, 1)
+            assert generate.started.wait(5.0)
+            later = [service.submit(doc, p) for p in (2, 3, 4)]
+            generate.release.set()
+
+            assert first.result(5.0) == {"parameters": 1}
+            assert [f.result(5.0) for f in later] == [{"parameters": 4}] * 3
+            metrics = service.metrics()
+        assert generate.calls == [("A", 1), ("A", 4)]
+        assert metrics["coalesced"] == 2
+        assert metrics["completed"] == 2
+        assert metrics["latency_max"] >= metrics["wait_max"] > 0
+
+    def test_documents_run_in_parallel_but_each_one_serially(self):
+        """With two workers different documents overlap, one document never does."""
+        from cycloidService import GenerationService
+
+        generate = Recorder()
+        generate.release.clear()
+        with GenerationService(generate, workers=2) as service:
+            futures = [service.submit(SimpleNamespace(Name="A"), 1),
+                       service.submit(SimpleNamespace(Name="B"), 1)]
+            time.sleep(0.1)
+            futures.append(service.submit(SimpleNamespace(Name="A"), 2))
+            generate.release.set()
+            for future in futures:
+                future.result(5.0)
+
+        assert generate.most_active == 2
+        assert generate.most_active_per_doc == 1
+        assert len(generate.calls) == 3
+
+    def test_full_queue_is_reported(self):
+        """A request that does not fit the queue raises instead of being dropped."""
+        from cycloidService import GenerationService, GenerationQueueFull
+
+        generate = Recorder()
+        generate.release.clear()
+        with GenerationService(generate, max_pending=1) as service:
+            service.submit(SimpleNamespace(Name="A"), 1)
+            assert generate.started.wait(5.0)
+            service.submit(SimpleNamespace(Name="B"), 1)
+            with pytest.raises(GenerationQueueFull):
+                service.submit(SimpleNamespace(Name="C"), 1, block=False)
+            # a document already waiting still coalesces
+            service.submit(SimpleNamespace(Name="B"), 2, block=False)
+            assert service.metrics()["queue_depth"] == 1
+            generate.release.set()
+        assert service.metrics()["rejected"] == 1
+
+    def test_errors_reach_the_caller(self):
+        """An exception in generate is raised by the future."""
+        from cycloidService import GenerationService
+
+        with GenerationService(Recorder()) as service:
+            future = service.submit(SimpleNamespace(Name="A"), "bad")
+            with pytest.raises(ValueError, match="bad parameters"):
+                future.result(5.0)
+            assert service.submit(SimpleNamespace(Name="A"), 1).result(5.0) == {"parameters": 1}
+        assert service.metrics()["failed"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,176 @@
+"""Unit tests for the cycloidStl numpy mesher and binary STL writer."""
+
+import pytest
+import math
+import sys
+import os
+
+import numpy as np
+
+# Add parent directory to path to import cycloidStl
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _open_edges(triangles):
+    """Directed edges without a matching reverse edge; 0 for a closed shell."""
+    edges = {}
+    for triangle in np.round(triangles, 6):
+        for a, b in ((0, 1), (1, 2), (2, 0)):
+            key = (tuple(triangle[a]), tuple(triangle[b]))
+            edges[key] = edges.get(key, 0) + 1
+    return sum(1 for (a, b), count in edges.items() if edges.get((b, a), 0) != count)
+
+
+def _volume(triangles):
+    return np.einsum("ij,ij->i", triangles[:, 0], np.cross(triangles[:, 1], triangles[:, 2])).sum() / 6
+
+
+def _area(loop):
+    x, y = loop[:, 0], loop[:, 1]
+    return 0.5 * np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+
+
+def _area_of(triangles):
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    areas = 0.5 * ((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]))
+    assert (areas > 0).all()
+    return areas.sum()
+
+
+class TestRegions:
+    """Test the 2D boolean and triangulation."""
+
+    def test_union_minus_hole(self):
+        """Two overlapping squares minus a hole give the expected area."""
+        from cycloidStl import region_boolean
+
+        square = np.array([(0, 0), (2, 0), (2, 2), (0, 2)], dtype=float)
+        hole = np.array([(0.5, 0.5), (1, 0.5), (1, 1), (0.5, 1)], dtype=float)
+        loops = region_boolean([[square], [square + (1, 1)]], [[hole]])
+
+        assert sum(_area(l) for l in loops) == pytest.approx(7.0 - 0.25)
+
+    def test_triangulation_covers_polygon_with_holes(self):
+        """Ear clipping a disk with holes covers exactly its area."""
+        from cycloidStl import circle_loop, triangulate
+
+        outer = circle_loop(0, 0, 10)
+        holes = [circle_loop(5, 0, 1)[::-1], circle_loop(-5, 0, 2)[::-1]]
+        triangles = triangulate(outer, holes)
+
+        assert _area_of(triangles) == pytest.approx(_area(outer) + sum(_area(h) for h in holes))
+
+    def test_rings_are_strips(self):
+        """A ring is one strip, a ring the hole centre cannot see whole is ear clipped."""
+        from cycloidStl import _annulus, circle_loop, triangulate
+
+        outer, hole = circle_loop(0, 0, 10), circle_loop(2, 1, 3)[::-1]
+        triangles = triangulate(outer, [hole])
+        assert len(triangles) == len(outer) + len(hole)
+        assert _area_of(triangles) == pytest.approx(_area(outer) + _area(hole))
+
+        notched = np.array([(-10, -10), (10, -10), (10, 10), (1, 10), (1, -5),
+                            (-1, -5), (-1, 10), (-10, 10)], dtype=float)
+        hole = circle_loop(5, 0, 2)[::-1]
+        assert _annulus(notched, hole) is None
+        assert _area_of(triangulate(notched, [hole])) == pytest.approx(_area(notched) + _area(hole))
+
+    def test_circle_tolerance(self):
+        """Circle polygons stay within CIRCLE_TOLERANCE of the true circle."""
+        from cycloidStl import circle_loop, CIRCLE_TOLERANCE
+
+        for radius in (1.0, 10.0, 47.5):
+            loop = circle_loop(0, 0, radius)
+            sagitta = radius * (1 - math.cos(math.pi / len(loop)))
+            assert sagitta <= CIRCLE_TOLERANCE + 1e-12
+
+
+class TestParts:
+    """Test the meshes of the seven gearbox parts."""
+
+    @pytest.mark.parametrize("name", ["pinDisk", "driverDisk", "inputShaft", "cycloidalDisk1",
+                                      "cycloidalDisk2", "eccentricKey", "outputShaft"])
+    def test_slabs_are_closed_shells(self, name):
+        """Every slab of every part is a closed, outward facing shell."""
+        from cycloidMath import generate_default_parameters
+        from cycloidStl import part_slabs, extrude
+
+        params = generate_default_parameters()
+        slabs = part_slabs(name, params)
+
+        assert slabs
+        for z0, z1, loops in slabs:
+            shell = extrude(loops, z0, z1)
+            assert _open_edges(shell) == 0
+            assert _volume(shell) > 0
+
+    def test_cycloidal_disk_volume(self):
+        """The disk volume is the outline area minus the holes times the height."""
+        from cycloidMath import generate_default_parameters, cycloidal_disk_outline
+        from cycloidStl import part_triangles, circle_loop, _polar_circles
+
+        params = generate_default_parameters()
+        # keep the driver holes clear of the outline so they are whole holes
+        params["driver_circle_diameter"] = 40.0
+        e = params["eccentricity"]
+        holes = [circle_loop(e, 0, (params["shaft_diameter"] + params["clearance"]) / 2)]
+        holes += _polar_circles(params["driver_circle_diameter"] / 2, params["driver_disk_hole_count"],
+                                (params["driver_hole_diameter"] + 2 * e) / 2, e)
+        area = _area(cycloidal_disk_outline(params)) - sum(_area(h) for h in holes)
+
+        assert _volume(part_triangles("cycloidalDisk1", params)) == pytest.approx(area * params["disk_height"])
+
+    def test_disks_are_placed_like_the_generator(self):
+        """The two disks sit on top of each other above the base."""
+        from cycloidMath import generate_default_parameters
+        from cycloidStl import part_triangles
+
+        params = generate_default_parameters()
+        disk1 = part_triangles("cycloidalDisk1", params).reshape(-1, 3)
+        disk2 = part_triangles("cycloidalDisk2", params).reshape(-1, 3)
+
+        assert disk1[:, 2].min() == pytest.approx(params["base_height"])
+        assert disk2[:, 2].min() == pytest.approx(disk1[:, 2].max())
+
+    def test_unknown_part(self):
+        """Unknown part names raise KeyError."""
+        from cycloidMath import generate_default_parameters
+        from cycloidStl import part_features
+
+        with pytest.raises(KeyError):
+            part_features("gearBox", generate_default_parameters())
+
+
+class TestStlWriter:
+    """Test the binary STL output."""
+
+    def test_write_parts(self, tmp_path):
+        """All seven files are written with a consistent triangle count."""
+        from cycloidMath import generate_default_parameters, PART_NAMES
+        from cycloidStl import write_parts
+
+        paths = write_parts(generate_default_parameters(), str(tmp_path))
+
+        assert [os.path.basename(p) for p in paths] == [f"CycloidalDrive-{n}.stl" for n in PART_NAMES]
+        for path in paths:
+            data = open(path, "rb").read()
+            count = int(np.frombuffer(data[80:84], "<u4")[0])
+            assert count > 0
+            assert len(data) == 84 + 50 * count
+
+    def test_streaming_in_chunks(self, tmp_path, monkeypatch):
+        """Output is identical whatever the chunk size."""
+        import cycloidStl
+        from cycloidMath import generate_default_parameters
+
+        triangles = cycloidStl.part_triangles("outputShaft", generate_default_parameters())
+        whole, chunked = tmp_path / "whole.stl", tmp_path / "chunked.stl"
+        cycloidStl.write_binary_stl(str(whole), triangles)
+        monkeypatch.setattr(cycloidStl, "STL_CHUNK", 100)
+        cycloidStl.write_binary_stl(str(chunked), triangles)
+
+        assert whole.read_bytes() == chunked.read_bytes()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,119 @@
+"""Unit tests for the sweep results store."""
+
+import pytest
+import os
+import sys
+import numpy as np
+
+# Add parent directory to path to import cycloidStore
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _rows(count):
+    return [{"tooth_count": 7 + i % 10, "Diameter": 60.0 + i, "torque": 10.0 * i} for i in range(count)]
+
+
+class TestResultStore:
+    """Test appending, reopening and reading a store."""
+
+    def test_rows_survive_reopening_across_chunks(self, tmp_path):
+        """Rows come back from memory-mapped chunks after the store is reopened."""
+        from cycloidStore import ResultStore
+
+        with ResultStore(str(tmp_path), chunk_rows=8) as store:
+            assert [store.append(row) for row in _rows(3)] == [0, 1, 2]
+            assert len(store) == 0
+            store.extend(_rows(20)[3:])
+            assert len(store) == 16
+        store = ResultStore(str(tmp_path), chunk_rows=1000)
+
+        assert len(store) == 20 and store.chunk_rows == 8
+        assert store.columns == {"tooth_count": "int64", "Diameter": "float64", "torque": "float64"}
+        assert store.row(13) == _rows(20)[13]
+        first, chunk = next(store.chunks(["torque"]))
+        assert first == 0 and isinstance(chunk["torque"], np.memmap) and not chunk["torque"].flags.writeable
+        store.append({"tooth_count": 9, "Diameter": 95.0})
+        store.flush()
+        assert np.isnan(store.row(20)["torque"])
+
+    def test_query_ranges(self, tmp_path):
+        """Indexed columns are queried by inclusive and open ranges or exact values."""
+        from cycloidStore import ResultStore
+
+        with ResultStore(str(tmp_path), chunk_rows=8) as store:
+            store.extend(_rows(30))
+            store.flush()
+            torque = store.rows(store.query(tooth_count=(9, 10), Diameter=(None, 75.0)), ["torque"])["torque"]
+            assert torque.tolist() == [20.0, 30.0, 120.0, 130.0]
+            assert store.query(tooth_count=16).tolist() == [9, 19, 29]
+            assert len(store.query()) == 30
+            with pytest.raises(ValueError):
+                store.query(torque=(0.0, 1.0))
+
+    def test_rejects_rows_that_do_not_fit(self, tmp_path):
+        """New columns, missing int columns and floats in int columns are refused at append."""
+        from cycloidStore import ResultStore
+
+        with ResultStore(str(tmp_path)) as store:
+            with pytest.raises(ValueError):
+                store.append({"torque": 1.0})
+            store.append(_rows(1)[0])
+            for row in ({"tooth_count": 7, "Diameter": 60.0, "mass": 1.0}, {"Diameter": 60.0},
+                        {"tooth_count": 7.5, "Diameter": 60.0}):
+                with pytest.raises(ValueError):
+                    store.append(row)
+        assert len(ResultStore(str(tmp_path))) == 1
+
+    def test_unindexed_chunk_is_replaced(self, tmp_path):
+        """A chunk written before a crash, but never indexed, is overwritten by the next one."""
+        from cycloidStore import ResultStore
+
+        with ResultStore(str(tmp_path), chunk_rows=4) as store:
+            store.extend(_rows(4))
+        os.makedirs(os.path.join(str(tmp_path), "chunk-000001"))
+        with ResultStore(str(tmp_path)) as store:
+            store.extend(_rows(6)[4:])
+
+        assert ResultStore(str(tmp_path)).row(5) == _rows(6)[5]
+
+
+class TestNearestDesign:
+    """Test the nearest design lookup."""
+
+    def test_nearest_row(self, tmp_path):
+        """The smallest relative distance wins, within the given ranges."""
+        from cycloidStore import ResultStore
+
+        with ResultStore(str(tmp_path), chunk_rows=8) as store:
+            store.extend(_rows(30))
+            store.flush()
+            assert store.nearest({"Diameter": 81.2})[0] == 21
+            number, distance = store.nearest({"Diameter": 81.2}, tooth_count=7)
+            assert number == 20 and distance == pytest.approx(1.2 / 81.2)
+            with pytest.raises(LookupError):
+                store.nearest({"Diameter": 81.2}, tooth_count=40)
+
+    def test_sweep_feeds_generate_parts(self, tmp_path, freecad):
+        """A swept design comes back as parameters generate_parts builds."""
+        from cycloidMath import PART_NAMES, generate_default_parameters
+        from cycloidOptimize import default_search_space, sample_candidates
+        from cycloidStore import ResultStore, generate_nearest, nearest_design, store_sweep
+
+        base = generate_default_parameters()
+        candidates = sample_candidates(default_search_space(95.0), 300, base, np.random.default_rng(0))
+        with ResultStore(str(tmp_path), chunk_rows=16) as store:
+            count = store_sweep(store, iter(candidates))
+            assert count == len(store) > 16
+            parameters, _ = nearest_design(store, {"tooth_count": 13, "eccentricity": 2.0})
+            assert isinstance(parameters["tooth_count"], int) and "min_rad" not in parameters
+            assert set(parameters) == set(base) - {"min_rad", "max_rad"}
+
+            doc = freecad.newDocument("nearest")
+            built = generate_nearest(doc, store, {"tooth_count": 13, "eccentricity": 2.0})
+        assert "min_rad" in built
+        for name in PART_NAMES:
+            assert doc.getObject(name).TypeId == "PartDesign::Body"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
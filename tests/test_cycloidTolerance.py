@@ -0,0 +1,82 @@
+"""Unit tests for the cycloidTolerance Monte Carlo study."""
+
+import pytest
+import os
+import sys
+
+import numpy as np
+
+# Add parent directory to path to import cycloidTolerance
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestTolerance:
+    """Test the contact model, sampling and report."""
+
+    def test_nominal_parts(self):
+        """Without deviations the backlash comes from the radial clearance alone."""
+        from cycloidMath import generate_default_parameters
+        from cycloidTolerance import analyse
+
+        params = generate_default_parameters()
+        report = analyse(params, {}, samples=3, steps=60, workers=1)
+        assert np.all(report.backlash == report.backlash[0])
+        assert report.backlash[0] > 0
+        assert report.ring_clearance[0] == pytest.approx(0.4, abs=0.05)
+        assert report.driver_clearance[0] == pytest.approx(0.0, abs=1e-9)
+
+        tight = analyse(dict(params, clearance=0.0), {}, samples=1, steps=60, workers=1)
+        assert tight.backlash[0] == pytest.approx(0.0, abs=1e-6)
+
+    def test_deviations_move_the_gaps(self):
+        """Added profile material takes clearance off every roller, a bigger hole adds play."""
+        from cycloidMath import generate_default_parameters
+        from cycloidTolerance import analyse
+
+        params = generate_default_parameters()
+        nominal = analyse(params, {}, samples=1, steps=60, workers=1)
+        thicker = analyse(params, {"profile_offset": ("uniform", 0.1, 0.1)}, samples=1, steps=60, workers=1)
+        looser = analyse(params, {"hole_diameter": ("uniform", 0.2, 0.2)}, samples=1, steps=60, workers=1)
+
+        assert thicker.ring_clearance[0] == pytest.approx(nominal.ring_clearance[0] - 0.1)
+        assert thicker.backlash[0] < nominal.backlash[0]
+        assert looser.driver_clearance[0] == pytest.approx(0.1)
+        assert looser.backlash[0] > nominal.backlash[0]
+
+    def test_clearance_is_best_over_rotation(self):
+        """The clearance is the largest smallest gap over every rotation."""
+        from cycloidTolerance import _play
+
+        rng = np.random.default_rng(1)
+        gap, lever = rng.normal(0, 0.1, (50, 12)), rng.normal(0, 20, (50, 12))
+        forward, backward, clearance = _play(gap, lever)
+        rotation = np.linspace(-0.05, 0.05, 20001)
+        brute = (gap[:, None, :] - lever[:, None, :] * rotation[None, :, None]).min(axis=2).max(axis=1)
+
+        assert clearance == pytest.approx(brute, abs=1e-4)
+        assert np.all((forward + backward < 0) == (clearance < 0))
+
+    def test_yield_and_repeatability(self):
+        """Results depend on the seed only, and the yield follows the limits."""
+        from cycloidMath import generate_default_parameters
+        from cycloidTolerance import analyse, default_tolerances
+
+        params = generate_default_parameters()
+        tolerances = dict(default_tolerances(), hole_diameter=("normal", 0.3, 0.05))
+        report = analyse(params, tolerances, samples=300, steps=36, workers=2, batch_size=64, max_backlash=200)
+        again = analyse(params, tolerances, samples=300, steps=36, workers=1, batch_size=64, max_backlash=200)
+
+        assert np.array_equal(report.backlash, again.backlash)
+        assert report.passed.sum() == np.sum((report.clearance >= 0) & (report.backlash <= 200))
+        assert report.yield_percent == pytest.approx(100 * report.passed.mean())
+        assert report.summary["backlash"]["p5"] <= report.summary["backlash"]["p50"] <= report.summary["backlash"]["p95"]
+        assert analyse(params, samples=300, steps=36, workers=1).yield_percent < report.yield_percent
+
+        with pytest.raises(ValueError):
+            analyse(params, {"wobble": 0.1}, samples=10)
+        with pytest.raises(ValueError):
+            analyse(params, {"eccentricity": ("cauchy", 0, 1)}, samples=10)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])